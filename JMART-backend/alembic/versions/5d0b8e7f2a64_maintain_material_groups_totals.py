@@ -0,0 +1,56 @@
+"""maintain material_groups as per-category stock totals
+
+Revision ID: 5d0b8e7f2a64
+Revises: e3a91f0c5b27
+Create Date: 2026-10-18 13:40:02.918344
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5d0b8e7f2a64'
+down_revision: Union[str, None] = 'e3a91f0c5b27'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    with op.batch_alter_table('material_groups') as batch_op:
+        batch_op.alter_column('total_weight',
+                   existing_type=sa.INTEGER(),
+                   type_=sa.Float(),
+                   existing_nullable=True)
+        batch_op.add_column(sa.Column('seller_count', sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column('item_count', sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column('thumbnail_url', sa.String(), nullable=True))
+    op.create_index(op.f('ix_material_groups_material_type'), 'material_groups', ['material_type'], unique=True)
+    # The table was never written; fill it from current stock (same as `python -m app.manage reconcile-groups`)
+    op.execute("DELETE FROM material_groups")
+    op.execute("""
+        INSERT INTO material_groups (material_type, total_weight, seller_count, item_count, thumbnail_url)
+        SELECT g.category, g.total_weight, g.seller_count, g.item_count, t.image_url
+        FROM (
+            SELECT category, SUM(amount_kg) AS total_weight, COUNT(DISTINCT user_id) AS seller_count,
+                   COUNT(id) AS item_count, MIN(id) AS first_id
+            FROM waste_items
+            WHERE verified = true AND amount_kg > 0
+            GROUP BY category
+        ) g
+        JOIN waste_items t ON t.id = g.first_id
+    """)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_material_groups_material_type'), table_name='material_groups')
+    with op.batch_alter_table('material_groups') as batch_op:
+        batch_op.drop_column('thumbnail_url')
+        batch_op.drop_column('item_count')
+        batch_op.drop_column('seller_count')
+        batch_op.alter_column('total_weight',
+                   existing_type=sa.Float(),
+                   type_=sa.INTEGER(),
+                   existing_nullable=True)
@@ -0,0 +1,58 @@
+"""add token_ledger and balance_snapshots
+
+Revision ID: 9b4c6d2e8f13
+Revises: 5d0b8e7f2a64
+Create Date: 2026-10-18 16:05:47.210938
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9b4c6d2e8f13'
+down_revision: Union[str, None] = '5d0b8e7f2a64'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('token_ledger',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('delta', sa.Float(), nullable=False),
+        sa.Column('reason', sa.String(length=32), nullable=False),
+        sa.Column('reference', sa.String(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_token_ledger_id'), 'token_ledger', ['id'], unique=False)
+    op.create_index('ix_token_ledger_user_id_created_at', 'token_ledger', ['user_id', 'created_at'], unique=False)
+    op.create_table('balance_snapshots',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('taken_at', sa.DateTime(), nullable=False),
+        sa.Column('balance', sa.Float(), nullable=False),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('user_id', 'taken_at', name='uq_balance_snapshots_user_id_taken_at')
+    )
+    op.create_index(op.f('ix_balance_snapshots_id'), 'balance_snapshots', ['id'], unique=False)
+    # Balances so far have no history; open the ledger with each one so balance == sum(ledger) from here on
+    now_utc = "CURRENT_TIMESTAMP" if op.get_bind().dialect.name == "sqlite" else "(now() AT TIME ZONE 'utc')"
+    op.execute(f"""
+        INSERT INTO token_ledger (user_id, delta, reason, created_at)
+        SELECT id, tokens, 'opening_balance', {now_utc}
+        FROM users
+        WHERE tokens IS NOT NULL AND tokens <> 0
+    """)
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_balance_snapshots_id'), table_name='balance_snapshots')
+    op.drop_table('balance_snapshots')
+    op.drop_index('ix_token_ledger_user_id_created_at', table_name='token_ledger')
+    op.drop_index(op.f('ix_token_ledger_id'), table_name='token_ledger')
+    op.drop_table('token_ledger')
@@ -0,0 +1,152 @@
+"""add dashboard rollups and waste_items created_at, listed_kg
+
+Revision ID: a4d8e2f61c37
+Revises: 9b4c6d2e8f13
+Create Date: 2026-10-18 18:42:13.508214
+
+"""
+from collections import defaultdict
+from datetime import datetime
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a4d8e2f61c37'
+down_revision: Union[str, None] = '9b4c6d2e8f13'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# The rollup layout as of this revision; kept here rather than imported, so later app changes don't alter it
+PERIODS = ("hour", "day", "month", "all")
+ALL_CATEGORIES = "*"
+LIFETIME = datetime(1970, 1, 1)
+CATEGORY_COUNTERS = ("items_uploaded", "kg_uploaded", "kg_sold", "tokens_traded", "active_sellers")
+USER_COUNTERS = ("items_uploaded", "kg_uploaded", "kg_sold", "tokens_earned", "kg_bought", "tokens_spent")
+
+
+def bucket_start(period, at):
+    if period == "all":
+        return LIFETIME
+    if at is None:
+        return None
+    if period == "hour":
+        return at.replace(minute=0, second=0, microsecond=0)
+    if period == "day":
+        return at.replace(hour=0, minute=0, second=0, microsecond=0)
+    return at.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def rollup_rows(items, transactions):
+    """Rollup rows for items (user_id, category, kg, created_at) and transactions (buyer, seller, category, kg, tokens, timestamp)."""
+    categories = defaultdict(lambda: defaultdict(float))
+    users = defaultdict(lambda: defaultdict(float))
+    active = set()
+
+    def add(at, user_id, category, seller, user_counters, category_counters):
+        for period in PERIODS:
+            start = bucket_start(period, at)
+            if start is None:
+                continue
+            for name, value in category_counters.items():
+                categories[(period, category, start)][name] += value
+            for c in (category, ALL_CATEGORIES):
+                for name, value in user_counters.items():
+                    users[(period, user_id, c, start)][name] += value
+                if seller:
+                    active.add((period, user_id, c, start))
+
+    for user_id, category, kg, created_at in items:
+        kg = kg or 0.0
+        add(created_at, user_id, category, True, {"items_uploaded": 1, "kg_uploaded": kg}, {"items_uploaded": 1, "kg_uploaded": kg})
+    for buyer_id, seller_id, category, kg, tokens, timestamp in transactions:
+        kg, tokens = kg or 0.0, tokens or 0.0
+        add(timestamp, seller_id, category, True, {"kg_sold": kg, "tokens_earned": tokens}, {"kg_sold": kg, "tokens_traded": tokens})
+        add(timestamp, buyer_id, category, False, {"kg_bought": kg, "tokens_spent": tokens}, {})
+    for period, user_id, category, start in active:
+        if category != ALL_CATEGORIES:
+            categories[(period, category, start)]["active_sellers"] += 1
+
+    category_rows = [
+        {"period": period, "category": category, "bucket_start": start, **{name: counters.get(name, 0) for name in CATEGORY_COUNTERS}}
+        for (period, category, start), counters in categories.items()
+    ]
+    user_rows = [
+        {"period": period, "user_id": user_id, "category": category, "bucket_start": start,
+         "active": (period, user_id, category, start) in active, **{name: counters.get(name, 0) for name in USER_COUNTERS}}
+        for (period, user_id, category, start), counters in users.items()
+    ]
+    return category_rows, user_rows
+
+
+def upgrade() -> None:
+    # Existing rows keep NULL: they count toward lifetime totals only, at their remaining amount_kg
+    op.add_column('waste_items', sa.Column('listed_kg', sa.Float(), nullable=True))
+    op.add_column('waste_items', sa.Column('created_at', sa.DateTime(), nullable=True))
+    category_rollups = op.create_table('category_rollups',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('period', sa.String(length=5), nullable=False),
+        sa.Column('bucket_start', sa.DateTime(), nullable=False),
+        sa.Column('category', sa.String(), nullable=False),
+        sa.Column('items_uploaded', sa.Integer(), nullable=False),
+        sa.Column('kg_uploaded', sa.Float(), nullable=False),
+        sa.Column('kg_sold', sa.Float(), nullable=False),
+        sa.Column('tokens_traded', sa.Float(), nullable=False),
+        sa.Column('active_sellers', sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_category_rollups_id'), 'category_rollups', ['id'], unique=False)
+    op.create_index('uq_category_rollups_period_category_bucket', 'category_rollups', ['period', 'category', 'bucket_start'], unique=True)
+    op.create_index('ix_category_rollups_period_bucket', 'category_rollups', ['period', 'bucket_start'], unique=False)
+    user_rollups = op.create_table('user_rollups',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('period', sa.String(length=5), nullable=False),
+        sa.Column('bucket_start', sa.DateTime(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('category', sa.String(), nullable=False),
+        sa.Column('items_uploaded', sa.Integer(), nullable=False),
+        sa.Column('kg_uploaded', sa.Float(), nullable=False),
+        sa.Column('kg_sold', sa.Float(), nullable=False),
+        sa.Column('tokens_earned', sa.Float(), nullable=False),
+        sa.Column('kg_bought', sa.Float(), nullable=False),
+        sa.Column('tokens_spent', sa.Float(), nullable=False),
+        sa.Column('active', sa.Boolean(), nullable=False),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_user_rollups_id'), 'user_rollups', ['id'], unique=False)
+    op.create_index('uq_user_rollups_period_user_category_bucket', 'user_rollups', ['period', 'user_id', 'category', 'bucket_start'], unique=True)
+    op.create_index(
+        'ix_user_rollups_active', 'user_rollups', ['period', 'category', 'bucket_start'], unique=False,
+        postgresql_where=sa.text('active = true'),
+        sqlite_where=sa.text('active = 1'),
+    )
+    # Fill the rollups from the existing history, so /api/stats is right from the first request
+    waste_items = sa.table('waste_items', sa.column('user_id', sa.Integer), sa.column('category', sa.String),
+                           sa.column('amount_kg', sa.Float))
+    transactions = sa.table('transactions', sa.column('buyer_id', sa.Integer), sa.column('seller_id', sa.Integer),
+                            sa.column('category', sa.String), sa.column('amount_kg', sa.Float), sa.column('tokens', sa.Float),
+                            sa.column('timestamp', sa.DateTime))
+    conn = op.get_bind()
+    items = conn.execute(sa.select(waste_items.c.user_id, waste_items.c.category, waste_items.c.amount_kg, sa.null()))
+    txs = conn.execute(sa.select(*transactions.c))
+    category_rows, user_rows = rollup_rows(items, txs)
+    if category_rows:
+        op.bulk_insert(category_rollups, category_rows)
+    if user_rows:
+        op.bulk_insert(user_rollups, user_rows)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_user_rollups_active', table_name='user_rollups')
+    op.drop_index('uq_user_rollups_period_user_category_bucket', table_name='user_rollups')
+    op.drop_index(op.f('ix_user_rollups_id'), table_name='user_rollups')
+    op.drop_table('user_rollups')
+    op.drop_index('ix_category_rollups_period_bucket', table_name='category_rollups')
+    op.drop_index('uq_category_rollups_period_category_bucket', table_name='category_rollups')
+    op.drop_index(op.f('ix_category_rollups_id'), table_name='category_rollups')
+    op.drop_table('category_rollups')
+    op.drop_column('waste_items', 'created_at')
+    op.drop_column('waste_items', 'listed_kg')
@@ -0,0 +1,34 @@
+"""add phash and duplicate_of to waste_items
+
+Revision ID: b7e2d41c9a10
+Revises: 8c79a76ad363
+Create Date: 2026-10-18 09:12:40.114203
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b7e2d41c9a10'
+down_revision: Union[str, None] = '8c79a76ad363'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('waste_items', sa.Column('phash', sa.String(length=16), nullable=True))
+    op.add_column('waste_items', sa.Column('duplicate_of', sa.Integer(), nullable=True))
+    op.create_index(op.f('ix_waste_items_phash'), 'waste_items', ['phash'], unique=False)
+    with op.batch_alter_table('waste_items') as batch_op:
+        batch_op.create_foreign_key('fk_waste_items_duplicate_of', 'waste_items', ['duplicate_of'], ['id'])
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('waste_items') as batch_op:
+        batch_op.drop_constraint('fk_waste_items_duplicate_of', type_='foreignkey')
+    op.drop_index(op.f('ix_waste_items_phash'), table_name='waste_items')
+    op.drop_column('waste_items', 'duplicate_of')
+    op.drop_column('waste_items', 'phash')
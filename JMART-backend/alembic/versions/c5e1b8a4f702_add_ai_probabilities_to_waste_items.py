@@ -0,0 +1,29 @@
+"""add ai_probabilities to waste_items and waste_items_archive
+
+Revision ID: c5e1b8a4f702
+Revises: f2c7a9d3b518
+Create Date: 2026-10-19 09:12:48.316027
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c5e1b8a4f702'
+down_revision: Union[str, None] = 'f2c7a9d3b518'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Existing rows keep NULL: near-duplicates of them are classified again rather than reusing a partial prediction
+    op.add_column('waste_items', sa.Column('ai_probabilities', sa.JSON(), nullable=True))
+    op.add_column('waste_items_archive', sa.Column('ai_probabilities', sa.JSON(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('waste_items_archive', 'ai_probabilities')
+    op.drop_column('waste_items', 'ai_probabilities')
@@ -0,0 +1,33 @@
+"""add waste_item_id to transactions and transactions_archive
+
+Revision ID: d83f1a6c2e90
+Revises: c5e1b8a4f702
+Create Date: 2026-10-19 14:27:05.118342
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd83f1a6c2e90'
+down_revision: Union[str, None] = 'c5e1b8a4f702'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Older sales keep NULL: they were recorded per seller and category, not per lot
+    op.add_column('transactions', sa.Column('waste_item_id', sa.Integer(), nullable=True))
+    op.add_column('transactions_archive', sa.Column('waste_item_id', sa.Integer(), nullable=True))
+    op.create_index('ix_transactions_waste_item_id', 'transactions', ['waste_item_id'], unique=False)
+    op.create_index('ix_transactions_archive_waste_item_id', 'transactions_archive', ['waste_item_id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_transactions_archive_waste_item_id', table_name='transactions_archive')
+    op.drop_index('ix_transactions_waste_item_id', table_name='transactions')
+    op.drop_column('transactions_archive', 'waste_item_id')
+    op.drop_column('transactions', 'waste_item_id')
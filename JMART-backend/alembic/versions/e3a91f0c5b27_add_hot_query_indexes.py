@@ -0,0 +1,44 @@
+"""add composite and partial indexes for hot queries
+
+Revision ID: e3a91f0c5b27
+Revises: b7e2d41c9a10
+Create Date: 2026-10-18 11:05:21.530817
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e3a91f0c5b27'
+down_revision: Union[str, None] = 'b7e2d41c9a10'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index('ix_waste_items_category_verified_amount_kg', 'waste_items', ['category', 'verified', 'amount_kg'], unique=False)
+    op.create_index(
+        'ix_waste_items_marketplace', 'waste_items', ['category', 'id'], unique=False,
+        postgresql_where=sa.text('sold = false AND verified = true AND amount_kg > 0'),
+        sqlite_where=sa.text('sold = 0 AND verified = 1 AND amount_kg > 0'),
+    )
+    op.create_index(
+        'ix_waste_items_unsold', 'waste_items', ['id'], unique=False,
+        postgresql_where=sa.text('sold = false'),
+        sqlite_where=sa.text('sold = 0'),
+    )
+    op.create_index('ix_waste_items_user_id_id', 'waste_items', ['user_id', 'id'], unique=False)
+    op.create_index('ix_transactions_buyer_id_timestamp', 'transactions', ['buyer_id', 'timestamp', 'id'], unique=False)
+    op.create_index('ix_transactions_seller_id_timestamp', 'transactions', ['seller_id', 'timestamp', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_transactions_seller_id_timestamp', table_name='transactions')
+    op.drop_index('ix_transactions_buyer_id_timestamp', table_name='transactions')
+    op.drop_index('ix_waste_items_user_id_id', table_name='waste_items')
+    op.drop_index('ix_waste_items_unsold', table_name='waste_items')
+    op.drop_index('ix_waste_items_marketplace', table_name='waste_items')
+    op.drop_index('ix_waste_items_category_verified_amount_kg', table_name='waste_items')
@@ -0,0 +1,92 @@
+"""add waste_items_archive and monthly-partitioned transactions_archive
+
+Revision ID: f2c7a9d3b518
+Revises: a4d8e2f61c37
+Create Date: 2026-10-18 20:14:36.902541
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f2c7a9d3b518'
+down_revision: Union[str, None] = 'a4d8e2f61c37'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('waste_items_archive',
+        sa.Column('id', sa.Integer(), autoincrement=False, nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=True),
+        sa.Column('username', sa.String(), nullable=True),
+        sa.Column('description', sa.String(), nullable=True),
+        sa.Column('image_url', sa.String(), nullable=True),
+        sa.Column('category', sa.String(), nullable=True),
+        sa.Column('verified', sa.Boolean(), nullable=True),
+        sa.Column('predicted_category', sa.String(), nullable=True),
+        sa.Column('ai_confidence', sa.Float(), nullable=True),
+        sa.Column('amount_kg', sa.Float(), nullable=True),
+        sa.Column('sold', sa.Boolean(), nullable=True),
+        sa.Column('sold_at', sa.DateTime(), nullable=True),
+        sa.Column('phash', sa.String(length=16), nullable=True),
+        sa.Column('duplicate_of', sa.Integer(), nullable=True),
+        sa.Column('listed_kg', sa.Float(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('archived_at', sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_waste_items_archive_user_id_id', 'waste_items_archive', ['user_id', 'id'], unique=False)
+    # Partitioned by month on Postgres; the archive job creates each month's partition before moving rows into it
+    op.create_table('transactions_archive',
+        sa.Column('id', sa.Integer(), autoincrement=False, nullable=False),
+        sa.Column('timestamp', sa.DateTime(), nullable=False),
+        sa.Column('buyer_id', sa.Integer(), nullable=True),
+        sa.Column('seller_id', sa.Integer(), nullable=True),
+        sa.Column('category', sa.String(), nullable=True),
+        sa.Column('amount_kg', sa.Float(), nullable=True),
+        sa.Column('tokens', sa.Float(), nullable=True),
+        sa.ForeignKeyConstraint(['buyer_id'], ['users.id'], ),
+        sa.ForeignKeyConstraint(['seller_id'], ['users.id'], ),
+        sa.PrimaryKeyConstraint('id', 'timestamp'),
+        postgresql_partition_by='RANGE (timestamp)',
+    )
+    op.create_index('ix_transactions_archive_buyer_id_timestamp', 'transactions_archive', ['buyer_id', 'timestamp', 'id'], unique=False)
+    op.create_index('ix_transactions_archive_seller_id_timestamp', 'transactions_archive', ['seller_id', 'timestamp', 'id'], unique=False)
+    # What the archive job looks up in the hot tables
+    op.create_index(
+        'ix_waste_items_sold_at', 'waste_items', ['sold_at'], unique=False,
+        postgresql_where=sa.text('sold = true'),
+        sqlite_where=sa.text('sold = 1'),
+    )
+    op.create_index('ix_transactions_timestamp', 'transactions', ['timestamp', 'id'], unique=False)
+    # A new upload's duplicate_of may name an archived item, so it can't stay a foreign key
+    with op.batch_alter_table('waste_items') as batch_op:
+        batch_op.drop_constraint('fk_waste_items_duplicate_of', type_='foreignkey')
+
+
+def downgrade() -> None:
+    # Archived rows go back to the hot tables first so nothing is lost
+    op.execute("""
+        INSERT INTO transactions (id, buyer_id, seller_id, category, amount_kg, tokens, timestamp)
+        SELECT id, buyer_id, seller_id, category, amount_kg, tokens, timestamp FROM transactions_archive
+    """)
+    op.execute("""
+        INSERT INTO waste_items (id, user_id, username, description, image_url, category, verified, predicted_category,
+                                 ai_confidence, amount_kg, sold, sold_at, phash, duplicate_of, listed_kg, created_at)
+        SELECT id, user_id, username, description, image_url, category, verified, predicted_category,
+               ai_confidence, amount_kg, sold, sold_at, phash, duplicate_of, listed_kg, created_at FROM waste_items_archive
+    """)
+    with op.batch_alter_table('waste_items') as batch_op:
+        batch_op.create_foreign_key('fk_waste_items_duplicate_of', 'waste_items', ['duplicate_of'], ['id'])
+    op.drop_index('ix_transactions_timestamp', table_name='transactions')
+    op.drop_index('ix_waste_items_sold_at', table_name='waste_items')
+    op.drop_index('ix_transactions_archive_seller_id_timestamp', table_name='transactions_archive')
+    op.drop_index('ix_transactions_archive_buyer_id_timestamp', table_name='transactions_archive')
+    op.drop_table('transactions_archive')
+    op.drop_index('ix_waste_items_archive_user_id_id', table_name='waste_items_archive')
+    op.drop_table('waste_items_archive')
@@ -1,29 +1,32 @@
 from fastapi import APIRouter, Depends, Body, HTTPException, status
 from pydantic import BaseModel
+from sqlalchemy import and_
 from sqlalchemy.orm import Session
-from app.database import SessionLocal
+from app.database import get_db, run_db
 from app.schemas import UserCreate, UserLogin, UserResponse, SendOTPRequest, VerifyOTPRequest
 from app.models.user import User
 from app.auth import get_password_hash, verify_password, create_access_token
 from app.otp import generate_otp, store_otp, verify_otp, send_otp_email
 from datetime import timedelta
 from app.models.transaction import Transaction
+from app.models.token_ledger import TokenLedgerEntry
+from app.crud import archive_crud, token_crud
 from typing import List
 from datetime import datetime
 from fastapi import Query
+from fastapi import Request
+from typing import Optional
+from fastapi.responses import ORJSONResponse
+from app.pagination import PAGE_SIZE, keyset_page, next_cursor_headers
+from app.projection import as_dicts, dumps, project
+from app.export import export_response, utc_naive
+from app.response_cache import cached_json_async, response_cache, user_scope
 
 router = APIRouter()
 
 TOKEN_PRICE = 10  # ₹10 per token
 SELL_FEE = 0.04    # 4% fee
 
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
 class BuyTokensRequest(BaseModel):
     user_id: int
     rupees: float
@@ -33,13 +36,11 @@ class SellTokensRequest(BaseModel):
     tokens: int
 
 @router.post("/auth/send-otp")
-def send_otp(request: SendOTPRequest):
+def send_otp(request: SendOTPRequest, db: Session = Depends(get_db)):
     """Send OTP to user's email for verification"""
     try:
         # Check if user already exists
-        db = SessionLocal()
-        existing_user = db.query(User).filter(User.email == request.email).first()
-        db.close()
+        existing_user = db.query(User.id).filter(User.email == request.email).first()
         
         if existing_user:
             raise HTTPException(
@@ -105,6 +106,8 @@ def signup(user: UserCreate, db: Session = Depends(get_db)):
     db.add(db_user)
     db.commit()
     db.refresh(db_user)
+    # A balance lookup for this id may have been cached as "User not found"
+    response_cache.bump(user_scope(db_user.id))
     
     return UserResponse(
         id=db_user.id,
@@ -157,54 +160,118 @@ def create_user(user: UserCreate, db: Session = Depends(get_db)):
     db.add(db_user)
     db.commit()
     db.refresh(db_user)
+    response_cache.bump(user_scope(db_user.id))
     return {"msg": "User created", "id": db_user.id}
 
 @router.post("/buy-tokens")
 def buy_tokens(data: BuyTokensRequest, db: Session = Depends(get_db)):
     tokens_to_add = float(data.rupees) / TOKEN_PRICE
-    user = db.query(User).filter(User.id == data.user_id).first()
-    if not user:
+    if tokens_to_add <= 0:
+        return {"error": "Amount must be positive"}
+    new_balance = token_crud.adjust(db, data.user_id, tokens_to_add, "buy_tokens")
+    if new_balance is None:
         return {"error": "User not found"}
-    user.tokens += tokens_to_add
     db.commit()
-    return {"tokens_added": tokens_to_add, "new_balance": user.tokens, "cost": tokens_to_add * TOKEN_PRICE}
+    response_cache.bump(user_scope(data.user_id))
+    return {"tokens_added": tokens_to_add, "new_balance": new_balance, "cost": tokens_to_add * TOKEN_PRICE}
 
 @router.post("/sell-tokens")
 def sell_tokens(data: SellTokensRequest, db: Session = Depends(get_db)):
     tokens = float(data.tokens)
-    user = db.query(User).filter(User.id == data.user_id).first()
-    if not user:
-        return {"error": "User not found"}
-    if user.tokens < tokens:
+    if tokens <= 0:
+        return {"error": "Amount must be positive"}
+    # The balance check and the debit are one conditional UPDATE, so concurrent sells can't overdraw
+    new_balance = token_crud.adjust(db, data.user_id, -tokens, "sell_tokens")
+    if new_balance is None:
+        db.rollback()
+        if db.query(User.id).filter(User.id == data.user_id).first() is None:
+            return {"error": "User not found"}
         return {"error": "Not enough tokens"}
     payout = tokens * TOKEN_PRICE * (1 - SELL_FEE)
-    user.tokens -= tokens
     db.commit()
-    return {"tokens_sold": tokens, "payout": payout, "new_balance": user.tokens}
+    response_cache.bump(user_scope(data.user_id))
+    return {"tokens_sold": tokens, "payout": payout, "new_balance": new_balance}
 
 @router.get("/token-balance")
-def token_balance(user_id: int, db: Session = Depends(get_db)):
-    user = db.query(User).filter(User.id == user_id).first()
-    if not user:
+async def token_balance(user_id: int, request: Request):
+    def build(db: Session):
+        tokens = db.query(User.tokens).filter(User.id == user_id).scalar()
+        if tokens is None:
+            return dumps({"error": "User not found"}), {}
+        return dumps({"token_balance": tokens}), {}
+
+    return await cached_json_async(request, [user_scope(user_id)], lambda: run_db(build))
+
+@router.get("/token-balance/history")
+async def token_balance_history(user_id: int, at: datetime):
+    """The balance as of ``at`` (ISO timestamp): the latest snapshot before it plus the ledger entries since."""
+    at = utc_naive(at)
+
+    def read(db: Session):
+        if db.query(User.id).filter(User.id == user_id).first() is None:
+            return None
+        return token_crud.balance_at(db, user_id, at)
+
+    balance = await run_db(read)
+    if balance is None:
         return {"error": "User not found"}
-    return {"token_balance": user.tokens} 
+    return {"user_id": user_id, "at": at, "token_balance": balance}
 
-@router.get("/transaction-history")
-def transaction_history(user_id: int, db: Session = Depends(get_db)):
-    # Fetch transactions where the user is buyer or seller
-    txs = db.query(Transaction).filter((Transaction.buyer_id == user_id) | (Transaction.seller_id == user_id)).order_by(Transaction.timestamp.desc()).all()
-    return [
-        {
-            "id": tx.id,
-            "buyer_id": tx.buyer_id,
-            "seller_id": tx.seller_id,
-            "category": tx.category,
-            "amount_kg": tx.amount_kg,
-            "tokens": tx.tokens,
-            "timestamp": tx.timestamp.isoformat()
-        }
-        for tx in txs
-    ] 
+# Fields a token ledger page can return (?fields=a,b,c)
+LEDGER_FIELDS = {name: getattr(TokenLedgerEntry, name) for name in ("id", "delta", "reason", "reference", "created_at")}
+
+@router.get("/token-ledger", response_class=ORJSONResponse)
+async def token_ledger(user_id: int, cursor: Optional[str] = None, limit: int = PAGE_SIZE, fields: Optional[str] = None):
+    """Every credit and debit of the user's tokens, newest first."""
+    projection = project(fields, LEDGER_FIELDS, extra=[TokenLedgerEntry.created_at, TokenLedgerEntry.id])
+    rows, next_cursor = await run_db(lambda db: keyset_page(
+        db.query(*projection.columns).filter(TokenLedgerEntry.user_id == user_id),
+        [TokenLedgerEntry.created_at, TokenLedgerEntry.id], cursor, limit, descending=True
+    ))
+    return ORJSONResponse(as_dicts(projection, rows), headers=next_cursor_headers(next_cursor))
+
+# Fields a transaction history page can return (?fields=a,b,c)
+TRANSACTION_FIELDS = {name: getattr(Transaction, name) for name in ("id", "buyer_id", "seller_id", "category", "amount_kg", "tokens", "timestamp")}
+
+@router.get("/transaction-history", response_class=ORJSONResponse)
+async def transaction_history(user_id: int, cursor: Optional[str] = None, limit: int = PAGE_SIZE, fields: Optional[str] = None):
+    projection = project(fields, TRANSACTION_FIELDS, extra=[Transaction.timestamp, Transaction.id])
+    # Fetch transactions where the user is buyer or seller, newest first, archived ones included
+    rows, next_cursor = await run_db(lambda db: keyset_page(
+        archive_crud.across(db, Transaction, projection.columns, lambda table: (table.buyer_id == user_id) | (table.seller_id == user_id)),
+        [Transaction.timestamp, Transaction.id], cursor, limit, descending=True
+    ))
+    return ORJSONResponse(as_dicts(projection, rows), headers=next_cursor_headers(next_cursor))
+
+@router.get("/transaction-history/export")
+def export_transaction_history(
+    user_id: int,
+    fmt: str = Query("ndjson", alias="format"),
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    fields: Optional[str] = None,
+):
+    """The user's whole ledger, oldest first, streamed as NDJSON or CSV.
+
+    ``start`` (inclusive) and ``end`` (exclusive) bound the timestamps; both are
+    range conditions on the (buyer_id / seller_id, timestamp) indexes.
+    """
+    projection = project(fields, TRANSACTION_FIELDS)
+    start, end = utc_naive(start), utc_naive(end)
+
+    def where(table):
+        # Bounds go inside each side of the union so both tables' indexes take them
+        condition = (table.buyer_id == user_id) | (table.seller_id == user_id)
+        if start is not None:
+            condition = and_(condition, table.timestamp >= start)
+        if end is not None:
+            condition = and_(condition, table.timestamp < end)
+        return condition
+
+    def query_for(db: Session, columns):
+        return archive_crud.across(db, Transaction, columns, where).order_by(Transaction.timestamp, Transaction.id)
+
+    return export_response(query_for, projection, fmt, f"transactions-{user_id}")
 
 @router.get("/debug/all-users")
 def debug_all_users(db: Session = Depends(get_db)):
@@ -1,36 +1,42 @@
-from fastapi import APIRouter, Depends, Body, UploadFile, File
+from fastapi import APIRouter, Depends, Body, UploadFile, File, Request, Query
 from sqlalchemy.orm import Session
-from app.database import SessionLocal
-from app.schemas import WasteUpload, WasteItemOut
+from app.database import get_db, run_db
+from app.schemas import WasteUpload, WasteItemOut, CategorySummary
 from app.models.waste_item import WasteItem
-from typing import List, Optional
+from typing import Any, Dict, List, NamedTuple, Optional
 from fastapi import Response
-from pydantic import BaseModel
-import requests
-from PIL import Image
-from io import BytesIO
-import torch
-from torchvision import models, transforms
+from pydantic import BaseModel, TypeAdapter
 import os
-import torch.nn.functional as F
 from fastapi import HTTPException
 from app.models.user import User
 from fastapi import HTTPException
-from sqlalchemy import and_
+from sqlalchemy import and_, func
 from app.models.transaction import Transaction
+from app.models.archive import ArchivedTransaction
 from datetime import datetime
 from sqlalchemy import Boolean
+import asyncio
+import orjson
+from fastapi.responses import StreamingResponse
+from app.prediction_cache import PredictionCache, content_digest
+from app.image_fetch import fetch_image_bytes, fetch_image_bytes_async
+from starlette.background import BackgroundTask
+from starlette.concurrency import run_in_threadpool
+from app.inference_workers import INFERENCE_MODE
+from app.model_registry import registry, CLASS_NAMES
+from app.image_decode import ImageDecodeError, decode_image_tensor
+from app.image_hash import PHashIndex, dhash, from_hex, to_hex
+from app.pagination import PAGE_SIZE, keyset_page, next_cursor_headers
+from app.projection import as_dicts, dumps, project
+from app.export import export_response
+from app.response_cache import MARKETPLACE, cached_json_async, response_cache, user_scope
+from app.crud import archive_crud, group_crud, rollup_crud, waste_crud
+from app.models.group import MaterialGroup
+from app.order_book import Lot, order_book
+from app.ingest import INGEST_MAX_JSON_ROWS, CsvFormatError, csv_rows, file_chunks, ingest, json_rows, ndjson, seller_username, spool_body
 
 router = APIRouter()
 
-# Dependency to get DB session
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
 class WasteUpload(BaseModel):
     user_id: int
     username: str
@@ -40,16 +46,20 @@ class WasteUpload(BaseModel):
     force_unverified: Optional[bool] = False
     amount_kg: Optional[float] = None
 
+ALLOWED_IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png")
+VERIFY_MIN_CONFIDENCE = 0.65
+
+def listing_verified(category, prediction, force_unverified=False):
+    # A listing goes on sale only if the model agrees with the seller's category
+    predicted_category, confidence, _ = prediction
+    return not force_unverified and category.lower() == predicted_category.lower() and confidence >= VERIFY_MIN_CONFIDENCE
+
 @router.post("/upload")
 def upload_waste(data: WasteUpload, db: Session = Depends(get_db)):
-    allowed_extensions = (".jpg", ".jpeg", ".png")
-    if not data.image_url.lower().endswith(allowed_extensions):
+    if not data.image_url.lower().endswith(ALLOWED_IMAGE_EXTENSIONS):
         return {"error": "Wrong image type. Only .jpg, .jpeg, .png files are accepted."}
-    predicted_category, confidence, prob_dict = predict_image_from_url(data.image_url)
-    if data.force_unverified:
-        verified = False
-    else:
-        verified = (data.category.lower() == predicted_category.lower() and confidence >= 0.65)
+    (predicted_category, confidence, prob_dict), phash, duplicate = analyze_image_from_url(data.image_url)
+    verified = listing_verified(data.category, (predicted_category, confidence, prob_dict), data.force_unverified)
     waste = WasteItem(
         user_id=data.user_id,
         username=data.username,
@@ -59,71 +69,306 @@ def upload_waste(data: WasteUpload, db: Session = Depends(get_db)):
         verified=verified,
         predicted_category=predicted_category,
         ai_confidence=confidence,
-        amount_kg=data.amount_kg
+        ai_probabilities=prob_dict,
+        amount_kg=data.amount_kg,
+        phash=to_hex(phash),
+        duplicate_of=duplicate.payload.item_id if duplicate is not None else None
     )
     db.add(waste)
+    db.flush()  # assigns the id and the default amount
+    waste.listed_kg = waste.amount_kg
+    if verified and waste.amount_kg and waste.amount_kg > 0:
+        group_crud.add_stock(db, waste)
+    rollup_crud.record_uploads(db, [(waste.user_id, waste.category, waste.amount_kg)], waste.created_at)
     db.commit()
     db.refresh(waste)
-    return {"msg": "Waste uploaded", "id": waste.id, "ai_confidence": confidence, "probabilities": prob_dict}
+    phash_index.add(phash, IndexedImage(waste.id, (predicted_category, confidence, prob_dict)))
+    if waste.verified and waste.amount_kg and waste.amount_kg > 0:
+        order_book.put(waste.category, Lot(waste.id, waste.user_id, waste.amount_kg))
+    response_cache.bump(MARKETPLACE, user_scope(waste.user_id))
+    return {
+        "msg": "Waste uploaded",
+        "id": waste.id,
+        "ai_confidence": confidence,
+        "probabilities": prob_dict,
+        "duplicate_of": waste.duplicate_of
+    }
+
+class BulkUploadRequest(BaseModel):
+    user_id: int
+    items: List[Dict[str, Any]]  # validated per row, so one bad row doesn't reject the batch
+
+@router.post("/upload/bulk")
+async def upload_waste_bulk(data: BulkUploadRequest):
+    """List many lots in one call; streams one NDJSON result line per row, then a summary line.
+
+    Rows take the /upload fields (description, image_url, category, amount_kg,
+    force_unverified) and are classified in batches and inserted a chunk per commit.
+    """
+    if len(data.items) > INGEST_MAX_JSON_ROWS:
+        raise HTTPException(status_code=400, detail=f"At most {INGEST_MAX_JSON_ROWS} rows per JSON batch; use /upload/bulk-csv for larger imports.")
+    username = await seller_username(data.user_id)
+    return StreamingResponse(ndjson(ingest(json_rows(data.items), data.user_id, username)), media_type="application/x-ndjson")
+
+@router.post("/upload/bulk-csv")
+async def upload_waste_bulk_csv(request: Request, user_id: int):
+    """/upload/bulk for a CSV request body (header row with image_url, category and optionally
+    description, amount_kg, force_unverified). The body is spooled to a temporary file, then
+    parsed a chunk at a time, so any file size works."""
+    username = await seller_username(user_id)
+    body = await spool_body(request.stream())
+    try:
+        rows = await csv_rows(file_chunks(body))
+    except CsvFormatError as e:
+        body.close()
+        raise HTTPException(status_code=400, detail=str(e))
+    return StreamingResponse(
+        ndjson(ingest(rows, user_id, username)), media_type="application/x-ndjson", background=BackgroundTask(body.close)
+    )
+
+# Fields a waste item list can return (?fields=a,b,c); profit is computed, not a column
+WASTE_ITEM_FIELDS = {name: getattr(WasteItem, name, None) for name in WasteItemOut.model_fields}
+category_summaries_json = TypeAdapter(List[CategorySummary])
+
+def waste_items_page(query_for, fields, cursor, limit, extra=()):
+    """One keyset page of projected waste items: (projection, rows, next cursor)."""
+    projection = project(fields, WASTE_ITEM_FIELDS, extra=[WasteItem.id, *extra])
+    rows, next_cursor = keyset_page(query_for(projection.columns), [WasteItem.id], cursor, limit)
+    return projection, rows, next_cursor
 
 @router.get("/listings", response_model=List[WasteItemOut])
-def get_waste_listings(user_id: Optional[int] = None, db: Session = Depends(get_db)):
+async def get_waste_listings(request: Request, user_id: Optional[int] = None, cursor: Optional[str] = None, limit: int = PAGE_SIZE, fields: Optional[str] = None):
     if user_id is None:
         return []
-    items = db.query(WasteItem).filter(WasteItem.user_id == user_id).all()
-    for item in items:
-        if hasattr(item, 'sold') and item.sold:
-            # Calculate profit for this item
-            profit = sum(
-                tx.tokens for tx in db.query(Transaction).filter(Transaction.seller_id == item.user_id, Transaction.category == item.category, Transaction.amount_kg > 0, Transaction.seller_id == item.user_id)
-            )
-            item.profit = profit
-    return items
+
+    def build(db: Session):
+        # Sold items may have been archived; the seller's page reads both tables
+        projection, rows, next_cursor = waste_items_page(
+            lambda columns: archive_crud.across(db, WasteItem, columns, lambda table: table.user_id == user_id),
+            fields, cursor, limit, extra=[WasteItem.sold],
+        )
+        items = as_dicts(projection, rows)
+        if "profit" in projection.names:
+            sold_ids = [row.id for row in rows if row.sold]
+            earned = {}
+            if sold_ids:
+                # Profit is what the item's own sales paid: one grouped query per table for the whole page
+                for table in (Transaction, ArchivedTransaction):
+                    for item_id, tokens in db.query(table.waste_item_id, func.sum(table.tokens)).filter(
+                        table.waste_item_id.in_(sold_ids)
+                    ).group_by(table.waste_item_id):
+                        earned[item_id] = earned.get(item_id, 0.0) + (tokens or 0.0)
+            for item, row in zip(items, rows):
+                item["profit"] = earned.get(row.id, 0.0) if row.sold else None
+        return dumps(items), next_cursor_headers(next_cursor)
+
+    return await cached_json_async(request, [user_scope(user_id)], lambda: run_db(build))
+
+@router.get("/listings/export")
+def export_waste_listings(user_id: int, fmt: str = Query("ndjson", alias="format"), sold: Optional[bool] = None, fields: Optional[str] = None):
+    """All of a seller's listings, oldest first, streamed as NDJSON or CSV; ``sold`` keeps only sold or unsold ones."""
+    projection = project(fields, {name: col for name, col in WASTE_ITEM_FIELDS.items() if col is not None})
+
+    def where(table):
+        if sold is None:
+            return table.user_id == user_id
+        return and_(table.user_id == user_id, table.sold == sold)
+
+    def query_for(db: Session, columns):
+        return archive_crud.across(db, WasteItem, columns, where).order_by(WasteItem.id)
+
+    return export_response(query_for, projection, fmt, f"listings-{user_id}")
+
+def marketplace_items_body(projection, rows):
+    items = as_dicts(projection, rows)
+    if "profit" in projection.names:
+        for item in items:
+            item["profit"] = None  # only the seller's own listings carry profit
+    return dumps(items)
 
 @router.get("/marketplace-listings", response_model=List[WasteItemOut])
-def get_marketplace_listings(db: Session = Depends(get_db)):
+async def get_marketplace_listings(request: Request, cursor: Optional[str] = None, limit: int = PAGE_SIZE, fields: Optional[str] = None):
     try:
-        items = db.query(WasteItem).filter(WasteItem.sold == False).all()
-        return items
+        def build(db: Session):
+            projection, rows, next_cursor = waste_items_page(
+                lambda columns: db.query(*columns).filter(WasteItem.sold == False), fields, cursor, limit
+            )
+            return marketplace_items_body(projection, rows), next_cursor_headers(next_cursor)
+
+        return await cached_json_async(request, [MARKETPLACE], lambda: run_db(build))
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"Error in /marketplace-listings: {e}")
         raise HTTPException(status_code=500, detail=f"Internal Server Error: {e}")
 
+def marketplace_filter():
+    # What the marketplace shows and buy-category can sell: verified, unsold stock
+    return and_(WasteItem.sold == False, WasteItem.verified == True, WasteItem.amount_kg > 0)
+
+@router.get("/marketplace-summary", response_model=List[CategorySummary])
+async def get_marketplace_summary(request: Request):
+    """One row per category, read from the maintained material_groups totals; items are fetched per category on demand."""
+    def build(db: Session):
+        groups = db.query(MaterialGroup).filter(MaterialGroup.item_count > 0).order_by(MaterialGroup.material_type).all()
+        return category_summaries_json.dump_json([
+            CategorySummary(
+                category=group.material_type,
+                total_kg=max(group.total_weight or 0.0, 0.0),
+                seller_count=group.seller_count,
+                item_count=group.item_count,
+                thumbnail_url=group.thumbnail_url,
+            )
+            for group in groups
+        ]), {}
+
+    return await cached_json_async(request, [MARKETPLACE], lambda: run_db(build))
+
+STATS_MAX_BUCKETS = 366
+
+@router.get("/stats")
+async def get_stats(request: Request, user_id: Optional[int] = None, category: str = rollup_crud.ALL_CATEGORIES,
+                    series: Optional[str] = None, buckets: int = 24):
+    """Dashboard totals from the rollups: lifetime, this month and last month for the platform
+    (or one category, ``*`` for all) and optionally one user, plus ``buckets`` hourly or daily points if ``series`` is set."""
+    if series is not None and series not in ("hour", "day"):
+        raise HTTPException(status_code=400, detail="series must be hour or day")
+    if not 1 <= buckets <= STATS_MAX_BUCKETS:
+        raise HTTPException(status_code=400, detail=f"buckets must be between 1 and {STATS_MAX_BUCKETS}")
+
+    def build(db: Session):
+        body = {"platform": rollup_crud.stats(db, category, series=series, buckets=buckets)}
+        if user_id is not None:
+            body["user"] = rollup_crud.stats(db, category, user_id=user_id, series=series, buckets=buckets)
+        return dumps(body), {}
+
+    scopes = [MARKETPLACE] if user_id is None else [MARKETPLACE, user_scope(user_id)]
+    return await cached_json_async(request, scopes, lambda: run_db(build))
+
+@router.get("/marketplace-listings/{category}", response_model=List[WasteItemOut])
+async def get_category_listings(category: str, request: Request, cursor: Optional[str] = None, limit: int = PAGE_SIZE, fields: Optional[str] = None):
+    def build(db: Session):
+        projection, rows, next_cursor = waste_items_page(
+            lambda columns: db.query(*columns).filter(marketplace_filter(), WasteItem.category == category), fields, cursor, limit
+        )
+        return marketplace_items_body(projection, rows), next_cursor_headers(next_cursor)
+
+    return await cached_json_async(request, [MARKETPLACE], lambda: run_db(build))
+
 class VerifyRequest(BaseModel):
     user_category: str
     image_url: str
 
-# Model/class setup (adjust as needed)
-class_names = ['glass', 'metal', 'organic', 'paper', 'plastic']
-preprocess = transforms.Compose([
-    transforms.Resize((224, 224)),
-    transforms.ToTensor(),
-])
-def load_model():
-    model = models.resnet18(pretrained=False)
-    model.fc = torch.nn.Linear(model.fc.in_features, len(class_names))
-    MODEL_PATH = os.path.join(os.path.dirname(__file__), '..', 'ai-model', 'waste_classifier.pth')
-    model.load_state_dict(torch.load(MODEL_PATH, map_location='cpu'))
-    model.eval()
-    return model
-model = load_model()
+class_names = CLASS_NAMES
+
+# verify-then-upload sends the same image twice; keyed by URL and by content hash
+prediction_cache = PredictionCache()
+registry.on_load(prediction_cache.set_model_version)
+
+# Perceptual hashes of every listed photo, so re-shot piles reuse the earlier prediction
+class IndexedImage(NamedTuple):
+    item_id: int
+    prediction: Optional[tuple]  # None for items stored before their probabilities were kept
+
+phash_index = PHashIndex()
+
+def load_phash_index(db: Session):
+    # Archived (sold) photos too, so relisting one is still caught
+    columns = [WasteItem.id, WasteItem.phash, WasteItem.predicted_category, WasteItem.ai_confidence, WasteItem.ai_probabilities]
+    with_hash = lambda table: and_(table.phash != None, table.predicted_category != None)
+    rows = archive_crud.across(db, WasteItem, columns, with_hash).all()
+    # Without the stored distribution a match still flags the duplicate, but the model runs
+    # again, so a reused prediction always has the same shape as a fresh one
+    entries = lambda rows: [
+        (from_hex(phash), IndexedImage(item_id, (category, confidence, probabilities) if probabilities else None))
+        for item_id, phash, category, confidence, probabilities in rows
+    ]
+    phash_index.rebuild(entries(rows))
+    # The server is already taking uploads: ones added to the old index while this loaded are re-added
+    last_id = max((row[0] for row in rows), default=0)
+    for phash, payload in entries(db.query(*columns).filter(with_hash(WasteItem), WasteItem.id > last_id).all()):
+        phash_index.add(phash, payload)
+    return phash_index.size
+
+def load_image_tensor(content):
+    # Decodes at reduced resolution straight to the 224x224 input tensor
+    return decode_image_tensor(content)
+
+def classify_image_bytes(content):
+    # The model (or worker pool) is loaded on first use if startup preloading hasn't finished
+    try:
+        if INFERENCE_MODE == "process":
+            return registry.get_pool().predict(content)
+        return registry.get_engine().predict(load_image_tensor(content))
+    except ImageDecodeError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+async def classify_image_bytes_async(content):
+    try:
+        if INFERENCE_MODE == "process":
+            # get_pool and submit may block (first load, waiting for a free slot)
+            pool = await run_in_threadpool(registry.get_pool)
+            future = await run_in_threadpool(pool.submit, content)
+            return await asyncio.wrap_future(future)
+        engine = await run_in_threadpool(registry.get_engine)
+        # Decode off the event loop; the forward pass already runs on the engine thread
+        img_t = await run_in_threadpool(load_image_tensor, content)
+        return await asyncio.wrap_future(engine.submit(img_t))
+    except ImageDecodeError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+def hash_image_bytes(content):
+    try:
+        return dhash(content)
+    except ImageDecodeError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+def reuse_near_duplicate(digest, phash):
+    """Cached prediction for identical bytes, else the stored prediction of a near-duplicate photo."""
+    prediction = prediction_cache.get_by_digest(digest)
+    duplicate = phash_index.nearest(phash)
+    if prediction is None and duplicate is not None:
+        prediction = duplicate.payload.prediction  # may still be None: then the caller classifies
+    return prediction, duplicate
+
+def analyze_image_from_url(url):
+    """Returns (prediction, phash, near-duplicate match or None); the model only runs on new images."""
+    cached = prediction_cache.lookup_url(url)
+    if cached is not None and cached[1] is not None:
+        prediction, phash = cached
+        return prediction, phash, phash_index.nearest(phash)
+    content = fetch_image_bytes(url)
+    digest = content_digest(content)
+    phash = hash_image_bytes(content)
+    prediction, duplicate = reuse_near_duplicate(digest, phash)
+    if prediction is None:
+        prediction = classify_image_bytes(content)
+    prediction_cache.put(url, digest, prediction, phash)
+    return prediction, phash, duplicate
+
+async def analyze_image_from_url_async(url):
+    cached = prediction_cache.lookup_url(url)
+    if cached is not None and cached[1] is not None:
+        prediction, phash = cached
+        return prediction, phash, phash_index.nearest(phash)
+    content = await fetch_image_bytes_async(url)
+    digest = content_digest(content)
+    phash = await run_in_threadpool(hash_image_bytes, content)
+    prediction, duplicate = reuse_near_duplicate(digest, phash)
+    if prediction is None:
+        prediction = await classify_image_bytes_async(content)
+    prediction_cache.put(url, digest, prediction, phash)
+    return prediction, phash, duplicate
 
 def predict_image_from_url(url):
-    response = requests.get(url)
-    img = Image.open(BytesIO(response.content)).convert('RGB')
-    img_t = preprocess(img).unsqueeze(0)
-    with torch.no_grad():
-        output = model(img_t)
-        probs = F.softmax(output, dim=1)
-        conf, pred = torch.max(probs, 1)
-        # Get all class probabilities as a dict
-        prob_dict = {class_names[i]: float(probs[0, i].item()) for i in range(len(class_names))}
-    return class_names[pred.item()], float(conf.item()), prob_dict
+    return analyze_image_from_url(url)[0]
 
-@router.post("/verify-category")
-async def verify_category(data: VerifyRequest):
-    predicted_category, confidence, prob_dict = predict_image_from_url(data.image_url)
-    verified = (data.user_category.lower() == predicted_category.lower())
+async def predict_image_from_url_async(url):
+    return (await analyze_image_from_url_async(url))[0]
+
+def verification_result(user_category, prediction):
+    predicted_category, confidence, prob_dict = prediction
+    verified = (user_category.lower() == predicted_category.lower())
     return {
         "verified": verified,
         "predicted_category": predicted_category,
@@ -131,6 +376,57 @@ async def verify_category(data: VerifyRequest):
         "probabilities": prob_dict
     }
 
+@router.post("/verify-category")
+async def verify_category(data: VerifyRequest):
+    prediction = await predict_image_from_url_async(data.image_url)
+    return verification_result(data.user_category, prediction)
+
+VERIFY_BATCH_MAX_ITEMS = int(os.getenv("VERIFY_BATCH_MAX_ITEMS", "200"))
+VERIFY_BATCH_CONCURRENCY = int(os.getenv("VERIFY_BATCH_CONCURRENCY", "16"))  # downloads in flight per request
+
+@router.post("/verify-category/batch")
+async def verify_category_batch(items: List[VerifyRequest]):
+    """Verify many images in one call; streams one NDJSON line per item as soon as it finishes.
+
+    Items are fetched concurrently and their forward passes are batched by the inference
+    engine. Each line carries the item's ``index``; failures are reported per item.
+    """
+    if len(items) > VERIFY_BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=400, detail=f"At most {VERIFY_BATCH_MAX_ITEMS} images per batch.")
+    limit = asyncio.Semaphore(VERIFY_BATCH_CONCURRENCY)
+
+    async def verify_one(index, item):
+        async with limit:
+            try:
+                prediction = await predict_image_from_url_async(item.image_url)
+                return {"index": index, "image_url": item.image_url, **verification_result(item.user_category, prediction)}
+            except HTTPException as e:
+                return {"index": index, "image_url": item.image_url, "error": e.detail, "status_code": e.status_code}
+            except Exception as e:
+                print(f"[ERROR] verify-category/batch item {index}: {e}")
+                return {"index": index, "image_url": item.image_url, "error": "Could not classify image", "status_code": 500}
+
+    async def results():
+        tasks = [asyncio.ensure_future(verify_one(i, item)) for i, item in enumerate(items)]
+        try:
+            for finished in asyncio.as_completed(tasks):
+                yield orjson.dumps(await finished) + b"\n"
+        finally:
+            # Client went away: don't keep downloading for nobody
+            for task in tasks:
+                task.cancel()
+
+    return StreamingResponse(results(), media_type="application/x-ndjson")
+
+@router.get("/inference/stats")
+def inference_stats():
+    return {
+        **(registry.predictor_stats() or {}),
+        "model": registry.stats(),
+        "cache": prediction_cache.stats(),
+        "phash_index_size": phash_index.size,
+    }
+
 class BuyCategoryRequest(BaseModel):
     buyer_id: int
     category: str
@@ -139,69 +435,12 @@ class BuyCategoryRequest(BaseModel):
 @router.post("/buy-category")
 def buy_category(data: BuyCategoryRequest, db: Session = Depends(get_db)):
     try:
-        items = db.query(WasteItem).filter(and_(WasteItem.category == data.category, WasteItem.verified == True, WasteItem.amount_kg > 0)).all()
-        if not items:
-            raise HTTPException(status_code=400, detail=f"No available {data.category} items to buy.")
-        total_available = sum(i.amount_kg for i in items)
-        if data.quantity > total_available:
-            raise HTTPException(status_code=400, detail=f"Not enough {data.category} available. Requested: {data.quantity}, Available: {total_available}")
-        tokens_to_deduct = float(data.quantity)
-        if tokens_to_deduct <= 0:
-            raise HTTPException(status_code=400, detail="You must buy at least 0.01 kg (0.01 token). Please enter a valid quantity.")
-        buyer = db.query(User).filter(User.id == data.buyer_id).first()
-        if not buyer:
-            raise HTTPException(status_code=404, detail="Buyer not found. Please log in again.")
-        if buyer.tokens < tokens_to_deduct:
-            raise HTTPException(status_code=400, detail=f"You do not have enough tokens. You have {buyer.tokens}, but need {tokens_to_deduct}.")
-        print(f"[DEBUG] Buyer before: id={buyer.id}, tokens={buyer.tokens}")
-        buyer.tokens -= tokens_to_deduct
-        print(f"[DEBUG] Buyer after deduction: id={buyer.id}, tokens={buyer.tokens}")
-        sellers_paid = {}
-        qty_to_buy = data.quantity
-        tokens_remaining = tokens_to_deduct
-        shares = [(item, item.amount_kg / total_available) for item in items]
-        for idx, (item, share) in enumerate(shares):
-            seller = db.query(User).filter(User.id == item.user_id).first()
-            if not seller:
-                continue
-            # Distribute float tokens to sellers
-            if idx == len(shares) - 1:
-                # Last seller gets the remainder to ensure total matches exactly
-                take_qty = qty_to_buy
-                tokens_for_seller = tokens_remaining
-            else:
-                tokens_for_seller = round(share * data.quantity, 6)  # use more precision
-                tokens_for_seller = min(tokens_for_seller, tokens_remaining)
-                take_qty = min(item.amount_kg, tokens_for_seller)
-            if tokens_for_seller <= 0:
-                continue
-            sellers_paid.setdefault(seller.id, 0.0)
-            sellers_paid[seller.id] += tokens_for_seller
-            seller.tokens += tokens_for_seller
-            item.amount_kg -= take_qty
-            if item.amount_kg <= 0:
-                item.sold = True
-                item.sold_at = datetime.utcnow()
-            tokens_remaining -= tokens_for_seller
-            qty_to_buy -= take_qty
-            db.add(Transaction(
-                buyer_id=data.buyer_id,
-                seller_id=seller.id,
-                category=data.category,
-                amount_kg=take_qty,
-                tokens=tokens_for_seller,
-                timestamp=datetime.utcnow()
-            ))
-        db.commit()
-        print(f"[DEBUG] Buyer final: id={buyer.id}, tokens={buyer.tokens}")
-        return {
-            "msg": f"Purchased {tokens_to_deduct} kg of {data.category}",
-            "tokens_deducted": tokens_to_deduct,
-            "sellers_paid": sellers_paid,
-            "buyer_new_balance": buyer.tokens
-        }
+        result = waste_crud.buy_category(db, data.buyer_id, data.category, data.quantity)
+        response_cache.bump(MARKETPLACE, user_scope(data.buyer_id), *[user_scope(seller_id) for seller_id in result["sellers_paid"]])
+        return result
     except HTTPException as e:
         raise e
     except Exception as e:
+        db.rollback()
         print(f"[ERROR] Unexpected error in buy_category: {e}")
-        raise HTTPException(status_code=500, detail="An unexpected error occurred. Please try again later.")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail="An unexpected error occurred. Please try again later.")
@@ -0,0 +1,129 @@
+"""Moves sold waste items and old transactions out of the hot tables, a batch per transaction.
+
+Each batch copies up to ARCHIVE_BATCH_SIZE rows into the archive table and
+deletes them from the hot one, then commits, so row locks last one batch and
+marketplace writes never wait on a long archive run. History reads (seller
+listings, transaction history and exports, rollup backfill) UNION the two
+tables through ``across``.
+"""
+import os
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional
+
+from dotenv import load_dotenv
+from sqlalchemy import func, insert, literal, select, text
+from sqlalchemy.orm import Query, Session
+
+from app.models.archive import ArchivedTransaction, ArchivedWasteItem
+from app.models.transaction import Transaction
+from app.models.waste_item import WasteItem
+
+load_dotenv()
+
+ARCHIVE_AFTER_DAYS = float(os.getenv("ARCHIVE_AFTER_DAYS", "90"))
+ARCHIVE_BATCH_SIZE = int(os.getenv("ARCHIVE_BATCH_SIZE", "500"))
+ARCHIVE_INTERVAL = float(os.getenv("ARCHIVE_INTERVAL", "3600"))  # seconds; 0 disables the background job
+
+ARCHIVE_OF = {WasteItem: ArchivedWasteItem, Transaction: ArchivedTransaction}
+
+
+def archived_columns(model, columns: list) -> list:
+    """``columns`` of a hot model, as the same columns of its archive table."""
+    archive = ARCHIVE_OF[model]
+    return [getattr(archive, col.key) for col in columns]
+
+
+def across(db: Session, model, columns: list, where: Callable) -> Query:
+    """SELECT ``columns`` from the hot table UNION ALL the same from its archive.
+
+    ``where(table)`` gives the filter for either table. Further filters and
+    ORDER BY can be written against the hot model's columns; SQLAlchemy adapts
+    them to the union, and both Postgres and SQLite push them into each side.
+    """
+    archive = ARCHIVE_OF[model]
+    hot = db.query(*columns).filter(where(model))
+    return hot.union_all(db.query(*archived_columns(model, columns)).filter(where(archive)))
+
+
+def _month(at: datetime) -> datetime:
+    return at.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def _next_month(start: datetime) -> datetime:
+    return start.replace(year=start.year + 1, month=1) if start.month == 12 else start.replace(month=start.month + 1)
+
+
+def ensure_partitions(db: Session, first: datetime, last: datetime) -> None:
+    """Create the monthly transactions_archive partitions covering first..last (Postgres only)."""
+    if db.get_bind().dialect.name != "postgresql":
+        return
+    start = _month(first)
+    while start <= last:
+        end = _next_month(start)
+        db.execute(text(
+            f"CREATE TABLE IF NOT EXISTS transactions_archive_{start:%Y_%m} PARTITION OF transactions_archive "
+            f"FOR VALUES FROM ('{start:%Y-%m-%d}') TO ('{end:%Y-%m-%d}')"
+        ))
+        start = end
+    db.commit()  # own short transaction, before the batch takes any row locks
+
+
+def _move(db: Session, model, ids: List[int], extra: Optional[Dict[str, object]] = None) -> None:
+    archive = ARCHIVE_OF[model]
+    names = [col.key for col in model.__table__.columns if col.key in archive.__table__.columns]
+    extra = extra or {}
+    db.execute(insert(archive.__table__).from_select(
+        names + list(extra),
+        select(*[model.__table__.c[name] for name in names], *[literal(value) for value in extra.values()]).where(model.id.in_(ids)),
+    ))
+    db.query(model).filter(model.id.in_(ids)).delete(synchronize_session=False)
+
+
+def archive_sold_items(db: Session, older_than: datetime, batch_size: int = ARCHIVE_BATCH_SIZE) -> int:
+    """Archive items sold before ``older_than`` (or before sold_at was recorded); returns how many moved."""
+    # Never the newest row: SQLite hands out max(id) + 1, so deleting it would let a new item reuse its id
+    newest = db.query(func.max(WasteItem.id)).scalar()
+    moved = 0
+    while newest is not None:
+        ids = [row.id for row in db.query(WasteItem.id).filter(
+            WasteItem.sold == True,
+            (WasteItem.sold_at < older_than) | (WasteItem.sold_at == None),
+            WasteItem.id < newest,
+        ).limit(batch_size).with_for_update(skip_locked=True).all()]
+        if not ids:
+            break
+        _move(db, WasteItem, ids, {"archived_at": datetime.utcnow()})
+        db.commit()
+        moved += len(ids)
+    return moved
+
+
+def archive_transactions(db: Session, older_than: datetime, batch_size: int = ARCHIVE_BATCH_SIZE) -> int:
+    """Archive transactions made before ``older_than``; returns how many moved."""
+    newest = db.query(func.max(Transaction.id)).scalar()
+    moved = 0
+    while newest is not None:
+        rows = db.query(Transaction.id, Transaction.timestamp).filter(
+            Transaction.timestamp < older_than, Transaction.id < newest
+        ).order_by(Transaction.timestamp, Transaction.id).limit(batch_size).all()
+        if not rows:
+            break
+        ensure_partitions(db, rows[0].timestamp, rows[-1].timestamp)
+        ids = [row.id for row in db.query(Transaction.id).filter(
+            Transaction.id.in_([row.id for row in rows])
+        ).with_for_update(skip_locked=True).all()]
+        if not ids:
+            break
+        _move(db, Transaction, ids)
+        db.commit()
+        moved += len(ids)
+    return moved
+
+
+def archive(db: Session, after_days: float = ARCHIVE_AFTER_DAYS, batch_size: int = ARCHIVE_BATCH_SIZE) -> Dict[str, int]:
+    """One archive run over both tables; safe to run alongside the server and other runs."""
+    older_than = datetime.utcnow() - timedelta(days=after_days)
+    return {
+        "waste_items": archive_sold_items(db, older_than, batch_size),
+        "transactions": archive_transactions(db, older_than, batch_size),
+    }
@@ -0,0 +1,128 @@
+from collections import defaultdict
+from typing import Iterable, List, Optional, Sequence
+
+from sqlalchemy import and_, case, func, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.models.group import MaterialGroup
+from app.models.waste_item import WasteItem
+
+
+def available_filter():
+    # Stock buy-category can sell; must match what upload and buy-category count in and out
+    return and_(WasteItem.verified == True, WasteItem.amount_kg > 0)
+
+
+def _ensure_group(db: Session, category: str) -> None:
+    if db.query(MaterialGroup.id).filter(MaterialGroup.material_type == category).first() is not None:
+        return
+    try:
+        with db.begin_nested():
+            db.add(MaterialGroup(material_type=category, total_weight=0.0, seller_count=0, item_count=0))
+    except IntegrityError:
+        pass  # another request created it first
+
+
+def _lock_group(db: Session, category: str) -> None:
+    # Serializes the seller-count checks of concurrent uploads/purchases in one category,
+    # so each sees the other's committed lots (READ COMMITTED re-reads per statement)
+    db.query(MaterialGroup.id).filter(MaterialGroup.material_type == category).with_for_update().first()
+
+
+def add_stock(db: Session, item: WasteItem) -> None:
+    """Count a newly listed (flushed, not yet committed) item into its category's totals."""
+    add_stock_many(db, [item])
+
+
+def add_stock_many(db: Session, items: Sequence) -> None:
+    """add_stock for a batch of new listings: one locked update per category.
+
+    ``items`` need ``id``, ``user_id``, ``category``, ``amount_kg`` and ``image_url``.
+    """
+    by_category = defaultdict(list)
+    for item in items:
+        by_category[item.category].append(item)
+    groups = MaterialGroup.__table__
+    # Fixed lock order, so two batches touching the same categories can't deadlock
+    for category in sorted(by_category):
+        batch = by_category[category]
+        _ensure_group(db, category)
+        _lock_group(db, category)
+        sellers = {item.user_id for item in batch}
+        had_stock = {row[0] for row in db.query(WasteItem.user_id).filter(
+            available_filter(), WasteItem.category == category, WasteItem.user_id.in_(sellers),
+            WasteItem.id.notin_([item.id for item in batch]),
+        ).distinct().all()}
+        db.execute(
+            update(groups).where(groups.c.material_type == category).values(
+                total_weight=groups.c.total_weight + sum(item.amount_kg for item in batch),
+                item_count=groups.c.item_count + len(batch),
+                seller_count=groups.c.seller_count + len(sellers - had_stock),
+                # A category coming back into stock takes the new listing's photo
+                thumbnail_url=case((groups.c.item_count == 0, batch[0].image_url), else_=func.coalesce(groups.c.thumbnail_url, batch[0].image_url)),
+            )
+        )
+
+
+def remove_stock(db: Session, category: str, kg: float, sold_out_sellers: Iterable[int], sold_out_items: int) -> None:
+    """Take a purchase out of the totals. Call after the lot updates, in the same transaction.
+
+    ``sold_out_sellers`` are the sellers of lots that just emptied; those with no
+    other available lot in the category stop counting as sellers.
+    """
+    candidates = set(sold_out_sellers)
+    still_selling = set()
+    if candidates:
+        _lock_group(db, category)
+        still_selling = {row[0] for row in db.query(WasteItem.user_id).filter(
+            available_filter(), WasteItem.category == category, WasteItem.user_id.in_(candidates)
+        ).distinct().all()}
+    groups = MaterialGroup.__table__
+    db.execute(
+        update(groups).where(groups.c.material_type == category).values(
+            total_weight=groups.c.total_weight - kg,
+            item_count=groups.c.item_count - sold_out_items,
+            seller_count=groups.c.seller_count - len(candidates - still_selling),
+        )
+    )
+
+
+def available_kg(db: Session, category: str) -> Optional[float]:
+    return db.query(MaterialGroup.total_weight).filter(MaterialGroup.material_type == category).scalar()
+
+
+def reconcile(db: Session) -> List[dict]:
+    """Rebuild every category's totals from waste_items; returns the rows that had drifted."""
+    rows = db.query(
+        WasteItem.category,
+        func.sum(WasteItem.amount_kg),
+        func.count(func.distinct(WasteItem.user_id)),
+        func.count(WasteItem.id),
+        func.min(WasteItem.id),
+    ).filter(available_filter()).group_by(WasteItem.category).all()
+    first_ids = [first_id for *_, first_id in rows]
+    thumbnails = dict(db.query(WasteItem.id, WasteItem.image_url).filter(WasteItem.id.in_(first_ids)).all()) if first_ids else {}
+    actual = {
+        category: (float(total or 0.0), sellers, items, thumbnails.get(first_id))
+        for category, total, sellers, items, first_id in rows
+    }
+    groups = {g.material_type: g for g in db.query(MaterialGroup).with_for_update().all()}
+    drift = []
+    for category in sorted(set(actual) | set(groups)):
+        total, sellers, items, thumbnail = actual.get(category, (0.0, 0, 0, None))
+        group = groups.get(category)
+        if group is None:
+            group = MaterialGroup(material_type=category)
+            db.add(group)
+        before = (group.total_weight or 0.0, group.seller_count or 0, group.item_count or 0)
+        if abs(before[0] - total) > 1e-6 or before[1:] != (sellers, items):
+            drift.append({
+                "category": category,
+                "stored": {"total_kg": before[0], "seller_count": before[1], "item_count": before[2]},
+                "actual": {"total_kg": total, "seller_count": sellers, "item_count": items},
+            })
+        group.total_weight, group.seller_count, group.item_count = total, sellers, items
+        group.thumbnail_url = thumbnail if items else group.thumbnail_url
+    db.commit()
+    return drift
@@ -0,0 +1,311 @@
+"""Hourly, daily, monthly and lifetime activity rollups per category and per user.
+
+Upload and buy-category add their own numbers to the buckets they fall in, in
+the same transaction, so reading a dashboard is a handful of index lookups
+instead of a scan of waste_items and transactions. Platform totals (category
+"*") are summed from the per-category rows when read, so no single row is
+written by every upload and purchase.
+"""
+from collections import defaultdict
+from datetime import datetime
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy import func, insert, text, tuple_, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Query, Session
+
+from app.models.archive import ArchivedTransaction, ArchivedWasteItem
+from app.models.rollup import CategoryRollup, UserRollup
+from app.models.transaction import Transaction
+from app.models.waste_item import WasteItem
+
+PERIODS = ("hour", "day", "month", "all")
+ALL_CATEGORIES = "*"
+LIFETIME = datetime(1970, 1, 1)  # bucket_start of the "all" period
+
+CATEGORY_COUNTERS = ("items_uploaded", "kg_uploaded", "kg_sold", "tokens_traded", "active_sellers")
+SUMMED_COUNTERS = CATEGORY_COUNTERS[:-1]  # active_sellers can't be summed across categories
+USER_COUNTERS = ("items_uploaded", "kg_uploaded", "kg_sold", "tokens_earned", "kg_bought", "tokens_spent")
+
+
+def bucket_start(period: str, at: Optional[datetime]) -> Optional[datetime]:
+    if period == "all":
+        return LIFETIME
+    if at is None:
+        return None  # rows from before timestamps were kept only count toward the lifetime bucket
+    if period == "hour":
+        return at.replace(minute=0, second=0, microsecond=0)
+    if period == "day":
+        return at.replace(hour=0, minute=0, second=0, microsecond=0)
+    if period == "month":
+        return at.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    raise ValueError(f"Unknown period {period}")
+
+
+class _Changes:
+    """Counter increments for one write, keyed like the rollup tables, plus who acted as a seller.
+
+    Users get a "*" row as well as the category's; categories don't (see ``platform``).
+    """
+
+    def __init__(self):
+        self.users: Dict[Tuple[int, str], Dict[str, float]] = defaultdict(lambda: defaultdict(float))
+        self.categories: Dict[str, Dict[str, float]] = defaultdict(lambda: defaultdict(float))
+        self.sellers: Dict[int, Set[str]] = defaultdict(set)
+
+    def user(self, user_id: int, category: str, **counters) -> None:
+        for c in (category, ALL_CATEGORIES):
+            for name, value in counters.items():
+                self.users[(user_id, c)][name] += value
+
+    def category(self, category: str, **counters) -> None:
+        for name, value in counters.items():
+            self.categories[category][name] += value
+
+    def seller(self, user_id: int, category: str) -> None:
+        self.sellers[user_id].update((category, ALL_CATEGORIES))
+
+
+def _upsert(db: Session, model, key: Tuple[str, ...], counters: Tuple[str, ...], rows: List[dict]) -> None:
+    """INSERT the rows, or add their counters onto the existing ones (Postgres and SQLite ON CONFLICT)."""
+    if not rows:
+        return
+    dialect = db.get_bind().dialect.name
+    dialect_insert = {"postgresql": postgresql.insert, "sqlite": sqlite.insert}.get(dialect)
+    if dialect_insert is None:
+        raise ValueError(f"Rollup upserts not supported for {dialect}")
+    table = model.__table__
+    stmt = dialect_insert(table)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=list(key),
+        set_={name: table.c[name] + stmt.excluded[name] for name in counters},
+    )
+    # Same key order in every transaction, so concurrent writers lock rows in the same order
+    db.execute(stmt, sorted(rows, key=lambda r: tuple(r[k] for k in key)))
+
+
+def _apply(db: Session, changes: _Changes, at: datetime) -> None:
+    buckets = [(period, bucket_start(period, at)) for period in PERIODS]
+    buckets = [(period, start) for period, start in buckets if start is not None]
+    _upsert(db, UserRollup, ("period", "user_id", "category", "bucket_start"), USER_COUNTERS, [
+        {"period": period, "bucket_start": start, "user_id": user_id, "category": category, "active": False,
+         **{name: counters.get(name, 0) for name in USER_COUNTERS}}
+        for period, start in buckets
+        for (user_id, category), counters in changes.users.items()
+    ])
+    if changes.sellers:
+        # A seller's first activity in a bucket flips their row to active; only those count as new active sellers.
+        # Their "*" row flips too, which is what platform active_sellers counts
+        rollups = UserRollup.__table__
+        keys = [(user_id, category) for user_id, categories in changes.sellers.items() for category in categories]
+        activated = db.execute(
+            update(rollups)
+            .where(
+                tuple_(rollups.c.period, rollups.c.bucket_start).in_(buckets),
+                tuple_(rollups.c.user_id, rollups.c.category).in_(keys),
+                rollups.c.active == False,
+            )
+            .values(active=True)
+            .returning(rollups.c.period, rollups.c.category)
+        ).all()
+        newly_active = defaultdict(int)
+        for period, category in activated:
+            newly_active[(period, category)] += 1
+    else:
+        newly_active = {}
+    _upsert(db, CategoryRollup, ("period", "category", "bucket_start"), CATEGORY_COUNTERS, [
+        {"period": period, "bucket_start": start, "category": category,
+         **{name: counters.get(name, 0) for name in CATEGORY_COUNTERS},
+         "active_sellers": newly_active.get((period, category), 0)}
+        for period, start in buckets
+        for category, counters in changes.categories.items()
+    ])
+
+
+def record_uploads(db: Session, uploads: Iterable[Tuple[int, str, float]], at: Optional[datetime] = None) -> None:
+    """Count new listings, as (user_id, category, kg), into the rollups; the caller commits."""
+    changes = _Changes()
+    for user_id, category, kg in uploads:
+        kg = kg or 0.0
+        changes.user(user_id, category, items_uploaded=1, kg_uploaded=kg)
+        changes.category(category, items_uploaded=1, kg_uploaded=kg)
+        changes.seller(user_id, category)
+    if changes.users:
+        _apply(db, changes, at or datetime.utcnow())
+
+
+def record_purchase(db: Session, buyer_id: int, category: str, sellers_paid: Dict[int, float], at: datetime) -> None:
+    """Count a buy-category purchase (kg per seller, paid 1 token/kg) into the rollups; the caller commits."""
+    changes = _Changes()
+    total = sum(sellers_paid.values())
+    changes.user(buyer_id, category, kg_bought=total, tokens_spent=total)
+    for seller_id, kg in sellers_paid.items():
+        changes.user(seller_id, category, kg_sold=kg, tokens_earned=kg)
+        changes.seller(seller_id, category)
+    changes.category(category, kg_sold=total, tokens_traded=total)
+    _apply(db, changes, at)
+
+
+def rollup_rows(items: Iterable[tuple], transactions: Iterable[tuple]) -> Tuple[List[dict], List[dict]]:
+    """Every rollup row for the given history, as (category rows, user rows).
+
+    ``items`` are (user_id, category, listed kg, created_at) and ``transactions``
+    (buyer_id, seller_id, category, kg, tokens, timestamp).
+    """
+    categories: Dict[tuple, Dict[str, float]] = defaultdict(lambda: defaultdict(float))
+    users: Dict[tuple, Dict[str, float]] = defaultdict(lambda: defaultdict(float))
+    active: Set[tuple] = set()
+
+    def add(at, user_id, category, seller, user_counters, category_counters):
+        for period in PERIODS:
+            start = bucket_start(period, at)
+            if start is None:
+                continue
+            for name, value in category_counters.items():
+                categories[(period, category, start)][name] += value
+            for c in (category, ALL_CATEGORIES):
+                for name, value in user_counters.items():
+                    users[(period, user_id, c, start)][name] += value
+                if seller:
+                    active.add((period, user_id, c, start))
+
+    for user_id, category, kg, created_at in items:
+        kg = kg or 0.0
+        add(created_at, user_id, category, True, {"items_uploaded": 1, "kg_uploaded": kg}, {"items_uploaded": 1, "kg_uploaded": kg})
+    for buyer_id, seller_id, category, kg, tokens, timestamp in transactions:
+        kg, tokens = kg or 0.0, tokens or 0.0
+        add(timestamp, seller_id, category, True, {"kg_sold": kg, "tokens_earned": tokens}, {"kg_sold": kg, "tokens_traded": tokens})
+        add(timestamp, buyer_id, category, False, {"kg_bought": kg, "tokens_spent": tokens}, {})
+    for period, user_id, category, start in active:
+        if category != ALL_CATEGORIES:
+            categories[(period, category, start)]["active_sellers"] += 1
+
+    category_rows = [
+        {"period": period, "category": category, "bucket_start": start, **{name: counters.get(name, 0) for name in CATEGORY_COUNTERS}}
+        for (period, category, start), counters in categories.items()
+    ]
+    user_rows = [
+        {"period": period, "user_id": user_id, "category": category, "bucket_start": start,
+         "active": (period, user_id, category, start) in active, **{name: counters.get(name, 0) for name in USER_COUNTERS}}
+        for (period, user_id, category, start), counters in users.items()
+    ]
+    return category_rows, user_rows
+
+
+def _pause_writers(db: Session) -> None:
+    """Make uploads, purchases and archiving wait until this transaction ends, so it reads a fixed history."""
+    dialect = db.get_bind().dialect.name
+    if dialect == "sqlite":
+        db.connection().exec_driver_sql("BEGIN IMMEDIATE")
+    elif dialect == "postgresql":
+        tables = ", ".join(model.__tablename__ for model in (WasteItem, ArchivedWasteItem, Transaction, ArchivedTransaction))
+        db.execute(text(f"LOCK TABLE {tables} IN SHARE MODE"))
+
+
+def backfill(db: Session, batch_size: int = 1000) -> Tuple[int, int]:
+    """Rebuild every rollup from waste_items and transactions, archived rows included; returns (category rows, user rows).
+
+    Streams both tables once and aggregates in memory (one entry per rollup row).
+    Writers wait for it to finish rather than having their increments overwritten,
+    so it can run with the server up.
+    """
+    _pause_writers(db)
+    items = (
+        row
+        for table in (WasteItem, ArchivedWasteItem)
+        for row in db.query(table.user_id, table.category, func.coalesce(table.listed_kg, table.amount_kg), table.created_at).yield_per(batch_size)
+    )
+    transactions = (
+        row
+        for table in (Transaction, ArchivedTransaction)
+        for row in db.query(table.buyer_id, table.seller_id, table.category, table.amount_kg, table.tokens, table.timestamp).yield_per(batch_size)
+    )
+    category_rows, user_rows = rollup_rows(items, transactions)
+    db.query(UserRollup).delete()
+    db.query(CategoryRollup).delete()
+    for model, rows in ((CategoryRollup, category_rows), (UserRollup, user_rows)):
+        for i in range(0, len(rows), batch_size):
+            db.execute(insert(model), rows[i:i + batch_size])
+    db.commit()
+    return len(category_rows), len(user_rows)
+
+
+def _totals(row, counters) -> dict:
+    return {name: (getattr(row, name) if row is not None else 0) for name in counters}
+
+
+def _previous_month(start: datetime) -> datetime:
+    if start.month == 1:
+        return start.replace(year=start.year - 1, month=12)
+    return start.replace(month=start.month - 1)
+
+
+def platform_totals(db: Session, period: str, where: Callable) -> Query:
+    """Every category's counters summed per bucket of ``period``; ``where(bucket_start)`` picks the buckets."""
+    return db.query(
+        CategoryRollup.bucket_start, *[func.sum(getattr(CategoryRollup, name)).label(name) for name in SUMMED_COUNTERS]
+    ).filter(CategoryRollup.period == period, where(CategoryRollup.bucket_start)).group_by(CategoryRollup.bucket_start)
+
+
+def platform_sellers(db: Session, period: str, where: Callable) -> Query:
+    """Distinct active sellers per bucket of ``period``: the users' active "*" rows, so nobody counts twice."""
+    return db.query(UserRollup.bucket_start, func.count().label("active_sellers")).filter(
+        UserRollup.period == period, UserRollup.category == ALL_CATEGORIES, UserRollup.active == True,
+        where(UserRollup.bucket_start),
+    ).group_by(UserRollup.bucket_start)
+
+
+def _platform(db: Session, period: str, where: Callable, limit: Optional[int] = None) -> Dict[datetime, dict]:
+    totals = platform_totals(db, period, where).order_by(CategoryRollup.bucket_start.desc())
+    if limit is not None:
+        totals = totals.limit(limit)
+    rows = {row.bucket_start: {**_totals(row, SUMMED_COUNTERS), "active_sellers": 0} for row in totals}
+    if rows:
+        # Any bucket with active sellers has category rows too, so the range covers exactly these buckets
+        sellers = platform_sellers(db, period, lambda column: column.between(min(rows), max(rows)))
+        for start, count in sellers:
+            rows[start]["active_sellers"] = count
+    return rows
+
+
+def stats(db: Session, category: str = ALL_CATEGORIES, user_id: Optional[int] = None, series: Optional[str] = None,
+          buckets: int = 24, now: Optional[datetime] = None) -> dict:
+    """Lifetime, this-month and last-month totals, and optionally the latest ``buckets`` hourly or daily buckets.
+
+    Reads at most 3 + ``buckets`` rows through the rollups' indexes, however much
+    history there is; platform totals read one row per category per bucket instead.
+    """
+    now = now or datetime.utcnow()
+    this_month = bucket_start("month", now)
+    if user_id is None and category == ALL_CATEGORIES:
+        def one(period, start):
+            return _platform(db, period, lambda column: column == start).get(start, _totals(None, CATEGORY_COUNTERS))
+
+        def latest(period):
+            rows = _platform(db, period, lambda column: column <= now, limit=buckets)
+            return [{"bucket_start": start, **rows[start]} for start in sorted(rows)]
+    else:
+        if user_id is None:
+            model, counters, scope = CategoryRollup, CATEGORY_COUNTERS, [CategoryRollup.category == category]
+        else:
+            model, counters, scope = UserRollup, USER_COUNTERS, [UserRollup.user_id == user_id, UserRollup.category == category]
+
+        def one(period, start):
+            return _totals(db.query(model).filter(*scope, model.period == period, model.bucket_start == start).first(), counters)
+
+        def latest(period):
+            rows = db.query(model).filter(*scope, model.period == period, model.bucket_start <= now).order_by(
+                model.bucket_start.desc()
+            ).limit(buckets).all()
+            return [{"bucket_start": row.bucket_start, **_totals(row, counters)} for row in reversed(rows)]
+
+    result = {
+        "category": category,
+        "user_id": user_id,
+        "all_time": one("all", LIFETIME),
+        "this_month": one("month", this_month),
+        "last_month": one("month", _previous_month(this_month)),
+    }
+    if series is not None:
+        result["series"] = latest(series)
+    return result
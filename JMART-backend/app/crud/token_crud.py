@@ -0,0 +1,164 @@
+"""Every change to users.tokens goes through here: an atomic increment plus a token_ledger entry.
+
+Snapshots of each active user's balance are taken periodically, so a balance
+at any past time is its latest snapshot plus one range sum over the ledger,
+never a replay of the user's whole history.
+"""
+import os
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, NamedTuple, Optional
+
+from dotenv import load_dotenv
+from sqlalchemy import and_, bindparam, func, insert, text, update
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session
+
+from app.models.token_ledger import BalanceSnapshot, TokenLedgerEntry
+from app.models.user import User
+
+load_dotenv()
+
+BALANCE_SNAPSHOT_INTERVAL = float(os.getenv("BALANCE_SNAPSHOT_INTERVAL", "3600"))  # seconds; 0 disables the background job
+# Entries are stamped just before their transaction commits; a snapshot only covers entries older than this
+BALANCE_SNAPSHOT_GRACE = float(os.getenv("BALANCE_SNAPSHOT_GRACE", "60"))  # seconds
+LEDGER_TOLERANCE = 1e-6
+
+
+class Entry(NamedTuple):
+    user_id: int
+    delta: float
+    reason: str
+    reference: Optional[str] = None
+
+
+def _record(db: Session, entries: Iterable[Entry], now: Optional[datetime] = None) -> None:
+    now = now or datetime.utcnow()
+    db.execute(insert(TokenLedgerEntry), [
+        {"user_id": e.user_id, "delta": e.delta, "reason": e.reason, "reference": e.reference, "created_at": now}
+        for e in entries
+    ])
+
+
+def open_ledger(conn: Connection) -> int:
+    """Open the ledger for balances that predate it; returns how many entries were written.
+
+    Run once, in the background, when create_all has just made token_ledger next
+    to existing users. Requests may already have posted entries by then, so each
+    user's opening entry is whatever of their balance the ledger doesn't cover yet.
+    """
+    now_utc = "CURRENT_TIMESTAMP" if conn.dialect.name == "sqlite" else "(now() AT TIME ZONE 'utc')"
+    recorded = "COALESCE((SELECT SUM(delta) FROM token_ledger WHERE token_ledger.user_id = users.id), 0)"
+    return conn.execute(text(f"""
+        INSERT INTO token_ledger (user_id, delta, reason, created_at)
+        SELECT id, tokens - {recorded}, 'opening_balance', {now_utc}
+        FROM users
+        WHERE tokens IS NOT NULL AND ABS(tokens - {recorded}) > :tolerance
+          AND NOT EXISTS (
+            SELECT 1 FROM token_ledger WHERE token_ledger.user_id = users.id AND token_ledger.reason = 'opening_balance'
+          )
+    """), {"tolerance": LEDGER_TOLERANCE}).rowcount
+
+
+def adjust(db: Session, user_id: int, delta: float, reason: str, reference: Optional[str] = None) -> Optional[float]:
+    """Add ``delta`` (negative to debit) to one user's balance and record it.
+
+    Returns the new balance, or None if the user doesn't exist or a debit would
+    overdraw; the caller commits.
+    """
+    users = User.__table__
+    stmt = update(users).where(users.c.id == user_id)
+    if delta < 0:
+        stmt = stmt.where(users.c.tokens >= -delta)
+    balance = db.execute(stmt.values(tokens=users.c.tokens + delta).returning(users.c.tokens)).scalar()
+    if balance is None:
+        return None
+    _record(db, [Entry(user_id, delta, reason, reference)])
+    return balance
+
+
+def post_entries(db: Session, entries: List[Entry], guard: int, now: Optional[datetime] = None) -> bool:
+    """Apply several users' entries as atomic increments and record them; the users must exist.
+
+    Balances are updated in user id order, so concurrent postings can't deadlock.
+    ``guard``'s net change only applies if it leaves the balance non-negative;
+    returns False when it wouldn't, and the caller must roll back.
+    """
+    net: Dict[int, float] = defaultdict(float)
+    for e in entries:
+        net[e.user_id] += e.delta
+    users = User.__table__
+    increment = update(users).where(users.c.id == bindparam("user_id")).values(tokens=users.c.tokens + bindparam("delta"))
+    before = [{"user_id": uid, "delta": d} for uid, d in sorted(net.items()) if uid < guard]
+    after = [{"user_id": uid, "delta": d} for uid, d in sorted(net.items()) if uid > guard]
+    if before:
+        db.execute(increment, before)
+    guarded = net.get(guard, 0.0)
+    applied = db.execute(
+        update(users).where(users.c.id == guard, users.c.tokens >= -guarded).values(tokens=users.c.tokens + guarded)
+    ).rowcount
+    if applied != 1:
+        return False
+    if after:
+        db.execute(increment, after)
+    _record(db, entries, now)
+    return True
+
+
+def balance_at(db: Session, user_id: int, at: datetime) -> float:
+    """The user's balance including every entry created at or before ``at``."""
+    snapshot = db.query(BalanceSnapshot.taken_at, BalanceSnapshot.balance).filter(
+        BalanceSnapshot.user_id == user_id, BalanceSnapshot.taken_at <= at
+    ).order_by(BalanceSnapshot.taken_at.desc()).first()
+    tail = db.query(func.coalesce(func.sum(TokenLedgerEntry.delta), 0.0)).filter(
+        TokenLedgerEntry.user_id == user_id, TokenLedgerEntry.created_at <= at
+    )
+    if snapshot is None:
+        return float(tail.scalar())
+    return snapshot.balance + float(tail.filter(TokenLedgerEntry.created_at > snapshot.taken_at).scalar())
+
+
+def take_snapshots(db: Session, grace_seconds: float = BALANCE_SNAPSHOT_GRACE) -> int:
+    """Snapshot every user with ledger activity since their last snapshot; returns how many were taken.
+
+    Every run snapshots all users active since the previous run, so only entries
+    after the newest snapshot overall need reading. Runs racing each other stay
+    correct: each user's sum starts at that user's own latest snapshot.
+    """
+    cutoff = datetime.utcnow() - timedelta(seconds=grace_seconds)
+    since = db.query(func.max(BalanceSnapshot.taken_at)).scalar()
+    if since is not None and since >= cutoff:
+        return 0
+    latest = db.query(
+        BalanceSnapshot.user_id, func.max(BalanceSnapshot.taken_at).label("taken_at")
+    ).group_by(BalanceSnapshot.user_id).subquery()
+    previous = db.query(BalanceSnapshot.user_id, BalanceSnapshot.taken_at, BalanceSnapshot.balance).join(
+        latest, and_(latest.c.user_id == BalanceSnapshot.user_id, latest.c.taken_at == BalanceSnapshot.taken_at)
+    ).subquery()
+    activity = db.query(
+        TokenLedgerEntry.user_id,
+        func.coalesce(func.max(previous.c.balance), 0.0) + func.sum(TokenLedgerEntry.delta),
+    ).outerjoin(previous, previous.c.user_id == TokenLedgerEntry.user_id).filter(
+        TokenLedgerEntry.created_at <= cutoff,
+        (previous.c.taken_at == None) | (TokenLedgerEntry.created_at > previous.c.taken_at),
+    )
+    if since is not None:
+        activity = activity.filter(TokenLedgerEntry.created_at > since)
+    rows = activity.group_by(TokenLedgerEntry.user_id).all()
+    if rows:
+        db.execute(insert(BalanceSnapshot), [
+            {"user_id": user_id, "taken_at": cutoff, "balance": balance} for user_id, balance in rows
+        ])
+    db.commit()
+    return len(rows)
+
+
+def check_ledger(db: Session) -> List[dict]:
+    """Users whose balance differs from the sum of their ledger entries (should be none)."""
+    sums = db.query(
+        TokenLedgerEntry.user_id, func.sum(TokenLedgerEntry.delta).label("total")
+    ).group_by(TokenLedgerEntry.user_id).subquery()
+    rows = db.query(User.id, User.tokens, func.coalesce(sums.c.total, 0.0)).outerjoin(sums, sums.c.user_id == User.id).filter(
+        func.abs(func.coalesce(User.tokens, 0.0) - func.coalesce(sums.c.total, 0.0)) > LEDGER_TOLERANCE
+    ).all()
+    return [{"user_id": uid, "balance": tokens, "ledger": total} for uid, tokens, total in rows]
@@ -0,0 +1,193 @@
+from datetime import datetime
+from typing import Dict, Iterable, List, NamedTuple, Set
+
+from fastapi import HTTPException
+from sqlalchemy import and_, bindparam, insert, update
+from sqlalchemy.orm import Session
+
+from app.models.transaction import Transaction
+from app.models.user import User
+from app.models.waste_item import WasteItem
+from app.crud import group_crud, rollup_crud, token_crud
+from app.order_book import EPSILON, Lot, order_book
+
+
+class Take(NamedTuple):
+    lot: Lot
+    quantity: float
+
+
+def begin_purchase(db: Session) -> None:
+    """SQLite has no row locks; take the write lock up front so purchases run one at a time."""
+    if db.get_bind().dialect.name == "sqlite":
+        db.connection().exec_driver_sql("BEGIN IMMEDIATE")
+
+
+def lock_available_lots(db: Session, category: str, item_ids: Iterable[int] = None, exclude: Set[int] = None) -> List[Lot]:
+    """Available lots of ``category`` in listing order, locked for this transaction.
+
+    Limited to ``item_ids`` when given, skipping ``exclude``. On Postgres rows
+    already locked by a concurrent purchase are skipped rather than waited on,
+    so parallel buyers consume disjoint lots.
+    """
+    query = db.query(WasteItem.id, WasteItem.user_id, WasteItem.amount_kg).filter(
+        and_(WasteItem.category == category, WasteItem.verified == True, WasteItem.amount_kg > 0)
+    )
+    if item_ids is not None:
+        query = query.filter(WasteItem.id.in_(list(item_ids)))
+    if exclude:
+        query = query.filter(WasteItem.id.notin_(list(exclude)))
+    query = query.order_by(WasteItem.id)
+    if db.get_bind().dialect.name == "postgresql":
+        query = query.with_for_update(skip_locked=True)
+    return [Lot(*row) for row in query.all()]
+
+
+def reserve_lots(db: Session, category: str, quantity: float) -> List[Lot]:
+    """Lock enough lots to cover ``quantity``, picked by the order book.
+
+    Only the lots the book selects are locked and re-read. If they fall short (the
+    book was stale, or a concurrent purchase holds some of them) the book is
+    corrected and asked again; once it runs out, the remaining lots are scanned
+    from the database, so stock the book never saw still sells.
+    """
+    locked: List[Lot] = []
+    tried: Set[int] = set()
+    covered = 0.0
+    while covered < quantity - EPSILON:
+        candidates = order_book.select(category, quantity - covered, exclude=tried)
+        if not candidates:
+            rest = lock_available_lots(db, category, exclude=tried)
+            order_book.put_many(category, rest)
+            return locked + rest
+        tried.update(lot.item_id for lot in candidates)
+        fresh = lock_available_lots(db, category, item_ids=[lot.item_id for lot in candidates])
+        found = {lot.item_id for lot in fresh}
+        # Gone from the database (sold or unverified elsewhere) or locked by another buyer right now
+        order_book.remove(category, [lot.item_id for lot in candidates if lot.item_id not in found])
+        order_book.put_many(category, fresh)
+        locked.extend(fresh)
+        covered += sum(lot.amount_kg for lot in fresh)
+    return locked
+
+
+def allocate_fifo(lots: List[Lot], quantity: float) -> List[Take]:
+    """Fill ``quantity`` from the oldest listings first."""
+    takes = []
+    remaining = quantity
+    for lot in sorted(lots, key=lambda l: l.item_id):
+        if remaining <= EPSILON:
+            break
+        take = min(lot.amount_kg, remaining)
+        takes.append(Take(lot, take))
+        remaining -= take
+    return takes
+
+
+def allocate_pro_rata(lots: List[Lot], quantity: float) -> List[Take]:
+    """Split ``quantity`` across ``lots`` in proportion to their size, never taking more than a lot holds."""
+    total = sum(lot.amount_kg for lot in lots)
+    takes = []
+    remaining = quantity
+    for lot in lots:
+        take = min(lot.amount_kg, round(lot.amount_kg / total * quantity, 6), remaining)
+        takes.append([lot, take])
+        remaining -= take
+    # Rounding leftovers go to whichever lots still have room
+    for entry in takes:
+        if remaining <= EPSILON:
+            break
+        extra = min(entry[0].amount_kg - entry[1], remaining)
+        entry[1] += extra
+        remaining -= extra
+    return [Take(lot, take) for lot, take in takes if take > 0]
+
+
+def buy_category(db: Session, buyer_id: int, category: str, quantity: float) -> dict:
+    """Buy ``quantity`` kg of ``category`` at 1 token/kg, split across sellers, in one transaction.
+
+    Only the lots the order book allocates the purchase to are locked and updated.
+    """
+    tokens_to_deduct = float(quantity)
+    if tokens_to_deduct <= 0:
+        raise HTTPException(status_code=400, detail="You must buy at least 0.01 kg (0.01 token). Please enter a valid quantity.")
+    try:
+        begin_purchase(db)
+        # Refuse from the maintained total before touching any lot
+        in_stock = group_crud.available_kg(db, category)
+        if not in_stock or in_stock <= EPSILON:
+            raise HTTPException(status_code=400, detail=f"No available {category} items to buy.")
+        if quantity > in_stock + EPSILON:
+            raise HTTPException(status_code=400, detail=f"Not enough {category} available. Requested: {quantity}, Available: {in_stock}")
+        lots = reserve_lots(db, category, quantity)
+        if not lots:
+            raise HTTPException(status_code=400, detail=f"No available {category} items to buy.")
+        # Lots whose seller account is gone can't be paid for
+        seller_ids = {row[0] for row in db.query(User.id).filter(User.id.in_({lot.seller_id for lot in lots})).all()}
+        order_book.remove(category, [lot.item_id for lot in lots if lot.seller_id not in seller_ids])
+        lots = [lot for lot in lots if lot.seller_id in seller_ids]
+        total_available = sum(lot.amount_kg for lot in lots)
+        if quantity > total_available + EPSILON:
+            raise HTTPException(status_code=400, detail=f"Not enough {category} available. Requested: {quantity}, Available: {total_available}")
+        buyer_tokens = db.query(User.tokens).filter(User.id == buyer_id).scalar()
+        if buyer_tokens is None:
+            raise HTTPException(status_code=404, detail="Buyer not found. Please log in again.")
+
+        takes = allocate_fifo(lots, quantity) if order_book.policy == "fifo" else allocate_pro_rata(lots, quantity)
+        now = datetime.utcnow()
+        sellers_paid: Dict[int, float] = {}
+        for take in takes:
+            sellers_paid[take.lot.seller_id] = sellers_paid.get(take.lot.seller_id, 0.0) + take.quantity
+        entries = [token_crud.Entry(buyer_id, -tokens_to_deduct, "purchase", category)]
+        entries += [token_crud.Entry(seller_id, paid, "sale", category) for seller_id, paid in sorted(sellers_paid.items())]
+        if not token_crud.post_entries(db, entries, guard=buyer_id, now=now):
+            raise HTTPException(status_code=400, detail=f"You do not have enough tokens. You have {buyer_tokens}, but need {tokens_to_deduct}.")
+
+        # The lots are locked by this transaction, so their new amounts can be written directly
+        lot_updates = []
+        for take in takes:
+            left = take.lot.amount_kg - take.quantity
+            sold_out = left <= EPSILON
+            lot_updates.append({
+                "item_id": take.lot.item_id,
+                "amount_left": 0.0 if sold_out else left,
+                "is_sold": sold_out,
+                "sold_time": now if sold_out else None,
+            })
+        items = WasteItem.__table__
+        db.execute(
+            update(items).where(items.c.id == bindparam("item_id")).values(
+                amount_kg=bindparam("amount_left"), sold=bindparam("is_sold"), sold_at=bindparam("sold_time")
+            ),
+            lot_updates,
+        )
+        db.execute(insert(Transaction), [
+            {
+                "buyer_id": buyer_id,
+                "seller_id": take.lot.seller_id,
+                "category": category,
+                "amount_kg": take.quantity,
+                "tokens": take.quantity,
+                "timestamp": now,
+                "waste_item_id": take.lot.item_id,
+            }
+            for take in takes
+        ])
+        group_crud.remove_stock(
+            db, category, sum(take.quantity for take in takes),
+            sold_out_sellers=[take.lot.seller_id for take, u in zip(takes, lot_updates) if u["is_sold"]],
+            sold_out_items=sum(1 for u in lot_updates if u["is_sold"]),
+        )
+        rollup_crud.record_purchase(db, buyer_id, category, sellers_paid, now)
+        buyer_new_balance = db.query(User.tokens).filter(User.id == buyer_id).scalar()
+        db.commit()
+        order_book.put_many(category, [Lot(take.lot.item_id, take.lot.seller_id, take.lot.amount_kg - take.quantity) for take in takes])
+    except HTTPException:
+        db.rollback()
+        raise
+    return {
+        "msg": f"Purchased {tokens_to_deduct} kg of {category}",
+        "tokens_deducted": tokens_to_deduct,
+        "sellers_paid": sellers_paid,
+        "buyer_new_balance": buyer_new_balance,
+    }
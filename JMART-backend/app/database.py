@@ -1,12 +1,183 @@
+"""Engines, sessions and connection pools.
+
+Routes read through ``run_db``. By default it runs the ORM code on a pooled
+session in the threadpool. With DB_ASYNC it runs the same code on the async
+engine through ``AsyncSession.run_sync``. ``run_sync`` does not block the event
+loop while the database works: the code runs in a greenlet, and each round trip
+awaits the async driver, so other requests run meanwhile. What does run on the
+loop is the Python work: building the query, turning rows into objects, and
+serializing the page. A hand-written ``await session.execute(select(...))`` keeps
+that same work on the loop, so it would only save the greenlet switch, at the cost
+of a second, async-only copy of every hot query. Pages are capped at
+MAX_PAGE_SIZE, which bounds that work. If it ever shows up as loop latency,
+leave DB_ASYNC off: the threadpool moves it off the loop.
+"""
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker, declarative_base
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+from sqlalchemy.engine import make_url
+from starlette.concurrency import run_in_threadpool
 import os
+import threading
+import time
 from dotenv import load_dotenv
 
 load_dotenv()  # Load .env file
 
 DATABASE_URL = os.getenv("DATABASE_URL")
 
-engine = create_engine(DATABASE_URL)
+# Connection pool, per process: size workers so workers * (DB_POOL_SIZE + DB_MAX_OVERFLOW) stays under max_connections
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))  # seconds to wait for a free connection
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))  # seconds; -1 never recycles
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() in ("1", "true", "yes")
+# Serve the hot read routes through an async engine (asyncpg / aiosqlite)
+DB_ASYNC = os.getenv("DB_ASYNC", "false").lower() in ("1", "true", "yes")
+
+
+class PoolMetrics:
+    """Checkout counts and how long requests waited for a pooled connection."""
+
+    SLOW_WAIT_SECONDS = 0.01
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.timeouts = 0
+        self.slow_waits = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def record(self, waited: float, timed_out: bool = False) -> None:
+        with self._lock:
+            if timed_out:
+                self.timeouts += 1
+            else:
+                self.checkouts += 1
+            self.total_wait += waited
+            self.max_wait = max(self.max_wait, waited)
+            if waited >= self.SLOW_WAIT_SECONDS:
+                self.slow_waits += 1
+
+    def stats(self, pool) -> dict:
+        with self._lock:
+            stats = {
+                "checkouts": self.checkouts,
+                "timeouts": self.timeouts,
+                "slow_waits": self.slow_waits,
+                "avg_wait_ms": self.total_wait / self.checkouts * 1000.0 if self.checkouts else 0.0,
+                "max_wait_ms": self.max_wait * 1000.0,
+            }
+        if isinstance(pool, QueuePool):
+            stats.update({
+                "pool_size": pool.size(),
+                "checked_out": pool.checkedout(),
+                "checked_in": pool.checkedin(),
+                "overflow": max(pool.overflow(), 0),
+                "max_overflow": DB_MAX_OVERFLOW,
+            })
+        return stats
+
+
+class _TimedPoolMixin:
+    metrics: PoolMetrics
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except Exception:
+            self.metrics.record(time.perf_counter() - started, timed_out=True)
+            raise
+        self.metrics.record(time.perf_counter() - started)
+        return connection
+
+
+def _timed_pool(base, metrics):
+    return type(f"Timed{base.__name__}", (_TimedPoolMixin, base), {"metrics": metrics})
+
+
+def _engine_options(url, pool_class, metrics) -> dict:
+    options = {"pool_pre_ping": DB_POOL_PRE_PING}
+    parsed = make_url(url)
+    if parsed.get_backend_name() == "sqlite" and parsed.database in (None, "", ":memory:"):
+        return options  # in-memory SQLite needs its single shared connection
+    options.update(
+        poolclass=_timed_pool(pool_class, metrics),
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+        pool_timeout=DB_POOL_TIMEOUT,
+        pool_recycle=DB_POOL_RECYCLE,
+    )
+    return options
+
+
+def async_url(url: str) -> str:
+    """The same database through its async driver: asyncpg for Postgres, aiosqlite for SQLite."""
+    parsed = make_url(url)
+    backend = parsed.get_backend_name()
+    if backend == "postgresql":
+        return parsed.set(drivername="postgresql+asyncpg").render_as_string(hide_password=False)
+    if backend == "sqlite":
+        return parsed.set(drivername="sqlite+aiosqlite").render_as_string(hide_password=False)
+    raise ValueError(f"No async driver configured for {backend}")
+
+
+pool_metrics = PoolMetrics()
+engine = create_engine(DATABASE_URL, **_engine_options(DATABASE_URL, QueuePool, pool_metrics))
 SessionLocal = sessionmaker(bind=engine, autocommit=False, autoflush=False)
 Base = declarative_base()
+
+async_engine = None
+AsyncSessionLocal = None
+async_pool_metrics = None
+if DB_ASYNC:
+    from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+    async_pool_metrics = PoolMetrics()
+    async_engine = create_async_engine(async_url(DATABASE_URL), **_engine_options(DATABASE_URL, AsyncAdaptedQueuePool, async_pool_metrics))
+    AsyncSessionLocal = async_sessionmaker(bind=async_engine, autoflush=False, expire_on_commit=False)
+
+
+# Dependency to get DB session
+def get_db():
+    db = SessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+async def run_db(fn):
+    """Run ``fn(session)`` without blocking the event loop and return its result.
+
+    With DB_ASYNC the session rides on the async engine (``fn`` runs via
+    ``run_sync``, so the same ORM code serves both modes); otherwise it runs in
+    the threadpool on a regular pooled session.
+    """
+    if AsyncSessionLocal is not None:
+        async with AsyncSessionLocal() as session:
+            return await session.run_sync(fn)
+
+    def call():
+        db = SessionLocal()
+        try:
+            return fn(db)
+        finally:
+            db.close()
+
+    return await run_in_threadpool(call)
+
+
+def pool_stats() -> dict:
+    stats = {"sync": pool_metrics.stats(engine.pool)}
+    if async_engine is not None:
+        stats["async"] = async_pool_metrics.stats(async_engine.sync_engine.pool)
+    return stats
+
+
+async def dispose_engines() -> None:
+    if async_engine is not None:
+        await async_engine.dispose()
+    engine.dispose()
@@ -0,0 +1,76 @@
+"""Streaming NDJSON / CSV exports of whole ledgers.
+
+Rows are read through a server-side cursor (``yield_per``) and encoded a batch
+at a time, so an export of any length holds one batch in memory, on both the
+database connection and the response side.
+"""
+import csv
+import io
+import os
+from datetime import datetime, timezone
+from itertools import islice
+from typing import Callable, Iterator, Optional
+
+import orjson
+from dotenv import load_dotenv
+from fastapi import HTTPException
+from fastapi.responses import StreamingResponse
+
+from app.database import SessionLocal
+from app.projection import Projection
+
+load_dotenv()
+
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "1000"))
+
+FORMATS = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv; charset=utf-8",
+}
+
+
+def utc_naive(value: Optional[datetime]) -> Optional[datetime]:
+    # Timestamps are stored as naive UTC (datetime.utcnow)
+    if value is not None and value.tzinfo is not None:
+        return value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def _ndjson(names, rows) -> bytes:
+    return b"".join(orjson.dumps(dict(zip(names, row))) + b"\n" for row in rows)
+
+
+def _csv_value(value):
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
+def _csv(names, rows) -> bytes:
+    out = io.StringIO()
+    writer = csv.writer(out)
+    writer.writerows([_csv_value(v) for v in row[:len(names)]] for row in rows)
+    return out.getvalue().encode("utf-8")
+
+
+def export_rows(query_for: Callable, projection: Projection, fmt: str) -> Iterator[bytes]:
+    """Encoded chunks of ``query_for(session, columns)``; the session lives as long as the stream."""
+    names = projection.selected
+    encode = _csv if fmt == "csv" else _ndjson
+    db = SessionLocal()
+    try:
+        if fmt == "csv":
+            yield _csv(names, [names])  # header
+        rows = iter(query_for(db, projection.columns).yield_per(EXPORT_BATCH_SIZE))
+        while batch := list(islice(rows, EXPORT_BATCH_SIZE)):
+            yield encode(names, batch)
+    finally:
+        db.close()
+
+
+def export_response(query_for: Callable, projection: Projection, fmt: str, filename: str) -> StreamingResponse:
+    if fmt not in FORMATS:
+        raise HTTPException(status_code=400, detail=f"format must be one of: {', '.join(FORMATS)}")
+    return StreamingResponse(
+        export_rows(query_for, projection, fmt),
+        media_type=FORMATS[fmt],
+        headers={"Content-Disposition": f'attachment; filename="{filename}.{fmt}"'},
+    )
@@ -0,0 +1,60 @@
+import os
+from io import BytesIO
+
+import numpy as np
+from PIL import Image
+from dotenv import load_dotenv
+
+load_dotenv()
+
+INPUT_SIZE = 224
+# Reject anything bigger before a single pixel is decoded (a 12 MP phone photo is ~12M)
+IMAGE_MAX_PIXELS = int(os.getenv("IMAGE_MAX_PIXELS", str(50_000_000)))
+
+# PIL's own bomb check only warns below 2x its limit; keep it in line with ours
+Image.MAX_IMAGE_PIXELS = IMAGE_MAX_PIXELS
+
+
+class ImageDecodeError(ValueError):
+    """The bytes aren't a decodable image or are too large to decode safely."""
+
+
+def open_reduced(content: bytes, size: int = INPUT_SIZE) -> Image.Image:
+    """Open an image decoded at the smallest resolution that still covers ``size`` x ``size``.
+
+    Only the header is parsed before the pixel-count check. JPEGs are then decoded
+    with DCT scaling (1/2, 1/4 or 1/8), so the full-resolution bitmap is never allocated.
+    """
+    try:
+        img = Image.open(BytesIO(content))
+    except (Image.DecompressionBombError, Image.UnidentifiedImageError, OSError) as e:
+        raise ImageDecodeError(f"Could not read image: {e}")
+    width, height = img.size
+    if width * height > IMAGE_MAX_PIXELS:
+        raise ImageDecodeError(f"Image is {width}x{height}; at most {IMAGE_MAX_PIXELS} pixels are accepted.")
+    img.draft("RGB", (size, size))
+    try:
+        img = img.convert("RGB")
+    except (Image.DecompressionBombError, OSError) as e:
+        raise ImageDecodeError(f"Could not decode image: {e}")
+    # Non-JPEG formats can't be drafted; shrink by an integer factor first, then resample
+    factor = min(img.width // size, img.height // size)
+    if factor >= 2:
+        img = img.reduce(factor)
+    return img
+
+
+def to_tensor(img: Image.Image, size: int = INPUT_SIZE):
+    """Resize to ``size`` x ``size`` and scale to [0, 1] as a CHW float tensor (same output as ToTensor)."""
+    import torch
+
+    if img.size != (size, size):
+        img = img.resize((size, size), Image.BILINEAR)
+    # Only the 224x224 uint8 buffer is copied; the float conversion is the one full-size allocation
+    # and keeps HWC memory order (channels-last), which the CPU conv kernels prefer
+    pixels = torch.from_numpy(np.array(img))
+    return pixels.permute(2, 0, 1).to(torch.float32).div_(255.0)
+
+
+def decode_image_tensor(content: bytes, size: int = INPUT_SIZE):
+    return to_tensor(open_reduced(content, size), size)
@@ -0,0 +1,153 @@
+import os
+import threading
+from typing import Optional
+
+import httpx
+from fastapi import HTTPException
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Image download limits
+IMAGE_FETCH_CONNECT_TIMEOUT = float(os.getenv("IMAGE_FETCH_CONNECT_TIMEOUT", "3"))
+IMAGE_FETCH_READ_TIMEOUT = float(os.getenv("IMAGE_FETCH_READ_TIMEOUT", "10"))
+IMAGE_FETCH_MAX_BYTES = int(os.getenv("IMAGE_FETCH_MAX_BYTES", str(10 * 1024 * 1024)))
+IMAGE_FETCH_MAX_CONNECTIONS = int(os.getenv("IMAGE_FETCH_MAX_CONNECTIONS", "50"))
+IMAGE_FETCH_MAX_KEEPALIVE = int(os.getenv("IMAGE_FETCH_MAX_KEEPALIVE", "20"))
+
+# Leading bytes of the formats the classifier accepts
+IMAGE_SIGNATURES = {
+    b"\xff\xd8\xff": "image/jpeg",
+    b"\x89PNG\r\n\x1a\n": "image/png",
+}
+
+
+class ImageFetchError(HTTPException):
+    """Raised when an image URL can't be downloaded or isn't a usable image."""
+
+    def __init__(self, status_code: int, detail: str):
+        super().__init__(status_code=status_code, detail=detail)
+
+
+def sniff_image_type(head: bytes) -> Optional[str]:
+    for signature, mime in IMAGE_SIGNATURES.items():
+        if head.startswith(signature):
+            return mime
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "image/webp"
+    return None
+
+
+def _client_kwargs() -> dict:
+    return {
+        "timeout": httpx.Timeout(
+            connect=IMAGE_FETCH_CONNECT_TIMEOUT,
+            read=IMAGE_FETCH_READ_TIMEOUT,
+            write=IMAGE_FETCH_READ_TIMEOUT,
+            pool=IMAGE_FETCH_CONNECT_TIMEOUT,
+        ),
+        "limits": httpx.Limits(
+            max_connections=IMAGE_FETCH_MAX_CONNECTIONS,
+            max_keepalive_connections=IMAGE_FETCH_MAX_KEEPALIVE,
+        ),
+        "follow_redirects": True,
+    }
+
+
+# Shared keep-alive pools, created on first use; the lock stops concurrent first requests each creating one
+_sync_client: Optional[httpx.Client] = None
+_async_client: Optional[httpx.AsyncClient] = None
+_clients_lock = threading.Lock()
+
+
+def get_client() -> httpx.Client:
+    global _sync_client
+    if _sync_client is None:
+        with _clients_lock:
+            if _sync_client is None:
+                _sync_client = httpx.Client(**_client_kwargs())
+    return _sync_client
+
+
+def get_async_client() -> httpx.AsyncClient:
+    global _async_client
+    if _async_client is None:
+        with _clients_lock:
+            if _async_client is None:
+                _async_client = httpx.AsyncClient(**_client_kwargs())
+    return _async_client
+
+
+def _download_error(url: str, e: httpx.HTTPError) -> ImageFetchError:
+    # Connect errors often carry no message; name the error type and the URL instead
+    return ImageFetchError(400, f"Could not download image ({str(e) or type(e).__name__}): {url}")
+
+
+def _check_response(url: str, response: httpx.Response) -> None:
+    if response.status_code != 200:
+        raise ImageFetchError(400, f"Could not download image ({response.status_code}): {url}")
+    declared = response.headers.get("content-type", "").split(";")[0].strip().lower()
+    if declared and not (declared.startswith("image/") or declared == "application/octet-stream"):
+        raise ImageFetchError(400, f"URL does not point to an image (content-type {declared}).")
+    length = response.headers.get("content-length")
+    if length and length.isdigit() and int(length) > IMAGE_FETCH_MAX_BYTES:
+        raise ImageFetchError(413, f"Image is larger than {IMAGE_FETCH_MAX_BYTES} bytes.")
+
+
+class _BodyReader:
+    """Accumulates a streamed body, enforcing the size cap and sniffing the first bytes."""
+
+    def __init__(self):
+        self.chunks = []
+        self.size = 0
+
+    def feed(self, chunk: bytes) -> None:
+        self.size += len(chunk)
+        if self.size > IMAGE_FETCH_MAX_BYTES:
+            raise ImageFetchError(413, f"Image is larger than {IMAGE_FETCH_MAX_BYTES} bytes.")
+        self.chunks.append(chunk)
+
+    def content(self) -> bytes:
+        content = b"".join(self.chunks)
+        if sniff_image_type(content[:16]) is None:
+            raise ImageFetchError(400, "Unsupported image format. Only JPEG, PNG and WebP images are accepted.")
+        return content
+
+
+def fetch_image_bytes(url: str) -> bytes:
+    """Blocking download for sync routes (they already run in the threadpool)."""
+    reader = _BodyReader()
+    try:
+        with get_client().stream("GET", url) as response:
+            _check_response(url, response)
+            for chunk in response.iter_bytes():
+                reader.feed(chunk)
+    except httpx.TimeoutException:
+        raise ImageFetchError(504, f"Timed out downloading image: {url}")
+    except httpx.HTTPError as e:
+        raise _download_error(url, e)
+    return reader.content()
+
+
+async def fetch_image_bytes_async(url: str) -> bytes:
+    reader = _BodyReader()
+    try:
+        async with get_async_client().stream("GET", url) as response:
+            _check_response(url, response)
+            async for chunk in response.aiter_bytes():
+                reader.feed(chunk)
+    except httpx.TimeoutException:
+        raise ImageFetchError(504, f"Timed out downloading image: {url}")
+    except httpx.HTTPError as e:
+        raise _download_error(url, e)
+    return reader.content()
+
+
+async def close_clients() -> None:
+    global _sync_client, _async_client
+    if _async_client is not None:
+        await _async_client.aclose()
+        _async_client = None
+    if _sync_client is not None:
+        _sync_client.close()
+        _sync_client = None
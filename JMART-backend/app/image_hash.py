@@ -0,0 +1,104 @@
+import os
+import threading
+from typing import Any, List, NamedTuple, Optional, Tuple
+
+from PIL import Image
+from dotenv import load_dotenv
+
+from app.image_decode import open_reduced
+
+load_dotenv()
+
+# Max differing bits (out of 64) for two photos to count as the same pile
+PHASH_MAX_DISTANCE = int(os.getenv("PHASH_MAX_DISTANCE", "6"))
+
+
+def dhash(content: bytes) -> int:
+    """64-bit difference hash: compares horizontally adjacent pixels of a 9x8 grayscale thumbnail.
+
+    The thumbnail is decoded at 1/8 scale where possible, so this costs a few milliseconds.
+    """
+    img = open_reduced(content, size=32).convert("L").resize((9, 8), Image.BILINEAR)
+    pixels = img.tobytes()
+    value = 0
+    for row in range(8):
+        offset = row * 9
+        for col in range(8):
+            value = (value << 1) | (pixels[offset + col] > pixels[offset + col + 1])
+    return value
+
+
+def hamming(a: int, b: int) -> int:
+    return (a ^ b).bit_count()
+
+
+def to_hex(value: int) -> str:
+    return f"{value:016x}"
+
+
+def from_hex(value: str) -> int:
+    return int(value, 16)
+
+
+class Match(NamedTuple):
+    distance: int
+    phash: int
+    payload: Any
+
+
+class PHashIndex:
+    """BK-tree over 64-bit hashes under Hamming distance.
+
+    A lookup with radius r only descends into children whose edge distance lies in
+    [d - r, d + r], so near-duplicate search touches a small fraction of the tree.
+    """
+
+    def __init__(self):
+        self._root: Optional[list] = None  # node = [phash, payload, {distance: child}]
+        self._lock = threading.Lock()
+        self.size = 0
+
+    def add(self, phash: int, payload: Any) -> None:
+        with self._lock:
+            self.size += 1
+            if self._root is None:
+                self._root = [phash, payload, {}]
+                return
+            node = self._root
+            while True:
+                distance = hamming(phash, node[0])
+                if distance == 0:
+                    node[1] = payload  # same hash: keep the latest item
+                    self.size -= 1
+                    return
+                child = node[2].get(distance)
+                if child is None:
+                    node[2][distance] = [phash, payload, {}]
+                    return
+                node = child
+
+    def search(self, phash: int, max_distance: int = PHASH_MAX_DISTANCE) -> List[Match]:
+        matches = []
+        with self._lock:
+            stack = [self._root] if self._root is not None else []
+            while stack:
+                node = stack.pop()
+                distance = hamming(phash, node[0])
+                if distance <= max_distance:
+                    matches.append(Match(distance, node[0], node[1]))
+                for edge, child in node[2].items():
+                    if distance - max_distance <= edge <= distance + max_distance:
+                        stack.append(child)
+        matches.sort(key=lambda m: m.distance)
+        return matches
+
+    def nearest(self, phash: int, max_distance: int = PHASH_MAX_DISTANCE) -> Optional[Match]:
+        matches = self.search(phash, max_distance)
+        return matches[0] if matches else None
+
+    def rebuild(self, entries: List[Tuple[int, Any]]) -> None:
+        fresh = PHashIndex()
+        for phash, payload in entries:
+            fresh.add(phash, payload)
+        with self._lock:
+            self._root, self.size = fresh._root, fresh.size
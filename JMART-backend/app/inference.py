@@ -0,0 +1,154 @@
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Dict, List, Optional, Tuple
+
+import torch
+import torch.nn.functional as F
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Micro-batching settings
+INFERENCE_MAX_BATCH = int(os.getenv("INFERENCE_MAX_BATCH", "16"))
+INFERENCE_MAX_WAIT_MS = float(os.getenv("INFERENCE_MAX_WAIT_MS", "10"))
+TORCH_NUM_THREADS = int(os.getenv("TORCH_NUM_THREADS", "0"))  # 0 keeps torch's default
+
+Prediction = Tuple[str, float, Dict[str, float]]
+
+
+class BatchingInferenceEngine:
+    """Collects concurrent single-image requests and runs them as one batched forward pass.
+
+    A batch is flushed as soon as it holds ``max_batch_size`` images or the oldest
+    request has waited ``max_wait_ms``, whichever comes first.
+    """
+
+    def __init__(
+        self,
+        model,
+        class_names: List[str],
+        max_batch_size: int = INFERENCE_MAX_BATCH,
+        max_wait_ms: float = INFERENCE_MAX_WAIT_MS,
+        num_threads: int = TORCH_NUM_THREADS,
+    ):
+        self.model = model
+        self.class_names = class_names
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0.0, max_wait_ms) / 1000.0
+        if num_threads > 0:
+            torch.set_num_threads(num_threads)
+        self._queue: "queue.Queue[Tuple[torch.Tensor, Future]]" = queue.Queue()
+        self._stats_lock = threading.Lock()
+        self._batches = 0
+        self._items = 0
+        self._flush_full = 0
+        self._flush_timeout = 0
+        self._batch_size_hist: Dict[int, int] = {}
+        self._forward_seconds = 0.0
+        self._running = True
+        self._worker = threading.Thread(target=self._run, name="inference-batcher", daemon=True)
+        self._worker.start()
+
+    def submit(self, img_t: torch.Tensor) -> Future:
+        """Queue a preprocessed CHW image tensor; the future resolves to (category, confidence, prob_dict)."""
+        future: Future = Future()
+        if not self._running:
+            future.set_exception(RuntimeError("Inference engine is shut down"))
+            return future
+        self._queue.put((img_t, future))
+        return future
+
+    def predict(self, img_t: torch.Tensor, timeout: Optional[float] = None) -> Prediction:
+        """Blocking helper for sync routes."""
+        return self.submit(img_t).result(timeout=timeout)
+
+    def _collect_batch(self):
+        first = self._queue.get()
+        if first is None:
+            return None, False
+        batch = [first]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if item is None:
+                self._running = False
+                break
+            batch.append(item)
+        return batch, len(batch) >= self.max_batch_size
+
+    def _run(self):
+        while self._running:
+            batch, full = self._collect_batch()
+            if batch is None:
+                break
+            # Skip callers that already gave up
+            batch = [(t, f) for t, f in batch if f.set_running_or_notify_cancel()]
+            if not batch:
+                continue
+            try:
+                results = self._forward([t for t, _ in batch])
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+            for (_, future), result in zip(batch, results):
+                future.set_result(result)
+            self._record(len(batch), full)
+
+    def _forward(self, tensors: List[torch.Tensor]) -> List[Prediction]:
+        start = time.perf_counter()
+        with torch.no_grad():
+            output = self.model(torch.stack(tensors))
+            probs = F.softmax(output, dim=1)
+            conf, pred = torch.max(probs, 1)
+        probs_list = probs.tolist()
+        results = []
+        for i, row in enumerate(probs_list):
+            prob_dict = {self.class_names[j]: float(p) for j, p in enumerate(row)}
+            results.append((self.class_names[int(pred[i])], float(conf[i]), prob_dict))
+        with self._stats_lock:
+            self._forward_seconds += time.perf_counter() - start
+        return results
+
+    def _record(self, size: int, full: bool):
+        with self._stats_lock:
+            self._batches += 1
+            self._items += size
+            self._batch_size_hist[size] = self._batch_size_hist.get(size, 0) + 1
+            if full:
+                self._flush_full += 1
+            else:
+                self._flush_timeout += 1
+
+    def stats(self) -> dict:
+        with self._stats_lock:
+            avg = self._items / self._batches if self._batches else 0.0
+            return {
+                "mode": "thread",
+                "max_batch_size": self.max_batch_size,
+                "max_wait_ms": self.max_wait * 1000.0,
+                "torch_threads": torch.get_num_threads(),
+                "batches": self._batches,
+                "items": self._items,
+                "avg_batch_size": avg,
+                "avg_batch_fill": avg / self.max_batch_size,
+                "flushed_full": self._flush_full,
+                "flushed_timeout": self._flush_timeout,
+                "batch_size_histogram": dict(sorted(self._batch_size_hist.items())),
+                "forward_seconds_total": self._forward_seconds,
+                "queue_depth": self._queue.qsize(),
+            }
+
+    def shutdown(self):
+        self._running = False
+        self._queue.put(None)
+        self._worker.join(timeout=5)
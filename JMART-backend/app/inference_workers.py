@@ -0,0 +1,156 @@
+import multiprocessing
+import os
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import List, Optional
+
+from fastapi import HTTPException
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# "thread" keeps inference in the API process (batching engine), "process" uses this pool
+INFERENCE_MODE = os.getenv("INFERENCE_MODE", "thread").lower()
+INFERENCE_WORKERS = int(os.getenv("INFERENCE_WORKERS", str(os.cpu_count() or 1)))
+INFERENCE_WORKER_THREADS = int(os.getenv("INFERENCE_WORKER_THREADS", "1"))
+INFERENCE_MAX_PENDING = int(os.getenv("INFERENCE_MAX_PENDING", str(INFERENCE_WORKERS * 4)))
+INFERENCE_QUEUE_TIMEOUT = float(os.getenv("INFERENCE_QUEUE_TIMEOUT", "2"))  # seconds to wait for a slot
+
+
+class InferenceOverloaded(HTTPException):
+    def __init__(self):
+        super().__init__(status_code=503, detail="Image classifier is busy, please retry shortly.", headers={"Retry-After": "1"})
+
+
+# Per-worker state, set once by _init_worker
+_worker_model = None
+_worker_class_names: List[str] = []
+
+
+def _init_worker(model_path: str, class_names: List[str], num_threads: int, backend: str):
+    global _worker_model, _worker_class_names
+    from app.model_registry import build_model
+
+    _worker_model = build_model(model_path, num_threads=max(1, num_threads), backend=backend)
+    _worker_class_names = list(class_names)
+
+
+def _classify(content: bytes):
+    import torch
+    import torch.nn.functional as F
+    from app.image_decode import decode_image_tensor
+
+    img_t = decode_image_tensor(content).unsqueeze(0)
+    with torch.no_grad():
+        probs = F.softmax(_worker_model(img_t), dim=1)
+        conf, pred = torch.max(probs, 1)
+    prob_dict = {name: float(p) for name, p in zip(_worker_class_names, probs[0].tolist())}
+    return _worker_class_names[pred.item()], float(conf.item()), prob_dict
+
+
+class ProcessInferencePool:
+    """Runs decode, preprocessing and the forward pass in a pool of worker processes.
+
+    Each worker loads the weights once in its initializer. At most ``max_pending``
+    images may be queued; beyond that callers get a 503 (InferenceOverloaded).
+    If a worker dies the pool is rebuilt and the affected requests fail.
+    """
+
+    def __init__(
+        self,
+        model_path: str,
+        class_names: List[str],
+        workers: int = INFERENCE_WORKERS,
+        threads_per_worker: int = INFERENCE_WORKER_THREADS,
+        max_pending: int = INFERENCE_MAX_PENDING,
+        queue_timeout: float = INFERENCE_QUEUE_TIMEOUT,
+        backend: str = "fp32",
+    ):
+        self.model_path = model_path
+        self.backend = backend
+        self.class_names = list(class_names)
+        self.workers = max(1, workers)
+        self.threads_per_worker = threads_per_worker
+        self.max_pending = max(1, max_pending)
+        self.queue_timeout = queue_timeout
+        self._slots = threading.BoundedSemaphore(self.max_pending)
+        self._lock = threading.Lock()
+        self._pending = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.restarts = 0
+        self._executor = self._new_executor()
+
+    def _new_executor(self) -> ProcessPoolExecutor:
+        # spawn, not fork: forking after torch has started its threadpool can deadlock
+        return ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(self.model_path, self.class_names, self.threads_per_worker, self.backend),
+        )
+
+    def _restart(self, broken: ProcessPoolExecutor) -> None:
+        with self._lock:
+            if self._executor is not broken:
+                return  # another caller already replaced it
+            print("[ERROR] Inference worker died, restarting process pool")
+            broken.shutdown(wait=False, cancel_futures=True)
+            self._executor = self._new_executor()
+            self.restarts += 1
+
+    def submit(self, content: bytes) -> Future:
+        """Classify raw image bytes; the future resolves to (category, confidence, prob_dict)."""
+        if not self._slots.acquire(timeout=self.queue_timeout):
+            with self._lock:
+                self.rejected += 1
+            raise InferenceOverloaded()
+        executor = self._executor
+        with self._lock:
+            self._pending += 1
+        try:
+            try:
+                future = executor.submit(_classify, content)
+            except BrokenProcessPool:
+                self._restart(executor)
+                executor = self._executor
+                future = executor.submit(_classify, content)
+        except Exception:
+            self._done(None)
+            raise
+        future.add_done_callback(lambda f: self._done(f, executor))
+        return future
+
+    def _done(self, future: Optional[Future], executor: Optional[ProcessPoolExecutor] = None) -> None:
+        with self._lock:
+            self._pending -= 1
+            if future is not None and not future.cancelled() and future.exception() is None:
+                self.completed += 1
+            else:
+                self.failed += 1
+        self._slots.release()
+        if future is not None and not future.cancelled() and isinstance(future.exception(), BrokenProcessPool):
+            self._restart(executor)
+
+    def predict(self, content: bytes, timeout: Optional[float] = None):
+        return self.submit(content).result(timeout=timeout)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "mode": "process",
+                "backend": self.backend,
+                "workers": self.workers,
+                "threads_per_worker": self.threads_per_worker,
+                "pending": self._pending,
+                "max_pending": self.max_pending,
+                "completed": self.completed,
+                "failed": self.failed,
+                "rejected": self.rejected,
+                "restarts": self.restarts,
+            }
+
+    def shutdown(self):
+        self._executor.shutdown(wait=True, cancel_futures=True)
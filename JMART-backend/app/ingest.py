@@ -0,0 +1,324 @@
+"""Bulk listing ingestion for sellers who list hundreds of lots at once.
+
+Rows come from a JSON array or a CSV stream and are processed one chunk at a
+time: the chunk's images are fetched and classified concurrently (the inference
+engine batches the forward passes), then its listings go in with one bulk
+INSERT and one commit. Only a chunk is held in memory, so a CSV of any size
+streams through. Every row gets a result; a bad row never stops the others.
+
+Used by POST /api/upload/bulk, POST /api/upload/bulk-csv and
+``python -m app.manage import-csv``.
+"""
+import asyncio
+import codecs
+import csv
+import os
+import tempfile
+from collections import defaultdict
+from datetime import datetime
+from typing import IO, AsyncIterator, Dict, Iterable, List, NamedTuple, Optional, Union
+
+import orjson
+from dotenv import load_dotenv
+from fastapi import HTTPException
+from pydantic import BaseModel, ValidationError
+from sqlalchemy import insert
+from starlette.concurrency import run_in_threadpool
+
+from app.crud import group_crud, rollup_crud
+from app.database import SessionLocal, run_db
+from app.image_hash import to_hex
+from app.models.user import User
+from app.models.waste_item import WasteItem
+from app.order_book import Lot, order_book
+from app.response_cache import MARKETPLACE, response_cache, user_scope
+
+load_dotenv()
+
+INGEST_CHUNK_SIZE = int(os.getenv("INGEST_CHUNK_SIZE", "100"))  # rows per bulk insert and commit
+INGEST_CONCURRENCY = int(os.getenv("INGEST_CONCURRENCY", "16"))  # image downloads in flight
+# A JSON body is parsed whole before we see it; larger imports should use the CSV stream
+INGEST_MAX_JSON_ROWS = int(os.getenv("INGEST_MAX_JSON_ROWS", "1000"))
+INGEST_MAX_CSV_ROW_BYTES = int(os.getenv("INGEST_MAX_CSV_ROW_BYTES", "65536"))
+# A CSV body is received whole before ingesting starts; past this much it goes to a temporary file
+INGEST_SPOOL_MEMORY_BYTES = int(os.getenv("INGEST_SPOOL_MEMORY_BYTES", str(8 << 20)))
+
+REQUIRED_CSV_COLUMNS = {"image_url", "category"}
+DEFAULT_AMOUNT_KG = WasteItem.__table__.c.amount_kg.default.arg
+
+
+class CsvFormatError(ValueError):
+    """The CSV itself is malformed (missing columns, bad encoding, an unclosed quote), as opposed to a bad row."""
+
+
+class IngestRow(BaseModel):
+    description: str = ""
+    image_url: str
+    category: str
+    amount_kg: Optional[float] = None
+    force_unverified: Optional[bool] = False
+
+
+class _Listing(NamedTuple):
+    row: int
+    values: dict  # the waste_items row to insert
+    phash: int
+    prediction: tuple
+
+
+class _Stock(NamedTuple):
+    id: int
+    user_id: int
+    category: str
+    amount_kg: float
+    image_url: str
+
+
+async def seller_username(user_id: int) -> str:
+    username = await run_db(lambda db: db.query(User.username).filter(User.id == user_id).scalar())
+    if username is None:
+        raise HTTPException(status_code=404, detail="User not found")
+    return username
+
+
+async def json_rows(items: Iterable[dict]) -> AsyncIterator[dict]:
+    for item in items:
+        yield item
+
+
+async def file_chunks(source: Union[str, IO[bytes]], chunk_size: int = 1 << 16) -> AsyncIterator[bytes]:
+    """Chunks of a file, given its path or an open binary file (read from where it is)."""
+    if isinstance(source, str):
+        with open(source, "rb") as f:
+            while chunk := f.read(chunk_size):
+                yield chunk
+        return
+    while chunk := source.read(chunk_size):
+        yield chunk
+
+
+async def spool_body(chunks: AsyncIterator[bytes]) -> IO[bytes]:
+    """Receive a whole request body into a temporary file, rewound; the caller closes it.
+
+    A streaming response can't read its own request body: under uvicorn the
+    disconnect listener consumes the remaining body messages, so rows go
+    missing or the request hangs.
+    """
+    spool = tempfile.SpooledTemporaryFile(max_size=INGEST_SPOOL_MEMORY_BYTES)
+    try:
+        async for chunk in chunks:
+            spool.write(chunk)
+    except BaseException:
+        spool.close()
+        raise
+    spool.seek(0)
+    return spool
+
+
+async def _csv_records(chunks: AsyncIterator[bytes]) -> AsyncIterator[List[str]]:
+    """Split a byte stream into CSV records without ever holding more than one record.
+
+    A record is complete at a line break once its quotes balance (escaped quotes
+    are doubled, so the parity rule holds); quoted fields may span lines.
+    """
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    pending, record = "", ""
+    done = False
+    while not done:
+        chunk = await anext(chunks, None)
+        done = chunk is None
+        try:
+            pending += decoder.decode(chunk or b"", final=done)
+        except UnicodeDecodeError as e:
+            raise CsvFormatError(f"CSV is not valid UTF-8: {e.reason}")
+        *lines, pending = pending.split("\n")
+        if done and pending:
+            lines.append(pending)
+        for line in lines:
+            record += line + "\n"
+            if record.count('"') % 2:
+                if len(record) > INGEST_MAX_CSV_ROW_BYTES:
+                    raise CsvFormatError("CSV record too long (unbalanced quote?)")
+                continue
+            values = next(csv.reader([record]), [])
+            record = ""
+            if any(value.strip() for value in values):
+                yield values
+    if record:
+        raise CsvFormatError("CSV ends inside a quoted field")
+
+
+async def csv_rows(chunks: AsyncIterator[bytes]) -> AsyncIterator[dict]:
+    """Rows of a streamed CSV as dicts keyed by its header; blank cells count as missing.
+
+    Reads the header before returning, so a malformed file fails here (CsvFormatError)
+    rather than halfway through the response.
+    """
+    records = _csv_records(chunks)
+    header = [name.strip() for name in await anext(records, [])]
+    missing = REQUIRED_CSV_COLUMNS - set(header)
+    if missing:
+        raise CsvFormatError(f"CSV is missing column(s): {', '.join(sorted(missing))}")
+
+    async def rows():
+        async for values in records:
+            yield {name: value.strip() for name, value in zip(header, values) if name and value.strip()}
+
+    return rows()
+
+
+def _validation_message(error: ValidationError) -> str:
+    return "; ".join(f"{'.'.join(str(p) for p in e['loc'])}: {e['msg']}" for e in error.errors())
+
+
+async def _prepare(row: int, raw: dict, user_id: int, username: str, limit: asyncio.Semaphore):
+    """Validate and classify one row: a _Listing ready to insert, or its error result."""
+    from app.api.waste import ALLOWED_IMAGE_EXTENSIONS, analyze_image_from_url_async, listing_verified
+
+    try:
+        data = IngestRow.model_validate(raw)
+    except ValidationError as e:
+        return {"row": row, "error": _validation_message(e)}
+    if not data.image_url.lower().endswith(ALLOWED_IMAGE_EXTENSIONS):
+        return {"row": row, "error": "Wrong image type. Only .jpg, .jpeg, .png files are accepted."}
+    if data.amount_kg is not None and data.amount_kg <= 0:
+        return {"row": row, "error": "amount_kg must be positive."}
+    async with limit:
+        try:
+            prediction, phash, duplicate = await analyze_image_from_url_async(data.image_url)
+        except HTTPException as e:
+            return {"row": row, "error": e.detail}
+        except Exception as e:
+            print(f"[ERROR] bulk ingest row {row}: {e}")
+            return {"row": row, "error": "Could not classify image"}
+    predicted_category, confidence, _ = prediction
+    return _Listing(row, {
+        "user_id": user_id,
+        "username": username,
+        "description": data.description,
+        "image_url": data.image_url,
+        "category": data.category,
+        "verified": listing_verified(data.category, prediction, data.force_unverified),
+        "predicted_category": predicted_category,
+        "ai_confidence": confidence,
+        "ai_probabilities": prediction[2],
+        "amount_kg": data.amount_kg if data.amount_kg is not None else DEFAULT_AMOUNT_KG,
+        "listed_kg": data.amount_kg if data.amount_kg is not None else DEFAULT_AMOUNT_KG,
+        "sold": False,
+        "phash": to_hex(phash),
+        "duplicate_of": duplicate.payload.item_id if duplicate is not None else None,
+    }, phash, prediction)
+
+
+def _in_stock(values: dict) -> bool:
+    return values["verified"] and values["amount_kg"] > 0
+
+
+def _insert_listings(listings: List[_Listing]) -> List[int]:
+    """One bulk INSERT and one commit for the chunk, with the category totals in the same transaction."""
+    db = SessionLocal()
+    now = datetime.utcnow()
+    try:
+        ids = db.scalars(
+            insert(WasteItem).returning(WasteItem.id, sort_by_parameter_order=True),
+            [{**listing.values, "created_at": now} for listing in listings],
+        ).all()
+        stocked = [
+            _Stock(item_id, v["user_id"], v["category"], v["amount_kg"], v["image_url"])
+            for item_id, v in ((item_id, listing.values) for item_id, listing in zip(ids, listings))
+            if _in_stock(v)
+        ]
+        if stocked:
+            group_crud.add_stock_many(db, stocked)
+        rollup_crud.record_uploads(
+            db, [(v["user_id"], v["category"], v["listed_kg"]) for v in (listing.values for listing in listings)], now
+        )
+        db.commit()
+        return ids
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+def _publish(listings: List[_Listing], ids: List[int], user_id: int) -> None:
+    # The in-memory views upload keeps in step, updated once the chunk is committed
+    from app.api.waste import IndexedImage, phash_index
+
+    lots: Dict[str, List[Lot]] = defaultdict(list)
+    for listing, item_id in zip(listings, ids):
+        phash_index.add(listing.phash, IndexedImage(item_id, listing.prediction))
+        if _in_stock(listing.values):
+            lots[listing.values["category"]].append(Lot(item_id, user_id, listing.values["amount_kg"]))
+    for category, category_lots in lots.items():
+        order_book.put_many(category, category_lots)
+    response_cache.bump(MARKETPLACE, user_scope(user_id))
+
+
+async def _ingest_chunk(raws: List[dict], first_row: int, user_id: int, username: str) -> List[dict]:
+    limit = asyncio.Semaphore(INGEST_CONCURRENCY)
+    prepared = await asyncio.gather(*(
+        _prepare(first_row + i, raw, user_id, username, limit) for i, raw in enumerate(raws)
+    ))
+    listings = [p for p in prepared if isinstance(p, _Listing)]
+    ids = {}
+    if listings:
+        try:
+            inserted = await run_in_threadpool(_insert_listings, listings)
+        except Exception as e:
+            print(f"[ERROR] bulk ingest insert of rows {first_row}-{first_row + len(raws) - 1}: {e}")
+            return [{"row": p.row, "error": "Could not save listing"} if isinstance(p, _Listing) else p for p in prepared]
+        _publish(listings, inserted, user_id)
+        ids = {listing.row: item_id for listing, item_id in zip(listings, inserted)}
+    return [
+        {
+            "row": p.row,
+            "id": ids[p.row],
+            "verified": p.values["verified"],
+            "predicted_category": p.values["predicted_category"],
+            "confidence": p.values["ai_confidence"],
+            "duplicate_of": p.values["duplicate_of"],
+        } if isinstance(p, _Listing) else p
+        for p in prepared
+    ]
+
+
+async def ingest(rows: AsyncIterator[dict], user_id: int, username: str) -> AsyncIterator[dict]:
+    """Yield one result per row (``id`` or ``error``, keyed by 1-based ``row``), then a ``summary``."""
+    totals = {"rows": 0, "inserted": 0, "verified": 0, "errors": 0}
+
+    async def flush(chunk):
+        results = await _ingest_chunk(chunk, totals["rows"] + 1, user_id, username)
+        totals["rows"] += len(chunk)
+        for result in results:
+            if "id" in result:
+                totals["inserted"] += 1
+                totals["verified"] += bool(result["verified"])
+            else:
+                totals["errors"] += 1
+        return results
+
+    chunk: List[dict] = []
+    failure = None
+    try:
+        async for raw in rows:
+            chunk.append(raw)
+            if len(chunk) >= INGEST_CHUNK_SIZE:
+                for result in await flush(chunk):
+                    yield result
+                chunk = []
+    except CsvFormatError as e:
+        failure = str(e)  # the CSV broke off; keep what was read before it
+    if chunk:
+        for result in await flush(chunk):
+            yield result
+    if failure is not None:
+        totals["errors"] += 1
+        yield {"row": totals["rows"] + 1, "error": failure}
+    yield {"summary": totals}
+
+
+async def ndjson(results: AsyncIterator[dict]) -> AsyncIterator[bytes]:
+    async for result in results:
+        yield orjson.dumps(result) + b"\n"
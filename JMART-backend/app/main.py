@@ -1,12 +1,34 @@
-from fastapi import FastAPI
+import asyncio
+import time
+_import_started = time.perf_counter()
+
+from fastapi import FastAPI, Response
+from sqlalchemy import inspect
 from fastapi.middleware.cors import CORSMiddleware
-from app.database import Base, engine
-from app.models import user, waste_item, group
+from app.database import Base, engine, SessionLocal, dispose_engines, pool_stats
+from app.models import user, waste_item, group, token_ledger, rollup, archive
 from app.api import waste, user  # Import your route handlers
 from app.otp import generate_otp, EMAIL_CONFIGURED
+from app.image_fetch import close_clients
+from app.model_registry import registry, MODEL_PRELOAD
+from app.pagination import NEXT_CURSOR_HEADER
+from app.order_book import order_book
+from app.response_cache import response_cache
+from app.crud.token_crud import BALANCE_SNAPSHOT_INTERVAL, open_ledger, take_snapshots
+from app.crud.archive_crud import ARCHIVE_INTERVAL, archive as archive_old_rows
+from app.crud import rollup_crud
+from app.warmup import Warmup
+from starlette.concurrency import run_in_threadpool
 
-# Create all tables
+# Create all tables, noting which ones are new: tables made here skip their migrations' data steps
+existing_tables = set(inspect(engine).get_table_names())
 Base.metadata.create_all(bind=engine)
+created_tables = set(Base.metadata.tables) - existing_tables
+
+IMPORT_SECONDS = time.perf_counter() - _import_started
+startup_seconds = None
+snapshot_task = None
+archive_task = None
 
 # Create the FastAPI app
 app = FastAPI(title="SmartRecycle API")
@@ -17,12 +39,132 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER],
 )
 
 # Register your routes
 app.include_router(waste.router, prefix="/api", tags=["Waste"])
 app.include_router(user.router, prefix="/api", tags=["User"])
 
+def open_token_ledger():
+    with engine.begin() as conn:
+        return f"{open_ledger(conn)} opening balance(s)"
+
+def backfill_rollups():
+    with SessionLocal() as db:
+        category_rows, user_rows = rollup_crud.backfill(db)
+    return f"{category_rows} category and {user_rows} user row(s)"
+
+def load_phash_index():
+    with SessionLocal() as db:
+        return f"{waste.load_phash_index(db)} image(s)"
+
+def load_order_book():
+    # Purchases before this finishes scan the database for lots instead
+    with SessionLocal() as db:
+        order_book.load_from_db(db)
+
+# Work that grows with the data runs after the app starts serving; /ready reports it
+warmup = Warmup()
+if "token_ledger" in created_tables and "users" not in created_tables:
+    warmup.add("open_token_ledger", open_token_ledger)
+if "category_rollups" in created_tables and "waste_items" not in created_tables:
+    warmup.add("backfill_rollups", backfill_rollups)
+warmup.add("load_phash_index", load_phash_index)
+warmup.add("load_order_book", load_order_book)
+
+@app.on_event("startup")
+def start_model_loading():
+    global startup_seconds
+    # Load the classifier and the in-memory indexes off the request path so /auth and /token-balance serve immediately
+    if MODEL_PRELOAD == "background":
+        registry.load_in_background()
+    warmup.run_in_background()
+    startup_seconds = time.perf_counter() - _import_started
+    print(f"[INFO] App imported in {IMPORT_SECONDS:.3f}s, serving after {startup_seconds:.3f}s")
+
+def snapshot_balances():
+    db = SessionLocal()
+    try:
+        taken = take_snapshots(db)
+        if taken:
+            print(f"[INFO] Snapshotted {taken} token balance(s)")
+    except Exception as e:
+        db.rollback()
+        print(f"[ERROR] Balance snapshot failed: {e}")
+    finally:
+        db.close()
+
+async def snapshot_balances_periodically():
+    while True:
+        await asyncio.sleep(BALANCE_SNAPSHOT_INTERVAL)
+        await run_in_threadpool(snapshot_balances)
+
+@app.on_event("startup")
+async def start_balance_snapshots():
+    global snapshot_task
+    if BALANCE_SNAPSHOT_INTERVAL > 0:
+        snapshot_task = asyncio.create_task(snapshot_balances_periodically())
+
+def archive_old_rows_once():
+    db = SessionLocal()
+    try:
+        moved = archive_old_rows(db)
+        if any(moved.values()):
+            print(f"[INFO] Archived {moved['waste_items']} sold item(s) and {moved['transactions']} transaction(s)")
+    except Exception as e:
+        db.rollback()
+        print(f"[ERROR] Archive run failed: {e}")
+    finally:
+        db.close()
+
+async def archive_periodically():
+    while True:
+        await asyncio.sleep(ARCHIVE_INTERVAL)
+        await run_in_threadpool(archive_old_rows_once)
+
+@app.on_event("startup")
+async def start_archiving():
+    global archive_task
+    if ARCHIVE_INTERVAL > 0:
+        archive_task = asyncio.create_task(archive_periodically())
+
+@app.on_event("shutdown")
+async def shutdown_http_clients():
+    for task in (snapshot_task, archive_task):
+        if task is not None:
+            task.cancel()
+    await close_clients()
+    registry.shutdown()
+    await dispose_engines()
+
+# Liveness: the process is up and serving
+@app.get("/health")
+def health():
+    return {"status": "ok"}
+
+# Readiness: the classifier and the startup indexes are loaded
+@app.get("/ready")
+def ready(response: Response):
+    is_ready = registry.is_ready and warmup.is_ready
+    if not is_ready:
+        response.status_code = 503
+    return {
+        "ready": is_ready,
+        "import_seconds": IMPORT_SECONDS,
+        "startup_seconds": startup_seconds,
+        "model": registry.stats(),
+        "startup": warmup.stats(),
+    }
+
+@app.get("/metrics/db-pool")
+def db_pool_metrics():
+    return pool_stats()
+
+@app.get("/metrics/response-cache")
+def response_cache_metrics():
+    return response_cache.stats()
+
 # Optional root test endpoint
 @app.get("/")
 def read_root():
@@ -0,0 +1,272 @@
+"""Maintenance commands: python -m app.manage <command> --help"""
+import argparse
+import json
+import os
+import sys
+
+from app.model_backends import BACKENDS, MODEL_CALIBRATION_DIR
+from app.model_registry import MODEL_PATH
+
+
+def export_model(args):
+    from app.model_backends import export_backend
+
+    for backend in args.backend:
+        export_backend(args.model_path, backend, calibration_dir=args.calibration_dir)
+
+
+def fetch_model(args):
+    import hashlib
+
+    import httpx
+
+    if not args.url:
+        sys.exit("[ERROR] Pass --url or set MODEL_URL")
+    os.makedirs(os.path.dirname(os.path.abspath(args.model_path)), exist_ok=True)
+    partial = args.model_path + ".part"
+    digest = hashlib.sha256()
+    with httpx.stream("GET", args.url, follow_redirects=True, timeout=60) as response:
+        if response.status_code != 200:
+            sys.exit(f"[ERROR] Could not download weights (status {response.status_code}): {args.url}")
+        with open(partial, "wb") as f:
+            for chunk in response.iter_bytes():
+                digest.update(chunk)
+                f.write(chunk)
+    if args.sha256 and digest.hexdigest() != args.sha256.lower():
+        os.remove(partial)
+        sys.exit(f"[ERROR] sha256 mismatch: got {digest.hexdigest()}, expected {args.sha256}")
+    os.replace(partial, args.model_path)  # exports are redone on next load, their digest no longer matches
+    print(f"[INFO] Saved weights to {args.model_path} (sha256 {digest.hexdigest()})")
+
+
+def compare_model_backends(args):
+    from app.model_backends import compare_backends
+
+    results = compare_backends(
+        args.model_path,
+        args.backend,
+        image_dir=args.images,
+        sample_count=args.samples,
+        batch_size=args.batch_size,
+        iterations=args.iterations,
+        num_threads=args.threads,
+        calibration_dir=args.calibration_dir,
+    )
+    if args.json:
+        json.dump(results, sys.stdout, indent=2)
+        print()
+        return
+    print(f"{'backend':<14}{'p50 ms':>9}{'p95 ms':>9}{'img/s':>9}{'RSS MB':>9}{'model MB':>10}{'top-1':>8}{'speedup':>9}")
+    for r in results:
+        print(
+            f"{r['backend']:<14}{r['latency_ms_p50']:>9.2f}{r['latency_ms_p95']:>9.2f}"
+            f"{r['throughput_images_per_sec']:>9.1f}{r['rss_mb']:>9.0f}{r['model_rss_mb']:>10.0f}"
+            f"{r['top1_agreement']:>8.1%}{r['speedup_vs_fp32']:>8.2f}x"
+        )
+
+
+def explain_queries(args):
+    from app.database import SessionLocal
+    from app.query_plans import check_query_plans
+
+    db = SessionLocal()
+    try:
+        results = check_query_plans(db)
+    finally:
+        db.close()
+    for r in results:
+        print(f"{'ok  ' if r['uses_index'] else 'MISS'} {r['query']:<36} {r['index']}")
+        if args.verbose or not r["uses_index"]:
+            print("     " + r["plan"].replace("\n", "\n     "))
+    if not all(r["uses_index"] for r in results):
+        sys.exit(1)
+
+
+def reconcile_groups(args):
+    from app.crud.group_crud import reconcile
+    from app.database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        drift = reconcile(db)
+    finally:
+        db.close()
+    for d in drift:
+        print(f"{d['category']:<16} stored {d['stored']} -> actual {d['actual']}")
+    print(f"[INFO] material_groups rebuilt; {len(drift)} categor{'y' if len(drift) == 1 else 'ies'} had drifted")
+
+
+def snapshot_balances(args):
+    from app.crud.token_crud import BALANCE_SNAPSHOT_GRACE, take_snapshots
+    from app.database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        taken = take_snapshots(db, grace_seconds=BALANCE_SNAPSHOT_GRACE if args.grace is None else args.grace)
+    finally:
+        db.close()
+    print(f"[INFO] Snapshotted {taken} token balance(s)")
+
+
+def check_ledger(args):
+    from app.crud.token_crud import check_ledger as find_mismatches
+    from app.database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        mismatches = find_mismatches(db)
+    finally:
+        db.close()
+    for m in mismatches:
+        print(f"user {m['user_id']:<8} balance {m['balance']} != ledger {m['ledger']}")
+    print(f"[INFO] {len(mismatches)} balance(s) disagree with the token ledger")
+    if mismatches:
+        sys.exit(1)
+
+
+def backfill_rollups(args):
+    from app.crud.rollup_crud import backfill
+    from app.database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        category_rows, user_rows = backfill(db)
+    finally:
+        db.close()
+    print(f"[INFO] Rebuilt {category_rows} category and {user_rows} user rollup row(s)")
+
+
+def archive(args):
+    from app.crud.archive_crud import ARCHIVE_AFTER_DAYS, ARCHIVE_BATCH_SIZE, archive as archive_old_rows
+    from app.database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        moved = archive_old_rows(
+            db,
+            ARCHIVE_AFTER_DAYS if args.after_days is None else args.after_days,
+            ARCHIVE_BATCH_SIZE if args.batch_size is None else args.batch_size,
+        )
+    finally:
+        db.close()
+    print(f"[INFO] Archived {moved['waste_items']} sold item(s) and {moved['transactions']} transaction(s)")
+
+
+def import_csv(args):
+    import asyncio
+
+    from app.database import SessionLocal
+    from app.image_fetch import close_clients
+    from app.ingest import CsvFormatError, csv_rows, file_chunks, ingest, seller_username
+    from app.api.waste import load_phash_index
+
+    db = SessionLocal()
+    try:
+        load_phash_index(db)  # so re-listed photos are flagged as duplicates, as in the server
+    finally:
+        db.close()
+
+    async def run():
+        try:
+            username = await seller_username(args.user_id)
+            async for result in ingest(await csv_rows(file_chunks(args.path)), args.user_id, username):
+                if args.json:
+                    print(json.dumps(result))
+                elif "summary" in result:
+                    s = result["summary"]
+                    print(f"[INFO] {s['rows']} rows: {s['inserted']} listed ({s['verified']} verified), {s['errors']} failed")
+                elif "error" in result:
+                    print(f"[ERROR] row {result['row']}: {result['error']}")
+        finally:
+            await close_clients()
+
+    from fastapi import HTTPException
+
+    try:
+        asyncio.run(run())
+    except CsvFormatError as e:
+        sys.exit(f"[ERROR] {e}")
+    except HTTPException as e:
+        sys.exit(f"[ERROR] {e.detail}")
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="python -m app.manage")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    p = commands.add_parser("export-model", help="Export the classifier to a faster CPU backend")
+    p.add_argument("--backend", action="append", choices=BACKENDS[1:], required=True)
+    p.add_argument("--model-path", default=MODEL_PATH)
+    p.add_argument("--calibration-dir", default=MODEL_CALIBRATION_DIR, help="Sample images for int8-static")
+    p.set_defaults(func=export_model)
+
+    p = commands.add_parser("fetch-model", help="Download the classifier weights (they are not kept in git)")
+    p.add_argument("--url", default=os.getenv("MODEL_URL"), help="Where the trained weights are published (default MODEL_URL)")
+    p.add_argument("--sha256", default=os.getenv("MODEL_SHA256"), help="Expected digest of the weights (default MODEL_SHA256)")
+    p.add_argument("--model-path", default=MODEL_PATH)
+    p.set_defaults(func=fetch_model)
+
+    p = commands.add_parser("compare-backends", help="Benchmark exported backends against fp32")
+    p.add_argument("--backend", action="append", choices=BACKENDS, default=None)
+    p.add_argument("--model-path", default=MODEL_PATH)
+    p.add_argument("--images", help="Directory of sample images (synthetic inputs if omitted)")
+    p.add_argument("--samples", type=int, default=32)
+    p.add_argument("--batch-size", type=int, default=16)
+    p.add_argument("--iterations", type=int, default=50)
+    p.add_argument("--threads", type=int, default=1)
+    p.add_argument("--calibration-dir", default=MODEL_CALIBRATION_DIR, help="Sample images for int8-static (defaults to --images)")
+    p.add_argument("--json", action="store_true", help="Print machine-readable results")
+    p.set_defaults(func=compare_model_backends)
+
+    p = commands.add_parser("reconcile-groups", help="Rebuild material_groups category totals from waste_items")
+    p.set_defaults(func=reconcile_groups)
+
+    p = commands.add_parser("explain-queries", help="Check the hot queries are served by their indexes (exit 1 if not)")
+    p.add_argument("--verbose", action="store_true", help="Print every plan, not only misses")
+    p.set_defaults(func=explain_queries)
+
+    p = commands.add_parser("snapshot-balances", help="Snapshot the balance of every user with new token ledger entries")
+    p.add_argument("--grace", type=float, default=None, help="Only cover entries older than this many seconds (default BALANCE_SNAPSHOT_GRACE)")
+    p.set_defaults(func=snapshot_balances)
+
+    p = commands.add_parser("check-ledger", help="Check every balance equals the sum of its token ledger (exit 1 if not)")
+    p.set_defaults(func=check_ledger)
+
+    p = commands.add_parser(
+        "backfill-rollups",
+        help="Rebuild the dashboard rollups from waste_items and transactions",
+        description="Uploads, purchases and archiving wait while it runs.",
+    )
+    p.set_defaults(func=backfill_rollups)
+
+    p = commands.add_parser(
+        "archive",
+        help="Move sold items and transactions older than ARCHIVE_AFTER_DAYS into the archive tables",
+        description="Safe while the server runs: rows move a batch per transaction.",
+    )
+    p.add_argument("--after-days", type=float, default=None, help="Archive rows older than this (default ARCHIVE_AFTER_DAYS)")
+    p.add_argument("--batch-size", type=int, default=None, help="Rows moved per transaction (default ARCHIVE_BATCH_SIZE)")
+    p.set_defaults(func=archive)
+
+    p = commands.add_parser(
+        "import-csv",
+        help="Bulk-list a seller's lots from a CSV (columns: image_url, category[, description, amount_kg, force_unverified])",
+        description="Listings appear in a running server's cached marketplace pages within RESPONSE_CACHE_TTL.",
+    )
+    p.add_argument("path")
+    p.add_argument("--user-id", type=int, required=True, help="Seller the lots are listed for")
+    p.add_argument("--json", action="store_true", help="Print every row's result as NDJSON")
+    p.set_defaults(func=import_csv)
+
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if getattr(args, "backend", None) is None and args.command == "compare-backends":
+        args.backend = list(BACKENDS)
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,259 @@
+import hashlib
+import os
+import time
+from typing import List, Optional
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# fp32 | torchscript | int8-dynamic | int8-static | onnx
+MODEL_BACKEND = os.getenv("MODEL_BACKEND", "fp32").lower()
+# Sample images used to calibrate int8-static activations
+MODEL_CALIBRATION_DIR = os.getenv("MODEL_CALIBRATION_DIR")
+
+BACKENDS = ("fp32", "torchscript", "int8-dynamic", "int8-static", "onnx")
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png")
+
+
+def artifact_path(model_path: str, backend: str) -> str:
+    """Where the exported model for ``backend`` lives, next to the fp32 weights."""
+    base, _ = os.path.splitext(model_path)
+    if backend == "onnx":
+        return f"{base}.onnx"
+    return f"{base}.{backend}.pt"
+
+
+def weights_digest(model_path: str) -> str:
+    """sha256 of the fp32 weights; stored next to each export to tell whether it is stale."""
+    digest = hashlib.sha256()
+    with open(model_path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _digest_path(path: str) -> str:
+    return f"{path}.sha256"
+
+
+def list_images(directory: str, limit: Optional[int] = None) -> List[str]:
+    paths = sorted(
+        os.path.join(directory, name) for name in os.listdir(directory)
+        if name.lower().endswith(IMAGE_EXTENSIONS)
+    )
+    return paths[:limit] if limit else paths
+
+
+def load_image_batch(paths: List[str]):
+    """Decode sample images exactly as the API does, so calibration sees serving inputs."""
+    import torch
+    from app.image_decode import decode_image_tensor
+
+    tensors = []
+    for path in paths:
+        with open(path, "rb") as f:
+            tensors.append(decode_image_tensor(f.read()))
+    return torch.stack(tensors)
+
+
+def synthetic_batch(count: int, seed: int = 0):
+    import torch
+
+    generator = torch.Generator().manual_seed(seed)
+    return torch.rand(count, 3, 224, 224, generator=generator)
+
+
+class OnnxModel:
+    """Wraps an ONNX Runtime session so it can be called like a torch module.
+
+    onnxruntime (and onnx, for exporting) are optional; only needed for MODEL_BACKEND=onnx.
+    """
+
+    def __init__(self, path: str, num_threads: int = 0):
+        import onnxruntime as ort
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if num_threads > 0:
+            options.intra_op_num_threads = num_threads
+        self.session = ort.InferenceSession(path, options, providers=["CPUExecutionProvider"])
+        self.input_name = self.session.get_inputs()[0].name
+
+    def __call__(self, batch):
+        import torch
+
+        return torch.from_numpy(self.session.run(None, {self.input_name: batch.numpy()})[0])
+
+    def eval(self):
+        return self
+
+
+def _calibrate_static_int8(model, calibration_batch):
+    from torch.ao.quantization import get_default_qconfig_mapping
+    from torch.ao.quantization.quantize_fx import convert_fx, prepare_fx
+
+    prepared = prepare_fx(model, get_default_qconfig_mapping("x86"), (calibration_batch[:1],))
+    for start in range(0, len(calibration_batch), 8):
+        prepared(calibration_batch[start:start + 8])
+    return convert_fx(prepared)
+
+
+def export_backend(model_path: str, backend: str, calibration_dir: Optional[str] = MODEL_CALIBRATION_DIR) -> str:
+    """Convert the fp32 weights at ``model_path`` into ``backend`` and save it; returns the artifact path."""
+    import torch
+    from app.model_registry import build_model
+
+    if backend not in BACKENDS or backend == "fp32":
+        raise ValueError(f"Cannot export backend {backend!r}; choose one of {', '.join(BACKENDS[1:])}")
+    model = build_model(model_path, backend="fp32")
+    example = synthetic_batch(1)
+    path = artifact_path(model_path, backend)
+    start = time.perf_counter()
+    with torch.no_grad():
+        if backend == "onnx":
+            torch.onnx.export(
+                model, example, path,
+                input_names=["images"], output_names=["logits"],
+                dynamic_axes={"images": {0: "batch"}, "logits": {0: "batch"}},
+                opset_version=17, dynamo=False,
+            )
+        else:
+            if backend == "int8-dynamic":
+                # Only the final Linear has dynamic-quantizable weights in ResNet18
+                model = torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+            elif backend == "int8-static":
+                if not calibration_dir:
+                    raise ValueError("int8-static needs sample images: set MODEL_CALIBRATION_DIR or pass --calibration-dir")
+                model = _calibrate_static_int8(model, load_image_batch(list_images(calibration_dir, limit=128)))
+            traced = torch.jit.freeze(torch.jit.trace(model, example))
+            torch.jit.save(traced, path)
+    with open(_digest_path(path), "w") as f:
+        f.write(weights_digest(model_path))
+    print(f"[INFO] Exported {backend} model to {path} in {time.perf_counter() - start:.1f}s")
+    return path
+
+
+def ensure_exported(model_path: str, backend: str, export_missing: bool = True) -> str:
+    """Return the artifact for ``backend``, exporting it if it is missing or was made from other weights."""
+    path = artifact_path(model_path, backend)
+    # A digest rather than mtimes: checkouts and copies don't keep the order of modification times
+    exported_from = None
+    if os.path.exists(path) and os.path.exists(_digest_path(path)):
+        with open(_digest_path(path)) as f:
+            exported_from = f.read().strip()
+    if exported_from != weights_digest(model_path):
+        if not export_missing:
+            raise FileNotFoundError(f"No {backend} export at {path}; run `python -m app.manage export-model --backend {backend}`")
+        export_backend(model_path, backend)
+    return path
+
+
+def load_backend_model(model_path: str, backend: str, num_threads: int = 0, export_missing: bool = True):
+    """Load the exported ``backend`` model, exporting it from the fp32 weights first if needed."""
+    import torch
+
+    path = ensure_exported(model_path, backend, export_missing)
+    if backend == "onnx":
+        return OnnxModel(path, num_threads=num_threads)
+    if num_threads > 0:
+        torch.set_num_threads(num_threads)
+    model = torch.jit.load(path, map_location="cpu")
+    model.eval()
+    return model
+
+
+def _rss_mb() -> float:
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024.0
+    except OSError:
+        pass
+    import resource
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+
+
+def _measure_backend(model_path: str, backend: str, images, batch_size: int, iterations: int, num_threads: int) -> dict:
+    """Runs inside a fresh process so resident memory reflects this backend alone."""
+    import statistics
+    import torch
+    from app.model_registry import build_model
+
+    torch.set_num_threads(max(1, num_threads))
+    baseline_rss = _rss_mb()
+    start = time.perf_counter()
+    model = build_model(model_path, backend=backend)
+    load_seconds = time.perf_counter() - start
+    latencies = []
+    with torch.no_grad():
+        model(images[:1])  # warm-up
+        for i in range(iterations):
+            single = images[i % len(images)].unsqueeze(0)
+            t0 = time.perf_counter()
+            model(single)
+            latencies.append((time.perf_counter() - t0) * 1000.0)
+        batch = images[:batch_size]
+        t0 = time.perf_counter()
+        rounds = max(1, iterations // batch_size)
+        for _ in range(rounds):
+            model(batch)
+        throughput = rounds * len(batch) / (time.perf_counter() - t0)
+        predictions = []
+        for start_idx in range(0, len(images), batch_size):
+            predictions.extend(model(images[start_idx:start_idx + batch_size]).argmax(dim=1).tolist())
+    latencies.sort()
+    return {
+        "backend": backend,
+        "load_seconds": load_seconds,
+        "latency_ms_p50": statistics.median(latencies),
+        "latency_ms_p95": latencies[int(0.95 * (len(latencies) - 1))],
+        "throughput_images_per_sec": throughput,
+        "rss_mb": _rss_mb(),
+        "model_rss_mb": _rss_mb() - baseline_rss,
+        "predictions": predictions,
+    }
+
+
+def compare_backends(
+    model_path: str,
+    backends: List[str],
+    image_dir: Optional[str] = None,
+    sample_count: int = 32,
+    batch_size: int = 16,
+    iterations: int = 50,
+    num_threads: int = 1,
+    calibration_dir: Optional[str] = MODEL_CALIBRATION_DIR,
+) -> List[dict]:
+    """Latency, throughput, memory and top-1 agreement with fp32 for each backend.
+
+    Uses images from ``image_dir`` when given, otherwise a fixed synthetic batch.
+    Missing exports are created first so export time isn't counted as load time.
+    """
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor
+
+    if image_dir:
+        images = load_image_batch(list_images(image_dir, limit=sample_count))
+    else:
+        images = synthetic_batch(sample_count)
+    if "fp32" not in backends:
+        backends = ["fp32"] + list(backends)
+    for backend in backends:
+        if backend != "fp32" and not os.path.exists(artifact_path(model_path, backend)):
+            export_backend(model_path, backend, calibration_dir=calibration_dir or image_dir)
+    results = []
+    context = multiprocessing.get_context("spawn")
+    for backend in backends:
+        with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+            results.append(executor.submit(
+                _measure_backend, model_path, backend, images, batch_size, iterations, num_threads,
+            ).result())
+    reference = results[0]["predictions"]
+    fp32_latency = results[0]["latency_ms_p50"]
+    for result in results:
+        predictions = result.pop("predictions")
+        result["top1_agreement"] = sum(a == b for a, b in zip(predictions, reference)) / len(reference)
+        result["speedup_vs_fp32"] = fp32_latency / result["latency_ms_p50"] if result["latency_ms_p50"] else None
+    return results
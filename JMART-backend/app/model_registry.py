@@ -0,0 +1,155 @@
+import os
+import threading
+import time
+from typing import Optional
+
+from dotenv import load_dotenv
+
+from app.prediction_cache import file_digest
+from app.inference_workers import INFERENCE_MODE
+from app.model_backends import MODEL_BACKEND, ensure_exported, load_backend_model
+
+load_dotenv()
+
+# List your class names in the same order as your training set
+CLASS_NAMES = ['glass', 'metal', 'organic', 'paper', 'plastic']
+
+DEFAULT_MODEL_PATH = os.path.join(os.path.dirname(__file__), 'ai-model', 'waste_classifier.pth')
+MODEL_PATH = os.getenv("MODEL_PATH", DEFAULT_MODEL_PATH)
+# "background" starts loading right after startup, "lazy" waits for the first prediction
+MODEL_PRELOAD = os.getenv("MODEL_PRELOAD", "background").lower()
+
+
+def build_model(model_path: str = MODEL_PATH, num_threads: int = 0, backend: str = MODEL_BACKEND):
+    """Build the classifier for ``backend`` (imports torch on first call).
+
+    Anything other than fp32 is loaded from its exported artifact, see app.model_backends.
+    """
+    import torch
+    from torchvision import models
+
+    if backend != "fp32":
+        return load_backend_model(model_path, backend, num_threads=num_threads)
+    if num_threads > 0:
+        torch.set_num_threads(num_threads)
+    model = models.resnet18(weights=None)
+    model.fc = torch.nn.Linear(model.fc.in_features, len(CLASS_NAMES))
+    model.load_state_dict(torch.load(model_path, map_location='cpu'))
+    model.eval()
+    return model
+
+
+class ModelRegistry:
+    """Owns the single classifier instance shared by every route.
+
+    Nothing touches torch until the model is first needed, either from a
+    prediction or from ``load_in_background`` after startup.
+    """
+
+    def __init__(self, model_path: str = MODEL_PATH, backend: str = MODEL_BACKEND):
+        self.model_path = model_path
+        self.backend = backend
+        self.model = None
+        self.version: Optional[str] = None
+        self.load_seconds: Optional[float] = None
+        self.error: Optional[str] = None
+        self._engine = None
+        self._pool = None
+        self._lock = threading.Lock()
+        self._listeners = []
+
+    @property
+    def is_ready(self) -> bool:
+        return self.version is not None
+
+    def on_load(self, callback) -> None:
+        """Register ``callback(version)``, called once the weights are loaded."""
+        self._listeners.append(callback)
+
+    def _load(self, load_weights: bool) -> None:
+        start = time.perf_counter()
+        try:
+            if load_weights:
+                self.model = build_model(self.model_path, backend=self.backend)
+            elif self.backend != "fp32":
+                # Export once here rather than racing in every worker process
+                ensure_exported(self.model_path, self.backend)
+            # Predictions from different backends can differ slightly, so they are cached separately
+            self.version = f"{file_digest(self.model_path)}:{self.backend}"
+        except Exception as e:
+            self.error = str(e)
+            print(f"[ERROR] Failed to load classifier from {self.model_path}: {e}")
+            raise
+        self.error = None
+        self.load_seconds = time.perf_counter() - start
+        print(f"[INFO] Classifier ready in {self.load_seconds:.2f}s (version {self.version[:12]})")
+        for callback in self._listeners:
+            callback(self.version)
+
+    def get_model(self):
+        if self.model is None:
+            with self._lock:
+                if self.model is None:
+                    self._load(load_weights=True)
+        return self.model
+
+    def get_engine(self):
+        """In-process batching engine (INFERENCE_MODE=thread)."""
+        if self._engine is None:
+            model = self.get_model()
+            with self._lock:
+                if self._engine is None:
+                    from app.inference import BatchingInferenceEngine
+                    self._engine = BatchingInferenceEngine(model, CLASS_NAMES)
+        return self._engine
+
+    def get_pool(self):
+        """Worker-process pool (INFERENCE_MODE=process); the API process never loads the weights."""
+        if self._pool is None:
+            with self._lock:
+                if self._pool is None:
+                    from app.inference_workers import ProcessInferencePool
+                    self._load(load_weights=False)
+                    self._pool = ProcessInferencePool(self.model_path, CLASS_NAMES, backend=self.backend)
+        return self._pool
+
+    def get_predictor(self):
+        """Engine or pool depending on INFERENCE_MODE; both expose submit/predict/stats."""
+        if INFERENCE_MODE == "process":
+            return self.get_pool()
+        return self.get_engine()
+
+    def predictor_stats(self) -> Optional[dict]:
+        predictor = self._pool if INFERENCE_MODE == "process" else self._engine
+        return predictor.stats() if predictor is not None else None
+
+    def warm_up(self) -> None:
+        try:
+            self.get_predictor()
+        except Exception:
+            pass  # already logged; readiness keeps reporting the error
+
+    def load_in_background(self) -> threading.Thread:
+        thread = threading.Thread(target=self.warm_up, name="model-loader", daemon=True)
+        thread.start()
+        return thread
+
+    def stats(self) -> dict:
+        return {
+            "ready": self.is_ready,
+            "inference_mode": INFERENCE_MODE,
+            "model_path": self.model_path,
+            "backend": self.backend,
+            "version": self.version,
+            "load_seconds": self.load_seconds,
+            "error": self.error,
+        }
+
+    def shutdown(self) -> None:
+        if self._engine is not None:
+            self._engine.shutdown()
+        if self._pool is not None:
+            self._pool.shutdown()
+
+
+registry = ModelRegistry()
@@ -2,3 +2,6 @@ from .user import User
 from .waste_item import WasteItem
 from .group import MaterialGroup
 from .transaction import Transaction
+from .token_ledger import TokenLedgerEntry, BalanceSnapshot
+from .rollup import CategoryRollup, UserRollup
+from .archive import ArchivedWasteItem, ArchivedTransaction
@@ -0,0 +1,57 @@
+from sqlalchemy import Column, Integer, String, Float, Boolean, DateTime, ForeignKey, Index, JSON
+from app.database import Base
+from datetime import datetime
+
+# Rows moved out of the hot tables by `python -m app.manage archive` (or the background job).
+# They keep their original ids and columns, so history reads can UNION them with the hot table.
+
+class ArchivedWasteItem(Base):
+    """A sold waste item older than ARCHIVE_AFTER_DAYS, moved out of waste_items."""
+    __tablename__ = "waste_items_archive"
+    id = Column(Integer, primary_key=True, autoincrement=False)
+    user_id = Column(Integer, ForeignKey("users.id"))
+    username = Column(String)
+    description = Column(String)
+    image_url = Column(String)
+    category = Column(String)
+    verified = Column(Boolean)
+    predicted_category = Column(String)
+    ai_confidence = Column(Float)
+    ai_probabilities = Column(JSON, nullable=True)
+    amount_kg = Column(Float)
+    sold = Column(Boolean)
+    sold_at = Column(DateTime, nullable=True)
+    phash = Column(String(16), nullable=True)
+    duplicate_of = Column(Integer, nullable=True)  # may point at either table
+    listed_kg = Column(Float, nullable=True)
+    created_at = Column(DateTime, nullable=True)
+    archived_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+    __table_args__ = (
+        # /listings pages through one seller's items by id across both tables
+        Index("ix_waste_items_archive_user_id_id", "user_id", "id"),
+    )
+
+class ArchivedTransaction(Base):
+    """A transaction older than ARCHIVE_AFTER_DAYS, moved out of transactions.
+
+    On Postgres the table is partitioned by month of ``timestamp`` (partitions are
+    created by the archive job as it needs them), so the key includes it.
+    """
+    __tablename__ = "transactions_archive"
+    id = Column(Integer, primary_key=True, autoincrement=False)
+    timestamp = Column(DateTime, primary_key=True)
+    buyer_id = Column(Integer, ForeignKey("users.id"))
+    seller_id = Column(Integer, ForeignKey("users.id"))
+    category = Column(String)
+    amount_kg = Column(Float)
+    tokens = Column(Float)
+    waste_item_id = Column(Integer, nullable=True)
+
+    __table_args__ = (
+        # Same shape as the hot table's history and profit indexes
+        Index("ix_transactions_archive_buyer_id_timestamp", "buyer_id", "timestamp", "id"),
+        Index("ix_transactions_archive_seller_id_timestamp", "seller_id", "timestamp", "id"),
+        Index("ix_transactions_archive_waste_item_id", "waste_item_id"),
+        {"postgresql_partition_by": "RANGE (timestamp)"},
+    )
@@ -1,8 +1,15 @@
-from sqlalchemy import Column, Integer, String
+from sqlalchemy import Column, Integer, String, Float
 from app.database import Base
 
 class MaterialGroup(Base):
+    """Available stock per category, kept up to date by upload and buy-category.
+
+    Rebuild from waste_items with `python -m app.manage reconcile-groups`.
+    """
     __tablename__ = "material_groups"
     id = Column(Integer, primary_key=True, index=True)
-    material_type = Column(String)
-    total_weight = Column(Integer, default=0)
+    material_type = Column(String, unique=True, index=True)  # the waste category
+    total_weight = Column(Float, default=0.0)  # available kg
+    seller_count = Column(Integer, default=0)  # sellers with available stock
+    item_count = Column(Integer, default=0)  # listings with available stock
+    thumbnail_url = Column(String, nullable=True)
@@ -0,0 +1,53 @@
+from sqlalchemy import Column, Integer, String, Float, Boolean, DateTime, ForeignKey, Index, text
+from app.database import Base
+
+# period is "hour", "day", "month" or "all" (one lifetime bucket). A user's category "*" row totals all
+# their categories; platform totals are summed from the category rows when read, so there is no "*" category row
+
+class CategoryRollup(Base):
+    """Marketplace activity per category and time bucket, kept up to date by upload and buy-category.
+
+    Rebuild from waste_items and transactions with `python -m app.manage backfill-rollups`.
+    """
+    __tablename__ = "category_rollups"
+    id = Column(Integer, primary_key=True, index=True)
+    period = Column(String(5), nullable=False)
+    bucket_start = Column(DateTime, nullable=False)
+    category = Column(String, nullable=False)
+    items_uploaded = Column(Integer, default=0, nullable=False)
+    kg_uploaded = Column(Float, default=0.0, nullable=False)
+    kg_sold = Column(Float, default=0.0, nullable=False)
+    tokens_traded = Column(Float, default=0.0, nullable=False)
+    active_sellers = Column(Integer, default=0, nullable=False)  # distinct users who listed or sold in the bucket
+
+    __table_args__ = (
+        # Upsert target, and the stats lookups and series scans
+        Index("uq_category_rollups_period_category_bucket", "period", "category", "bucket_start", unique=True),
+        # Platform totals: every category's row in a bucket
+        Index("ix_category_rollups_period_bucket", "period", "bucket_start"),
+    )
+
+class UserRollup(Base):
+    """One user's activity per category and time bucket."""
+    __tablename__ = "user_rollups"
+    id = Column(Integer, primary_key=True, index=True)
+    period = Column(String(5), nullable=False)
+    bucket_start = Column(DateTime, nullable=False)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    category = Column(String, nullable=False)
+    items_uploaded = Column(Integer, default=0, nullable=False)
+    kg_uploaded = Column(Float, default=0.0, nullable=False)
+    kg_sold = Column(Float, default=0.0, nullable=False)
+    tokens_earned = Column(Float, default=0.0, nullable=False)
+    kg_bought = Column(Float, default=0.0, nullable=False)
+    tokens_spent = Column(Float, default=0.0, nullable=False)
+    active = Column(Boolean, default=False, nullable=False)  # listed or sold; counted once in active_sellers
+
+    __table_args__ = (
+        Index("uq_user_rollups_period_user_category_bucket", "period", "user_id", "category", "bucket_start", unique=True),
+        # Platform active_sellers: the active "*" rows in a bucket
+        Index(
+            "ix_user_rollups_active", "period", "category", "bucket_start",
+            postgresql_where=text("active = true"), sqlite_where=text("active = 1"),
+        ),
+    )
@@ -0,0 +1,30 @@
+from sqlalchemy import Column, Integer, String, Float, ForeignKey, DateTime, Index, UniqueConstraint
+from app.database import Base
+from datetime import datetime
+
+class TokenLedgerEntry(Base):
+    """One credit or debit of a user's tokens. Append-only: users.tokens is always the sum of a user's entries."""
+    __tablename__ = "token_ledger"
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    delta = Column(Float, nullable=False)  # positive credits, negative debits
+    reason = Column(String(32), nullable=False)  # purchase, sale, buy_tokens, sell_tokens, opening_balance
+    reference = Column(String, nullable=True)  # e.g. the category of a purchase or sale
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+    __table_args__ = (
+        # Balance as of a time: one range scan per user
+        Index("ix_token_ledger_user_id_created_at", "user_id", "created_at"),
+    )
+
+class BalanceSnapshot(Base):
+    """A user's balance including every ledger entry created at or before ``taken_at``."""
+    __tablename__ = "balance_snapshots"
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    taken_at = Column(DateTime, nullable=False)
+    balance = Column(Float, nullable=False)
+
+    __table_args__ = (
+        UniqueConstraint("user_id", "taken_at", name="uq_balance_snapshots_user_id_taken_at"),
+    )
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, ForeignKey, DateTime
+from sqlalchemy import Column, Integer, String, Float, ForeignKey, DateTime, Index
 from app.database import Base
 from datetime import datetime
 
@@ -10,4 +10,15 @@ class Transaction(Base):
     category = Column(String)
     amount_kg = Column(Float)
     tokens = Column(Float)
-    timestamp = Column(DateTime, default=datetime.utcnow) 
\ No newline at end of file
+    timestamp = Column(DateTime, default=datetime.utcnow) 
+    waste_item_id = Column(Integer, nullable=True)  # the lot sold; not a foreign key, it may be archived. NULL for older sales
+
+    __table_args__ = (
+        # /transaction-history: buyer_id = ? OR seller_id = ? ORDER BY timestamp, id (one index per side of the OR)
+        Index("ix_transactions_buyer_id_timestamp", "buyer_id", "timestamp", "id"),
+        Index("ix_transactions_seller_id_timestamp", "seller_id", "timestamp", "id"),
+        # The archive job moves the oldest transactions first
+        Index("ix_transactions_timestamp", "timestamp", "id"),
+        # /listings profit: revenue per sold item
+        Index("ix_transactions_waste_item_id", "waste_item_id"),
+    )
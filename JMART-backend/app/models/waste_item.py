@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, Boolean, Float, DateTime
+from sqlalchemy import Column, Integer, String, ForeignKey, Boolean, Float, DateTime, Index, JSON, text
 from app.database import Base
 from datetime import datetime
 
@@ -13,6 +13,28 @@ class WasteItem(Base):
     verified = Column(Boolean, default=None)
     predicted_category = Column(String, default=None)
     ai_confidence = Column(Float, default=None)
-    amount_kg = Column(Float, default=1.0)
+    ai_probabilities = Column(JSON, nullable=True)  # full class distribution, reused for near-duplicate photos
+    amount_kg = Column(Float, default=1.0)  # kg still for sale; purchases draw it down
+    listed_kg = Column(Float, nullable=True)  # kg at upload; NULL for items listed before it was kept
     sold = Column(Boolean, default=False)
     sold_at = Column(DateTime, nullable=True)
+    phash = Column(String(16), nullable=True, index=True)  # 64-bit dHash as hex
+    duplicate_of = Column(Integer, nullable=True)  # the matched item; not a foreign key, it may have been archived
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=True)  # NULL for items listed before it was kept
+
+    __table_args__ = (
+        # buy-category: category = ? AND verified AND amount_kg > 0
+        Index("ix_waste_items_category_verified_amount_kg", "category", "verified", "amount_kg"),
+        # Marketplace summary and per-category pages; only live stock is indexed
+        Index(
+            "ix_waste_items_marketplace", "category", "id",
+            postgresql_where=text("sold = false AND verified = true AND amount_kg > 0"),
+            sqlite_where=text("sold = 0 AND verified = 1 AND amount_kg > 0"),
+        ),
+        # /marketplace-listings pages through unsold items by id
+        Index("ix_waste_items_unsold", "id", postgresql_where=text("sold = false"), sqlite_where=text("sold = 0")),
+        # /listings pages through one seller's items by id
+        Index("ix_waste_items_user_id_id", "user_id", "id"),
+        # The archive job's candidates
+        Index("ix_waste_items_sold_at", "sold_at", postgresql_where=text("sold = true"), sqlite_where=text("sold = 1")),
+    )
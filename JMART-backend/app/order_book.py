@@ -0,0 +1,171 @@
+import heapq
+import os
+import threading
+from typing import Dict, Iterable, List, NamedTuple, Optional, Set
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# fifo: oldest listings sell first | pro-rata: split across the largest ORDER_BOOK_TOP_K lots
+ORDER_BOOK_POLICY = os.getenv("ORDER_BOOK_POLICY", "pro-rata").lower()
+ORDER_BOOK_TOP_K = int(os.getenv("ORDER_BOOK_TOP_K", "8"))
+
+EPSILON = 1e-9
+
+
+class Lot(NamedTuple):
+    item_id: int
+    seller_id: int
+    amount_kg: float
+
+
+class _CategoryBook:
+    def __init__(self):
+        self.lots: Dict[int, Lot] = {}
+        self.by_age: List[int] = []  # item ids; the oldest listing is on top
+        self.aged: Set[int] = set()  # ids with an entry in by_age, so a re-put lot isn't pushed twice
+        self.by_size: List[tuple] = []  # (-amount_kg, item_id); the largest lot is on top
+        self.total_kg = 0.0
+
+    def put(self, lot: Lot) -> None:
+        old = self.lots.pop(lot.item_id, None)
+        if old is not None:
+            self.total_kg -= old.amount_kg
+        if lot.amount_kg <= EPSILON:
+            return
+        self.lots[lot.item_id] = lot
+        self.total_kg += lot.amount_kg
+        if lot.item_id not in self.aged:
+            self.aged.add(lot.item_id)
+            heapq.heappush(self.by_age, lot.item_id)
+        if old is None or old.amount_kg != lot.amount_kg:
+            heapq.heappush(self.by_size, (-lot.amount_kg, lot.item_id))
+        self._compact()
+
+    def remove(self, item_id: int) -> None:
+        old = self.lots.pop(item_id, None)
+        if old is not None:
+            self.total_kg -= old.amount_kg
+            self._compact()
+
+    def _compact(self) -> None:
+        # Entries for changed or removed lots are dropped lazily; rebuild a heap once they pile up
+        if len(self.by_age) > 2 * len(self.lots) + 64:
+            self.by_age = sorted(self.lots)
+            self.aged = set(self.lots)
+        if len(self.by_size) > 2 * len(self.lots) + 64:
+            self.by_size = [(-l.amount_kg, l.item_id) for l in self.lots.values()]
+            heapq.heapify(self.by_size)
+
+    def _take_from(self, heap: List, key, valid, quantity: float, slots: int, exclude: Set[int]) -> List[Lot]:
+        """Walk ``heap`` in order: the first ``slots`` distinct live lots are taken outright (excluded
+        ones still fill a slot), then more until ``quantity`` is covered. Live entries are pushed back."""
+        chosen, kept, seen, covered = [], [], set(), 0.0
+        while heap and (len(seen) < slots or covered < quantity - EPSILON):
+            entry = heapq.heappop(heap)
+            item_id = key(entry)
+            if item_id in seen:
+                continue  # duplicate entry, drop it
+            lot = self.lots.get(item_id)
+            if lot is None or not valid(entry, lot):
+                if heap is self.by_age:
+                    self.aged.discard(item_id)
+                continue  # stale entry, drop it for good
+            seen.add(item_id)
+            kept.append(entry)
+            if item_id in exclude:
+                continue
+            chosen.append(lot)
+            covered += lot.amount_kg
+        for entry in kept:
+            heapq.heappush(heap, entry)
+        return chosen
+
+    def select(self, quantity: float, policy: str, top_k: int, exclude: Set[int]) -> List[Lot]:
+        if policy == "fifo":
+            return self._take_from(self.by_age, lambda e: e, lambda e, lot: True, quantity, 0, exclude)
+        # The top_k largest lots, counting ones already tried (exclude), so a retry only replaces what fell short
+        return self._take_from(self.by_size, lambda e: e[1], lambda e, lot: -e[0] == lot.amount_kg, quantity, top_k, exclude)
+
+
+class OrderBook:
+    """Available lots per category, kept in process so a purchase only looks at the lots it will consume.
+
+    The database stays the source of truth: a purchase locks and re-reads the lots
+    the book picks and corrects the book from what it finds. Lots the book hasn't
+    seen (e.g. uploaded through another worker process) are picked up by the
+    purchase's fallback scan.
+    """
+
+    def __init__(self, policy: str = ORDER_BOOK_POLICY, top_k: int = ORDER_BOOK_TOP_K):
+        if policy not in ("fifo", "pro-rata"):
+            raise ValueError(f"Unknown ORDER_BOOK_POLICY {policy!r}; use fifo or pro-rata")
+        self.policy = policy
+        self.top_k = max(1, top_k)
+        self._books: Dict[str, _CategoryBook] = {}
+        self._lock = threading.Lock()
+
+    def put(self, category: str, lot: Lot) -> None:
+        with self._lock:
+            self._books.setdefault(category, _CategoryBook()).put(lot)
+
+    def put_many(self, category: str, lots: Iterable[Lot]) -> None:
+        with self._lock:
+            book = self._books.setdefault(category, _CategoryBook())
+            for lot in lots:
+                book.put(lot)
+
+    def remove(self, category: str, item_ids: Iterable[int]) -> None:
+        with self._lock:
+            book = self._books.get(category)
+            if book is not None:
+                for item_id in item_ids:
+                    book.remove(item_id)
+
+    def select(self, category: str, quantity: float, exclude: Optional[Set[int]] = None) -> List[Lot]:
+        """Lots to fill ``quantity`` under the configured policy, skipping ``exclude``."""
+        with self._lock:
+            book = self._books.get(category)
+            if book is None:
+                return []
+            return book.select(quantity, self.policy, self.top_k, exclude or set())
+
+    def available_kg(self, category: str) -> float:
+        with self._lock:
+            book = self._books.get(category)
+            return book.total_kg if book is not None else 0.0
+
+    def rebuild(self, lots_by_category: Dict[str, List[Lot]]) -> None:
+        fresh = {}
+        for category, lots in lots_by_category.items():
+            book = fresh.setdefault(category, _CategoryBook())
+            for lot in lots:
+                book.put(lot)
+        with self._lock:
+            self._books = fresh
+
+    def load_from_db(self, db) -> None:
+        from app.models.waste_item import WasteItem
+
+        rows = db.query(WasteItem.category, WasteItem.id, WasteItem.user_id, WasteItem.amount_kg).filter(
+            WasteItem.verified == True, WasteItem.amount_kg > 0
+        ).all()
+        lots: Dict[str, List[Lot]] = {}
+        for category, item_id, seller_id, amount_kg in rows:
+            lots.setdefault(category, []).append(Lot(item_id, seller_id, amount_kg))
+        self.rebuild(lots)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "policy": self.policy,
+                "top_k": self.top_k,
+                "categories": {
+                    category: {"lots": len(book.lots), "available_kg": book.total_kg}
+                    for category, book in self._books.items()
+                },
+            }
+
+
+order_book = OrderBook()
@@ -0,0 +1,73 @@
+import base64
+import json
+import os
+from datetime import datetime
+from typing import List, Optional, Tuple
+
+from dotenv import load_dotenv
+from fastapi import HTTPException
+from sqlalchemy import DateTime, and_, or_
+
+load_dotenv()
+
+PAGE_SIZE = int(os.getenv("PAGE_SIZE", "50"))
+MAX_PAGE_SIZE = int(os.getenv("MAX_PAGE_SIZE", "200"))
+
+# The next page's cursor is sent in this header so list endpoints keep returning plain JSON arrays
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def encode_cursor(values: list) -> str:
+    raw = json.dumps([v.isoformat() if isinstance(v, datetime) else v for v in values], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, columns: list) -> list:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        values = json.loads(raw)
+        if not isinstance(values, list) or len(values) != len(columns):
+            raise ValueError("wrong number of keys")
+        return [
+            datetime.fromisoformat(v) if isinstance(col.type, DateTime) else v
+            for col, v in zip(columns, values)
+        ]
+    except (ValueError, TypeError) as e:
+        raise HTTPException(status_code=400, detail=f"Invalid cursor: {e}")
+
+
+def _after(columns: list, values: list, descending: bool):
+    """Rows strictly after ``values`` in (col1, col2, ...) order, as a plain OR of ANDs.
+
+    Written out instead of a row-value comparison so it works on every backend
+    and can still use a composite index on the same columns.
+    """
+    clauses = []
+    for i, col in enumerate(columns):
+        beyond = col < values[i] if descending else col > values[i]
+        clauses.append(and_(*[columns[j] == values[j] for j in range(i)], beyond))
+    return or_(*clauses)
+
+
+def keyset_page(query, columns: list, cursor: Optional[str] = None, limit: int = PAGE_SIZE, descending: bool = False) -> Tuple[List, Optional[str]]:
+    """One page of ``query`` ordered by ``columns`` (the last one must be unique, e.g. the id).
+
+    Seeks past the cursor with a WHERE clause instead of OFFSET, so page 1000 costs
+    the same as page 1. Returns (rows, next cursor or None on the last page).
+    """
+    if limit < 1:
+        raise HTTPException(status_code=400, detail="limit must be positive.")
+    limit = min(limit, MAX_PAGE_SIZE)
+    if cursor:
+        query = query.filter(_after(columns, decode_cursor(cursor, columns), descending))
+    query = query.order_by(*[col.desc() if descending else col.asc() for col in columns])
+    rows = query.limit(limit + 1).all()
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    last = rows[-1]
+    return rows, encode_cursor([getattr(last, col.key) for col in columns])
+
+
+def next_cursor_headers(next_cursor: Optional[str]) -> dict:
+    return {NEXT_CURSOR_HEADER: next_cursor} if next_cursor else {}
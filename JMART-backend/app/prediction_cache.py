@@ -0,0 +1,134 @@
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+PREDICTION_CACHE_SIZE = int(os.getenv("PREDICTION_CACHE_SIZE", "1024"))
+PREDICTION_CACHE_TTL = float(os.getenv("PREDICTION_CACHE_TTL", "3600"))  # seconds
+
+
+def content_digest(content: bytes) -> str:
+    """Hash of the raw image bytes, so re-posts of the same photo under a new URL still hit."""
+    return hashlib.sha256(content).hexdigest()
+
+
+def file_digest(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+class PredictionCache:
+    """Bounded LRU + TTL cache of (category, confidence, prob_dict) predictions.
+
+    Entries are stored by content digest, together with the image's perceptual
+    hash; a second LRU maps image URLs to digests so a repeated URL skips the
+    download as well as the forward pass. Every entry remembers the model version
+    it was computed with and is dropped once the model changes.
+    """
+
+    def __init__(self, max_entries: int = PREDICTION_CACHE_SIZE, ttl_seconds: float = PREDICTION_CACHE_TTL, model_version: str = ""):
+        self.max_entries = max(1, max_entries)
+        self.ttl = ttl_seconds
+        self.model_version = model_version
+        self._by_digest: "OrderedDict[str, tuple]" = OrderedDict()
+        self._url_to_digest: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.url_hits = 0
+        self.content_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.stale_drops = 0
+
+    def set_model_version(self, version: str) -> None:
+        with self._lock:
+            if version != self.model_version:
+                self.model_version = version
+                self._by_digest.clear()
+                self._url_to_digest.clear()
+
+    def _expired(self, stored_at: float) -> bool:
+        return self.ttl > 0 and time.monotonic() - stored_at > self.ttl
+
+    def _lookup_digest(self, digest: str):
+        entry = self._by_digest.get(digest)
+        if entry is None:
+            return None
+        prediction, version, stored_at, phash = entry
+        if version != self.model_version or self._expired(stored_at):
+            del self._by_digest[digest]
+            self.stale_drops += 1
+            return None
+        self._by_digest.move_to_end(digest)
+        return prediction, phash
+
+    def get_by_url(self, url: str):
+        entry = self.lookup_url(url)
+        return entry[0] if entry is not None else None
+
+    def lookup_url(self, url: str):
+        """(prediction, phash) for a URL seen before, or None."""
+        with self._lock:
+            entry = self._url_to_digest.get(url)
+            if entry is None:
+                return None
+            digest, stored_at = entry
+            if self._expired(stored_at):
+                del self._url_to_digest[url]
+                return None
+            entry = self._lookup_digest(digest)
+            if entry is None:
+                del self._url_to_digest[url]
+                return None
+            self._url_to_digest.move_to_end(url)
+            self.url_hits += 1
+            return entry
+
+    def get_by_digest(self, digest: str):
+        with self._lock:
+            entry = self._lookup_digest(digest)
+            if entry is None:
+                self.misses += 1
+                return None
+            self.content_hits += 1
+            return entry[0]
+
+    def put(self, url: Optional[str], digest: str, prediction, phash: Optional[int] = None) -> None:
+        now = time.monotonic()
+        with self._lock:
+            self._by_digest[digest] = (prediction, self.model_version, now, phash)
+            self._by_digest.move_to_end(digest)
+            if url:
+                self._url_to_digest[url] = (digest, now)
+                self._url_to_digest.move_to_end(url)
+            while len(self._by_digest) > self.max_entries:
+                self._by_digest.popitem(last=False)
+                self.evictions += 1
+            while len(self._url_to_digest) > self.max_entries:
+                self._url_to_digest.popitem(last=False)
+
+    def stats(self) -> dict:
+        with self._lock:
+            hits = self.url_hits + self.content_hits
+            lookups = hits + self.misses
+            return {
+                "entries": len(self._by_digest),
+                "urls": len(self._url_to_digest),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl,
+                "model_version": self.model_version,
+                "url_hits": self.url_hits,
+                "content_hits": self.content_hits,
+                "misses": self.misses,
+                "hit_rate": hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "stale_drops": self.stale_drops,
+            }
@@ -0,0 +1,155 @@
+"""EXPLAIN the hot queries and check each one is served by the index meant for it.
+
+    python -m app.manage explain-queries
+"""
+import json
+from datetime import datetime
+from typing import Callable, List, NamedTuple
+
+from sqlalchemy import and_, func
+from sqlalchemy.orm import Session
+
+from app.models.archive import ArchivedTransaction
+from app.models.rollup import CategoryRollup, UserRollup
+from app.models.transaction import Transaction
+from app.models.waste_item import WasteItem
+
+
+class HotQuery(NamedTuple):
+    name: str
+    build: Callable[[Session], object]  # returns an ORM Query shaped like the route's
+    index: str
+
+
+def _marketplace_filter():
+    from app.api.waste import marketplace_filter
+
+    return marketplace_filter()
+
+
+def _history(db: Session):
+    from app.crud.archive_crud import across
+    from app.pagination import _after
+
+    columns = [Transaction.timestamp, Transaction.id]
+    return across(db, Transaction, [Transaction.id, Transaction.category, Transaction.timestamp],
+                  lambda table: (table.buyer_id == 1) | (table.seller_id == 1)).filter(
+        _after(columns, [datetime(2025, 1, 1), 100], descending=True),
+    ).order_by(Transaction.timestamp.desc(), Transaction.id.desc()).limit(51)
+
+
+def _export_range(db: Session):
+    from app.crud.archive_crud import across
+
+    return across(db, Transaction, [Transaction.id, Transaction.category, Transaction.timestamp], lambda table: and_(
+        (table.buyer_id == 1) | (table.seller_id == 1),
+        table.timestamp >= datetime(2025, 1, 1),
+        table.timestamp < datetime(2025, 2, 1),
+    )).order_by(Transaction.timestamp, Transaction.id)
+
+
+def _seller_listings(db: Session):
+    from app.crud.archive_crud import across
+
+    return across(db, WasteItem, [WasteItem.id, WasteItem.category], lambda table: table.user_id == 1).filter(
+        WasteItem.id > 100
+    ).order_by(WasteItem.id).limit(51)
+
+
+def _listing_profit(db: Session, table):
+    return db.query(table.waste_item_id, func.sum(table.tokens)).filter(table.waste_item_id.in_([1, 2, 3])).group_by(table.waste_item_id)
+
+
+def _platform_series(db: Session):
+    from app.crud.rollup_crud import platform_totals
+
+    return platform_totals(db, "day", lambda column: column <= datetime(2025, 1, 1)).order_by(
+        CategoryRollup.bucket_start.desc()
+    ).limit(24)
+
+
+def _platform_sellers(db: Session):
+    from app.crud.rollup_crud import platform_sellers
+
+    return platform_sellers(db, "day", lambda column: column.between(datetime(2024, 12, 8), datetime(2025, 1, 1)))
+
+
+HOT_QUERIES: List[HotQuery] = [
+    HotQuery(
+        "buy-category candidates",
+        lambda db: db.query(WasteItem).filter(WasteItem.category == "Plastic", WasteItem.verified == True, WasteItem.amount_kg > 0),
+        "ix_waste_items_category_verified_amount_kg",
+    ),
+    HotQuery(
+        "category page",
+        lambda db: db.query(WasteItem).filter(_marketplace_filter(), WasteItem.category == "Plastic", WasteItem.id > 100).order_by(WasteItem.id).limit(51),
+        "ix_waste_items_marketplace",
+    ),
+    HotQuery(
+        "marketplace-listings page",
+        lambda db: db.query(WasteItem).filter(WasteItem.sold == False, WasteItem.id > 100).order_by(WasteItem.id).limit(51),
+        "ix_waste_items_unsold",
+    ),
+    HotQuery("seller listings page", _seller_listings, "ix_waste_items_user_id_id"),
+    HotQuery("seller listings page (archive)", _seller_listings, "ix_waste_items_archive_user_id_id"),
+    HotQuery("listing profit", lambda db: _listing_profit(db, Transaction), "ix_transactions_waste_item_id"),
+    HotQuery("listing profit (archive)", lambda db: _listing_profit(db, ArchivedTransaction), "ix_transactions_archive_waste_item_id"),
+    HotQuery("transaction history (buyer side)", _history, "ix_transactions_buyer_id_timestamp"),
+    HotQuery("transaction history (seller side)", _history, "ix_transactions_seller_id_timestamp"),
+    HotQuery("transaction history (archive buyer side)", _history, "ix_transactions_archive_buyer_id_timestamp"),
+    HotQuery("transaction history (archive seller side)", _history, "ix_transactions_archive_seller_id_timestamp"),
+    HotQuery("transaction export range (buyer side)", _export_range, "ix_transactions_buyer_id_timestamp"),
+    HotQuery("transaction export range (seller side)", _export_range, "ix_transactions_seller_id_timestamp"),
+    HotQuery("transaction export range (archive buyer side)", _export_range, "ix_transactions_archive_buyer_id_timestamp"),
+    HotQuery("transaction export range (archive seller side)", _export_range, "ix_transactions_archive_seller_id_timestamp"),
+    HotQuery(
+        "archive job: sold items",
+        lambda db: db.query(WasteItem.id).filter(WasteItem.sold == True, WasteItem.sold_at < datetime(2025, 1, 1)).limit(500),
+        "ix_waste_items_sold_at",
+    ),
+    HotQuery(
+        "archive job: transactions",
+        lambda db: db.query(Transaction.id, Transaction.timestamp).filter(
+            Transaction.timestamp < datetime(2025, 1, 1), Transaction.id < 1000
+        ).order_by(Transaction.timestamp, Transaction.id).limit(500),
+        "ix_transactions_timestamp",
+    ),
+    HotQuery("platform stats series", _platform_series, "ix_category_rollups_period_bucket"),
+    HotQuery("platform active sellers", _platform_sellers, "ix_user_rollups_active"),
+    HotQuery(
+        "user stats series",
+        lambda db: db.query(UserRollup).filter(
+            UserRollup.user_id == 1, UserRollup.category == "*", UserRollup.period == "day", UserRollup.bucket_start <= datetime(2025, 1, 1)
+        ).order_by(UserRollup.bucket_start.desc()).limit(24),
+        "uq_user_rollups_period_user_category_bucket",
+    ),
+]
+
+
+def explain(db: Session, query) -> str:
+    """The backend's plan for ``query`` as text, with the real bind parameters."""
+    connection = db.connection()
+    dialect = connection.dialect.name
+    # render_postcompile expands IN (...) lists into plain placeholders EXPLAIN can take
+    compiled = query.statement.compile(dialect=connection.dialect, compile_kwargs={"render_postcompile": True})
+    params = tuple(compiled.params[k] for k in compiled.positiontup) if compiled.positional else compiled.params
+    if dialect == "sqlite":
+        rows = connection.exec_driver_sql("EXPLAIN QUERY PLAN " + str(compiled), params).all()
+        return "\n".join(row[-1] for row in rows)
+    if dialect == "postgresql":
+        # A dev database is small enough that a seq scan always wins; ask whether the index *can* serve it
+        connection.exec_driver_sql("SET LOCAL enable_seqscan = off")
+        rows = connection.exec_driver_sql("EXPLAIN (FORMAT JSON) " + str(compiled), params).all()
+        return json.dumps(rows[0][0], indent=1)
+    raise ValueError(f"EXPLAIN check not supported for {dialect}")
+
+
+def check_query_plans(db: Session) -> List[dict]:
+    results = []
+    try:
+        for hot in HOT_QUERIES:
+            plan = explain(db, hot.build(db))
+            results.append({"query": hot.name, "index": hot.index, "uses_index": hot.index in plan, "plan": plan})
+    finally:
+        db.rollback()
+    return results
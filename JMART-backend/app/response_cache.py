@@ -0,0 +1,149 @@
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, Iterable, NamedTuple, Tuple
+
+from dotenv import load_dotenv
+from fastapi import Request, Response
+
+load_dotenv()
+
+RESPONSE_CACHE_SIZE = int(os.getenv("RESPONSE_CACHE_SIZE", "512"))
+# Versions are per process; with several workers this bounds how stale another worker's copy can get
+RESPONSE_CACHE_TTL = float(os.getenv("RESPONSE_CACHE_TTL", "60"))  # seconds
+RESPONSE_CACHE_MAX_ENTRY_BYTES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRY_BYTES", str(1 << 20)))
+
+MARKETPLACE = "marketplace"
+
+
+def user_scope(user_id) -> str:
+    return f"user:{user_id}"
+
+
+class CachedResponse(NamedTuple):
+    version: tuple
+    stored_at: float
+    body: bytes
+    etag: str
+    headers: Dict[str, str]
+
+
+def etag_for(body: bytes) -> str:
+    return '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+
+
+class ResponseCache:
+    """LRU of serialized GET responses, invalidated by per-scope version counters.
+
+    Writers bump the scopes they touched (``marketplace``, ``user:<id>``) after
+    committing. A reader captures the versions of its scopes *before* querying, so
+    a response built while a write was in flight is stored under the old version
+    and never served once the bump lands.
+    """
+
+    def __init__(self, max_entries: int = RESPONSE_CACHE_SIZE, ttl_seconds: float = RESPONSE_CACHE_TTL):
+        self.max_entries = max(1, max_entries)
+        self.ttl = ttl_seconds
+        self._entries: "OrderedDict[str, CachedResponse]" = OrderedDict()
+        self._versions: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+        self.evictions = 0
+
+    def bump(self, *scopes: str) -> None:
+        with self._lock:
+            for scope in scopes:
+                self._versions[scope] = self._versions.get(scope, 0) + 1
+
+    def version(self, scopes: Iterable[str]) -> tuple:
+        with self._lock:
+            return tuple(self._versions.get(scope, 0) for scope in scopes)
+
+    def get(self, key: str, version: tuple):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry.version != version or (self.ttl > 0 and time.monotonic() - entry.stored_at > self.ttl):
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key: str, version: tuple, body: bytes, headers: Dict[str, str]) -> CachedResponse:
+        entry = CachedResponse(version, time.monotonic(), body, etag_for(body), headers)
+        if len(body) > RESPONSE_CACHE_MAX_ENTRY_BYTES:
+            return entry  # still gets an ETag, just isn't kept
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        return entry
+
+    def record_not_modified(self) -> None:
+        with self._lock:
+            self.not_modified += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "bytes": sum(len(e.body) for e in self._entries.values()),
+                "ttl_seconds": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "not_modified": self.not_modified,
+                "evictions": self.evictions,
+            }
+
+
+response_cache = ResponseCache()
+
+
+def _etag_matches(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    candidates = [tag.strip() for tag in header.split(",")]
+    # Weak comparison, as RFC 9110 requires for If-None-Match
+    return "*" in candidates or any(tag.removeprefix("W/") == etag for tag in candidates)
+
+
+def _cache_key(request: Request) -> str:
+    return request.url.path + "?" + "&".join(f"{k}={v}" for k, v in sorted(request.query_params.multi_items()))
+
+
+def cached_json(request: Request, scopes: Iterable[str], build: Callable[[], Tuple[bytes, Dict[str, str]]]) -> Response:
+    """Serve ``build()``'s (JSON body, headers) from the cache, answering 304 when the client's ETag still matches."""
+    key, version = _cache_key(request), response_cache.version(scopes)
+    entry = response_cache.get(key, version)
+    if entry is None:
+        body, headers = build()
+        entry = response_cache.put(key, version, body, headers)
+    return _respond(request, entry)
+
+
+async def cached_json_async(request: Request, scopes: Iterable[str], build: Callable[[], Awaitable[Tuple[bytes, Dict[str, str]]]]) -> Response:
+    """cached_json for async routes: a hit is answered on the event loop without touching the database."""
+    key, version = _cache_key(request), response_cache.version(scopes)
+    entry = response_cache.get(key, version)
+    if entry is None:
+        body, headers = await build()
+        entry = response_cache.put(key, version, body, headers)
+    return _respond(request, entry)
+
+
+def _respond(request: Request, entry: CachedResponse) -> Response:
+    headers = {**entry.headers, "ETag": entry.etag, "Cache-Control": "no-cache"}
+    if _etag_matches(request, entry.etag):
+        response_cache.record_not_modified()
+        return Response(status_code=304, headers=headers)
+    return Response(content=entry.body, media_type="application/json", headers=headers)
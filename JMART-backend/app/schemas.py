@@ -1,5 +1,6 @@
 from pydantic import BaseModel, EmailStr
 from typing import Optional
+from datetime import datetime
 
 class WasteUpload(BaseModel):
     user_id: int
@@ -49,7 +50,16 @@ class WasteItemOut(BaseModel):
     predicted_category: Optional[str] = None
     ai_confidence: Optional[float] = None
     sold: Optional[bool] = None
-    sold_at: Optional[str] = None
+    sold_at: Optional[datetime] = None
+    duplicate_of: Optional[int] = None
+    profit: Optional[float] = None
 
     class Config:
         orm_mode = True
+
+class CategorySummary(BaseModel):
+    category: str
+    total_kg: float
+    seller_count: int
+    item_count: int
+    thumbnail_url: Optional[str] = None
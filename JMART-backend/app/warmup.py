@@ -0,0 +1,53 @@
+"""Startup work whose cost grows with the data, run after the app starts serving.
+
+Loading the near-duplicate index and the order book, and the one-off repairs
+for tables create_all has just made, run in order on a background thread.
+/ready reports each step, the way it reports the classifier's load.
+"""
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+
+class Warmup:
+    def __init__(self):
+        self._steps: List[Tuple[str, Callable[[], Optional[str]]]] = []
+        self._status: Dict[str, dict] = {}
+        self._lock = threading.Lock()
+
+    def add(self, name: str, step: Callable[[], Optional[str]]) -> None:
+        """Register ``step``; it may return a short note for /ready (e.g. how much it loaded)."""
+        self._steps.append((name, step))
+        self._status[name] = {"state": "pending"}
+
+    @property
+    def is_ready(self) -> bool:
+        with self._lock:
+            return all(status["state"] == "done" for status in self._status.values())
+
+    def _set(self, name: str, **status) -> None:
+        with self._lock:
+            self._status[name] = status
+
+    def run(self) -> None:
+        for name, step in self._steps:
+            self._set(name, state="running")
+            start = time.perf_counter()
+            try:
+                note = step()
+            except Exception as e:
+                self._set(name, state="failed", error=str(e), seconds=time.perf_counter() - start)
+                print(f"[ERROR] Startup step {name} failed: {e}")
+                continue
+            seconds = time.perf_counter() - start
+            self._set(name, state="done", seconds=seconds, **({"note": note} if note else {}))
+            print(f"[INFO] Startup step {name} done in {seconds:.2f}s" + (f": {note}" if note else ""))
+
+    def run_in_background(self) -> threading.Thread:
+        thread = threading.Thread(target=self.run, name="warmup", daemon=True)
+        thread.start()
+        return thread
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"ready": all(s["state"] == "done" for s in self._status.values()), "steps": dict(self._status)}
@@ -0,0 +1,159 @@
+"""Concurrent buy-category stress test: many buyers racing for the same stock.
+
+    python -m benchmarks.buy_stress [--buyers 16] [--purchases 200] [--lots 500]
+
+Uses DATABASE_URL when set (point it at a scratch Postgres database to exercise
+row locking), otherwise a temporary SQLite file. Seeds one category, runs the
+purchases from a thread pool against the real purchase path, then checks the
+invariants: nothing oversold, no negative balances, tokens conserved, and every
+kg that left inventory is accounted for by a transaction, and the in-memory
+order book and material_groups totals agree with the database afterwards.
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+CATEGORY = "StressTest"
+TOLERANCE = 1e-6
+
+
+def setup(database_url: str):
+    os.environ["DATABASE_URL"] = database_url
+    from app.database import Base, SessionLocal, engine
+    from app.models import group, transaction, user, waste_item  # noqa: F401  register tables
+
+    Base.metadata.create_all(bind=engine)
+    return SessionLocal, engine
+
+
+def seed(SessionLocal, buyers: int, sellers: int, lots: int, tokens: float, seed_value: int):
+    from app.models.user import User
+    from app.models.waste_item import WasteItem
+
+    rng = random.Random(seed_value)
+    db = SessionLocal()
+    try:
+        run = f"{int(time.time() * 1000)}"
+        people = [User(username=f"stress-{run}-{i}", email=f"stress-{run}-{i}@example.com", password="x", tokens=tokens)
+                  for i in range(buyers + sellers)]
+        db.add_all(people)
+        db.flush()
+        buyer_ids = [u.id for u in people[:buyers]]
+        seller_ids = [u.id for u in people[buyers:]]
+        db.add_all([
+            WasteItem(user_id=rng.choice(seller_ids), username="stress", description="stress lot", image_url="x.jpg",
+                      category=CATEGORY, verified=True, amount_kg=round(rng.uniform(0.5, 5.0), 2), sold=False)
+            for _ in range(lots)
+        ])
+        db.commit()
+        return buyer_ids, seller_ids
+    finally:
+        db.close()
+
+
+def snapshot(SessionLocal, user_ids):
+    from sqlalchemy import func
+    from app.models.transaction import Transaction
+    from app.models.user import User
+    from app.models.waste_item import WasteItem
+
+    db = SessionLocal()
+    try:
+        return {
+            "stock_kg": db.query(func.coalesce(func.sum(WasteItem.amount_kg), 0.0)).filter(WasteItem.category == CATEGORY).scalar(),
+            "negative_lots": db.query(func.count(WasteItem.id)).filter(WasteItem.category == CATEGORY, WasteItem.amount_kg < -TOLERANCE).scalar(),
+            "tokens": db.query(func.coalesce(func.sum(User.tokens), 0.0)).filter(User.id.in_(user_ids)).scalar(),
+            "min_balance": db.query(func.min(User.tokens)).filter(User.id.in_(user_ids)).scalar(),
+            "sold_kg": db.query(func.coalesce(func.sum(Transaction.amount_kg), 0.0)).filter(Transaction.category == CATEGORY).scalar(),
+        }
+    finally:
+        db.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--buyers", type=int, default=16, help="Concurrent buyer threads")
+    parser.add_argument("--sellers", type=int, default=40)
+    parser.add_argument("--lots", type=int, default=500)
+    parser.add_argument("--purchases", type=int, default=200)
+    parser.add_argument("--max-kg", type=float, default=25.0, help="Largest single purchase")
+    parser.add_argument("--tokens", type=float, default=200.0, help="Starting balance of every account")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--policy", choices=["fifo", "pro-rata"], default=None, help="Defaults to ORDER_BOOK_POLICY")
+    args = parser.parse_args(argv)
+
+    database_url = os.getenv("DATABASE_URL") or f"sqlite:///{tempfile.mkdtemp(prefix='jmart-stress-')}/stress.db"
+    SessionLocal, engine = setup(database_url)
+    from fastapi import HTTPException
+    from app.crud.group_crud import reconcile
+    from app.crud.waste_crud import buy_category
+    from app.order_book import order_book
+
+    buyer_ids, seller_ids = seed(SessionLocal, args.buyers, args.sellers, args.lots, args.tokens, args.seed)
+    if args.policy:
+        order_book.policy = args.policy
+    db = SessionLocal()
+    try:
+        reconcile(db)  # lots were seeded directly, so count them into material_groups
+        order_book.load_from_db(db)
+    finally:
+        db.close()
+    everyone = buyer_ids + seller_ids
+    before = snapshot(SessionLocal, everyone)
+    print(f"{engine.dialect.name} ({order_book.policy}): {args.lots} lots, {before['stock_kg']:.2f} kg, {args.buyers} buyers, {args.purchases} purchases")
+
+    rng = random.Random(args.seed)
+    orders = [(rng.choice(buyer_ids), round(rng.uniform(0.1, args.max_kg), 2)) for _ in range(args.purchases)]
+    outcomes = {"ok": 0, "rejected": 0, "error": 0}
+    latencies = []
+
+    def purchase(order):
+        buyer_id, quantity = order
+        db = SessionLocal()
+        t0 = time.perf_counter()
+        try:
+            buy_category(db, buyer_id, CATEGORY, quantity)
+            outcomes["ok"] += 1
+        except HTTPException:
+            outcomes["rejected"] += 1  # out of stock or out of tokens: expected under contention
+        except Exception as e:
+            outcomes["error"] += 1
+            print(f"[ERROR] purchase failed: {e}")
+        finally:
+            latencies.append((time.perf_counter() - t0) * 1000.0)
+            db.close()
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.buyers) as pool:
+        list(pool.map(purchase, orders))
+    elapsed = time.perf_counter() - start
+    after = snapshot(SessionLocal, everyone)
+    db = SessionLocal()
+    try:
+        drift = [d for d in reconcile(db) if d["category"] == CATEGORY]
+    finally:
+        db.close()
+
+    latencies.sort()
+    print(f"{outcomes} in {elapsed:.2f}s ({args.purchases / elapsed:.1f} purchases/s, "
+          f"p50 {latencies[len(latencies) // 2]:.1f}ms, p99 {latencies[int(len(latencies) * 0.99) - 1]:.1f}ms)")
+    checks = {
+        "no lot went negative": after["negative_lots"] == 0,
+        "no balance went negative": after["min_balance"] >= -TOLERANCE,
+        "tokens conserved": abs(after["tokens"] - before["tokens"]) < TOLERANCE * args.purchases,
+        "stock sold == transactions": abs((before["stock_kg"] - after["stock_kg"]) - after["sold_kg"]) < TOLERANCE * args.purchases,
+        "never sold more than stocked": after["sold_kg"] <= before["stock_kg"] + TOLERANCE,
+        "material_groups totals match waste_items": not drift,
+        "order book matches database": abs(order_book.available_kg(CATEGORY) - after["stock_kg"]) < TOLERANCE * args.purchases,
+    }
+    for name, passed in checks.items():
+        print(f"  {'ok  ' if passed else 'FAIL'} {name}")
+    if not all(checks.values()):
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
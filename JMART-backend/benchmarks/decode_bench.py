@@ -0,0 +1,170 @@
+"""Decode + resize cost per image: full-resolution decode vs. the reduced decode in app.image_decode.
+
+    python -m benchmarks.decode_bench [--images DIR] [--megapixels 12] [--repeat 20]
+
+Each method runs in fresh processes so peak RSS growth is attributable to it.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import resource
+import statistics
+import time
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+
+
+def synthetic_jpeg(megapixels: float, seed: int = 0) -> bytes:
+    """A smooth-gradient photo-sized JPEG (noise would compress unrealistically badly)."""
+    import numpy as np
+    from PIL import Image
+
+    width = int((megapixels * 1_000_000 * 4 / 3) ** 0.5)
+    height = int(width * 3 / 4)
+    rng = np.random.default_rng(seed)
+    x = np.linspace(0, 1, width, dtype=np.float32)
+    y = np.linspace(0, 1, height, dtype=np.float32)[:, None]
+    base = np.stack([x * y, (1 - x) * y, x * (1 - y)], axis=-1) * 255
+    noise = rng.normal(0, 8, size=((height + 7) // 8, (width + 7) // 8, 3)).repeat(8, 0).repeat(8, 1)
+    pixels = np.clip(base + noise[:height, :width], 0, 255).astype(np.uint8)
+    out = BytesIO()
+    Image.fromarray(pixels).save(out, format="JPEG", quality=90)
+    return out.getvalue()
+
+
+def legacy_decode(content: bytes):
+    """What waste.py did before: full decode, then torchvision Resize + ToTensor."""
+    from PIL import Image
+    from torchvision import transforms
+
+    preprocess = transforms.Compose([transforms.Resize((224, 224)), transforms.ToTensor()])
+    return preprocess(Image.open(BytesIO(content)).convert("RGB"))
+
+
+def fast_decode(content: bytes):
+    from app.image_decode import decode_image_tensor
+
+    return decode_image_tensor(content)
+
+
+def legacy_pixels(content: bytes):
+    from PIL import Image
+
+    return Image.open(BytesIO(content)).convert("RGB").resize((224, 224), Image.BILINEAR)
+
+
+def fast_pixels(content: bytes):
+    from PIL import Image
+    from app.image_decode import open_reduced
+
+    return open_reduced(content).resize((224, 224), Image.BILINEAR)
+
+
+METHODS = {"full": legacy_decode, "reduced": fast_decode}
+# Same decode paths without the tensor step, so peak RSS can be measured without torch loaded
+PIXEL_METHODS = {"full": legacy_pixels, "reduced": fast_pixels}
+
+
+def _proc_status_kb(field: str):
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith(field + ":"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+
+def _reset_peak_rss() -> bool:
+    # Writing 5 to clear_refs resets VmHWM (Linux); ru_maxrss can't be reset and is inherited across exec
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
+
+
+def _peak_memory(method: str, images) -> dict:
+    """Peak RSS growth of decoding every image once; torch isn't imported so its footprint can't mask this."""
+    import numpy  # noqa: F401
+    import app.image_decode  # noqa: F401
+
+    if _reset_peak_rss():
+        baseline_kb = _proc_status_kb("VmRSS")
+        for content in images:
+            PIXEL_METHODS[method](content)
+        peak_kb = _proc_status_kb("VmHWM")
+    else:
+        baseline_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        for content in images:
+            PIXEL_METHODS[method](content)
+        peak_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return {"peak_rss_growth_mb": (peak_kb - baseline_kb) / 1024.0}
+
+
+def _run(method: str, images, repeat: int) -> dict:
+    # Import everything up front so timings don't include module loading
+    import torch  # noqa: F401
+    from torchvision import transforms  # noqa: F401
+    import app.image_decode  # noqa: F401
+
+    fn = METHODS[method]
+    timings = []
+    for i in range(repeat):
+        content = images[i % len(images)]
+        start = time.perf_counter()
+        fn(content)
+        timings.append((time.perf_counter() - start) * 1000.0)
+    timings.sort()
+    return {
+        "method": method,
+        "images": len(images),
+        "decode_ms_p50": statistics.median(timings),
+        "decode_ms_p95": timings[int(0.95 * (len(timings) - 1))],
+        "decode_ms_mean": statistics.fmean(timings),
+    }
+
+
+def run(images, repeat: int):
+    context = multiprocessing.get_context("spawn")
+    results = []
+    for method in METHODS:
+        with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+            result = executor.submit(_run, method, images, repeat).result()
+        with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+            result.update(executor.submit(_peak_memory, method, images).result())
+        results.append(result)
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--images", help="Directory of JPEG/PNG files (synthetic photo if omitted)")
+    parser.add_argument("--megapixels", type=float, default=12.0)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args(argv)
+
+    if args.images:
+        from app.model_backends import list_images
+
+        images = []
+        for path in list_images(args.images):
+            with open(path, "rb") as f:
+                images.append(f.read())
+    else:
+        images = [synthetic_jpeg(args.megapixels)]
+    results = run(images, args.repeat)
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(f"{'method':<10}{'p50 ms':>9}{'p95 ms':>9}{'peak RSS growth MB':>20}")
+    for r in results:
+        print(f"{r['method']:<10}{r['decode_ms_p50']:>9.1f}{r['decode_ms_p95']:>9.1f}{r['peak_rss_growth_mb']:>20.1f}")
+
+
+if __name__ == "__main__":
+    main()
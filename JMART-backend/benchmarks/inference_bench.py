@@ -0,0 +1,265 @@
+"""Offline benchmark of the waste classifier: preprocessing, forward pass and end to end.
+
+    python -m benchmarks.inference_bench [--images DIR] [--random-weights] [--out results.json]
+    python -m benchmarks.inference_bench --compare old.json new.json
+
+Sweeps batch size and torch thread count for the forward pass, concurrency for the
+in-process batching engine and worker count for the process pool. Results are JSON
+with stable keys so runs from two releases can be diffed with --compare.
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List
+
+from benchmarks.decode_bench import synthetic_jpeg
+
+
+def summarize(samples_ms: List[float], images: int, wall_seconds: float) -> Dict[str, float]:
+    ordered = sorted(samples_ms)
+
+    def pct(p):
+        return ordered[min(len(ordered) - 1, int(round(p / 100.0 * (len(ordered) - 1))))]
+
+    return {
+        "p50_ms": statistics.median(ordered),
+        "p95_ms": pct(95),
+        "p99_ms": pct(99),
+        "mean_ms": statistics.fmean(ordered),
+        "images_per_sec": images / wall_seconds if wall_seconds else 0.0,
+        "samples": len(ordered),
+    }
+
+
+def timed(fn: Callable, iterations: int, images_per_call: int = 1) -> Dict[str, float]:
+    samples = []
+    start = time.perf_counter()
+    for _ in range(iterations):
+        t0 = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - t0) * 1000.0)
+    return summarize(samples, iterations * images_per_call, time.perf_counter() - start)
+
+
+def load_images(directory, count: int) -> List[bytes]:
+    if directory:
+        from app.model_backends import list_images
+
+        images = []
+        for path in list_images(directory, limit=count):
+            with open(path, "rb") as f:
+                images.append(f.read())
+        return images
+    # Phone-photo sized synthetic JPEGs of varying size
+    return [synthetic_jpeg(mp, seed=i) for i, mp in enumerate([12, 8, 3, 1][:max(1, min(count, 4))])]
+
+
+def bench_preprocess(images: List[bytes], iterations: int) -> Dict[str, float]:
+    from app.image_decode import decode_image_tensor
+
+    counter = iter(range(10 ** 9))
+    return timed(lambda: decode_image_tensor(images[next(counter) % len(images)]), iterations)
+
+
+def bench_forward(model_path: str, backend: str, batch_sizes: List[int], threads: List[int], iterations: int) -> List[dict]:
+    import torch
+    from app.model_registry import build_model
+
+    model = build_model(model_path, backend=backend)
+    results = []
+    for num_threads in threads:
+        torch.set_num_threads(num_threads)
+        for batch_size in batch_sizes:
+            batch = torch.rand(batch_size, 3, 224, 224)
+            with torch.no_grad():
+                model(batch)  # warm-up
+                stats = timed(lambda: model(batch), iterations, batch_size)
+            results.append({"threads": num_threads, "batch_size": batch_size, **stats})
+            print(f"  forward threads={num_threads:<3} batch={batch_size:<3} p50={stats['p50_ms']:.1f}ms {stats['images_per_sec']:.1f} img/s")
+    return results
+
+
+def _run_clients(predict: Callable[[bytes], object], images: List[bytes], concurrency: int, requests: int) -> Dict[str, float]:
+    samples = []
+
+    def one(i):
+        t0 = time.perf_counter()
+        predict(images[i % len(images)])
+        samples.append((time.perf_counter() - t0) * 1000.0)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as clients:
+        list(clients.map(one, range(requests)))
+    return summarize(samples, requests, time.perf_counter() - start)
+
+
+def bench_engine(model_path: str, backend: str, images: List[bytes], concurrency: List[int], max_batches: List[int], threads: int, requests: int) -> List[dict]:
+    """End to end in thread mode: decode in client threads, forward pass on the batching engine."""
+    from app.image_decode import decode_image_tensor
+    from app.inference import BatchingInferenceEngine
+    from app.model_registry import CLASS_NAMES, build_model
+
+    model = build_model(model_path, backend=backend)
+    results = []
+    for max_batch in max_batches:
+        engine = BatchingInferenceEngine(model, CLASS_NAMES, max_batch_size=max_batch, num_threads=threads)
+        try:
+            engine.predict(decode_image_tensor(images[0]))  # warm-up
+            for clients in concurrency:
+                before = engine.stats()
+                stats = _run_clients(lambda c: engine.predict(decode_image_tensor(c)), images, clients, requests)
+                after = engine.stats()
+                batches = after["batches"] - before["batches"]
+                results.append({
+                    "max_batch_size": max_batch,
+                    "concurrency": clients,
+                    "avg_batch_size": (after["items"] - before["items"]) / batches if batches else 0.0,
+                    **stats,
+                })
+                print(f"  engine max_batch={max_batch:<3} clients={clients:<3} p50={stats['p50_ms']:.1f}ms {stats['images_per_sec']:.1f} img/s")
+        finally:
+            engine.shutdown()
+    return results
+
+
+def bench_workers(model_path: str, backend: str, images: List[bytes], workers: List[int], requests: int) -> List[dict]:
+    """End to end in process mode: decode and forward pass both run in the worker processes."""
+    from app.inference_workers import ProcessInferencePool
+    from app.model_registry import CLASS_NAMES
+
+    results = []
+    for count in workers:
+        pool = ProcessInferencePool(model_path, CLASS_NAMES, workers=count, max_pending=count * 4, queue_timeout=60, backend=backend)
+        try:
+            list(ThreadPoolExecutor(count).map(pool.predict, [images[0]] * count))  # start + warm every worker
+            stats = _run_clients(pool.predict, images, count * 2, requests)
+            results.append({"workers": count, "concurrency": count * 2, **stats})
+            print(f"  workers={count:<3} p50={stats['p50_ms']:.1f}ms {stats['images_per_sec']:.1f} img/s")
+        finally:
+            pool.shutdown()
+    return results
+
+
+def powers_of_two_up_to(limit: int) -> List[int]:
+    values, n = [], 1
+    while n <= limit:
+        values.append(n)
+        n *= 2
+    return values
+
+
+def environment(backend: str) -> dict:
+    import torch
+
+    return {
+        "python": platform.python_version(),
+        "torch": torch.__version__,
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "backend": backend,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+    }
+
+
+def random_weights_file() -> str:
+    import torch
+    from torchvision import models
+    from app.model_registry import CLASS_NAMES
+
+    model = models.resnet18(weights=None)
+    model.fc = torch.nn.Linear(model.fc.in_features, len(CLASS_NAMES))
+    path = os.path.join(tempfile.mkdtemp(prefix="jmart-bench-"), "waste_classifier.pth")
+    torch.save(model.state_dict(), path)
+    return path
+
+
+def _flatten(prefix: str, value, out: dict):
+    if isinstance(value, dict):
+        for key, item in value.items():
+            _flatten(f"{prefix}.{key}" if prefix else key, item, out)
+    elif isinstance(value, list):
+        for item in value:
+            # Rows are identified by their sweep parameters, not their position
+            label = ",".join(f"{k}={item[k]}" for k in ("threads", "batch_size", "max_batch_size", "concurrency", "workers") if k in item)
+            _flatten(f"{prefix}[{label}]", {k: v for k, v in item.items() if not isinstance(v, (dict, list))}, out)
+    elif isinstance(value, (int, float)) and not isinstance(value, bool):
+        out[prefix] = value
+
+
+def compare(old_path: str, new_path: str) -> None:
+    with open(old_path) as f:
+        old = {}
+        _flatten("", json.load(f)["results"], old)
+    with open(new_path) as f:
+        new = {}
+        _flatten("", json.load(f)["results"], new)
+    for key in sorted(set(old) & set(new)):
+        if not key.endswith(("p50_ms", "p95_ms", "p99_ms", "images_per_sec")):
+            continue
+        before, after = old[key], new[key]
+        change = (after - before) / before * 100.0 if before else 0.0
+        print(f"{key:<80}{before:>12.2f}{after:>12.2f}{change:>+9.1f}%")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--images", help="Directory of sample images (synthetic photos if omitted)")
+    parser.add_argument("--model-path", default=None, help="Defaults to MODEL_PATH")
+    parser.add_argument("--random-weights", action="store_true", help="Benchmark an untrained ResNet18 (no weights file needed)")
+    parser.add_argument("--backend", default=None, help="Defaults to MODEL_BACKEND")
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 4, 8, 16, 32])
+    parser.add_argument("--threads", type=int, nargs="+", default=None, help="torch thread counts (default: powers of two up to cpu count)")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--workers", type=int, nargs="+", default=None, help="process pool sizes (default: powers of two up to cpu count)")
+    parser.add_argument("--iterations", type=int, default=20)
+    parser.add_argument("--requests", type=int, default=64, help="Requests per end-to-end configuration")
+    parser.add_argument("--skip", nargs="+", default=[], choices=["preprocess", "forward", "engine", "workers"])
+    parser.add_argument("--out", help="Write JSON results here (printed to stdout otherwise)")
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"), help="Diff two result files and exit")
+    args = parser.parse_args(argv)
+
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    from app.model_backends import MODEL_BACKEND
+    from app.model_registry import MODEL_PATH
+
+    backend = args.backend or MODEL_BACKEND
+    model_path = random_weights_file() if args.random_weights else (args.model_path or MODEL_PATH)
+    cpus = os.cpu_count() or 1
+    threads = args.threads or powers_of_two_up_to(cpus)
+    workers = args.workers or powers_of_two_up_to(cpus)
+    images = load_images(args.images, 16)
+
+    results = {}
+    if "preprocess" not in args.skip:
+        print("preprocess")
+        results["preprocess"] = bench_preprocess(images, args.iterations * 2)
+        print(f"  decode+resize p50={results['preprocess']['p50_ms']:.1f}ms {results['preprocess']['images_per_sec']:.1f} img/s")
+    if "forward" not in args.skip:
+        print("forward")
+        results["forward"] = bench_forward(model_path, backend, args.batch_sizes, threads, args.iterations)
+    if "engine" not in args.skip:
+        print("end to end (batching engine)")
+        results["engine"] = bench_engine(model_path, backend, images, args.concurrency, [1, 16], max(threads), args.requests)
+    if "workers" not in args.skip:
+        print("end to end (process pool)")
+        results["workers"] = bench_workers(model_path, backend, images, workers, args.requests)
+
+    report = {"environment": environment(backend), "results": results}
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Wrote {args.out}")
+    else:
+        print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
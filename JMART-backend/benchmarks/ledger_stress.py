@@ -0,0 +1,206 @@
+"""Concurrent token ledger stress test: buys, sells and purchases racing on the same accounts.
+
+    python -m benchmarks.ledger_stress [--users 20] [--workers 16] [--operations 2000]
+
+Uses DATABASE_URL when set (point it at a scratch Postgres database to exercise
+real concurrency), otherwise a temporary SQLite file. Every operation runs
+through the production code paths (token_crud.adjust for buy/sell tokens,
+waste_crud.buy_category for purchases) while a background thread keeps taking
+balance snapshots. Afterwards it checks that nothing was lost: every balance
+equals the sum of its ledger, the total matches what the clients did, and
+balances at past instants read through snapshots match a full ledger replay,
+and that the dashboard rollups kept up incrementally equal a full backfill.
+"""
+import argparse
+import os
+import random
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+CATEGORY = "LedgerStress"
+TOLERANCE = 1e-6
+
+
+def setup(database_url: str):
+    os.environ["DATABASE_URL"] = database_url
+    from app.database import Base, SessionLocal, engine
+    from app.models import group, rollup, token_ledger, transaction, user, waste_item  # noqa: F401  register tables
+
+    Base.metadata.create_all(bind=engine)
+    return SessionLocal, engine
+
+
+def seed(SessionLocal, users: int, lots: int, tokens: float, seed_value: int):
+    from app.crud import rollup_crud, token_crud
+    from app.models.user import User
+    from app.models.waste_item import WasteItem
+
+    rng = random.Random(seed_value)
+    db = SessionLocal()
+    try:
+        run = f"{int(time.time() * 1000)}"
+        people = [User(username=f"ledger-{run}-{i}", email=f"ledger-{run}-{i}@example.com", password="x", tokens=0.0)
+                  for i in range(users)]
+        db.add_all(people)
+        db.flush()
+        user_ids = [u.id for u in people]
+        for user_id in user_ids:
+            token_crud.adjust(db, user_id, tokens, "buy_tokens")
+        now = datetime.utcnow()
+        items = []
+        for _ in range(lots):
+            kg = round(rng.uniform(0.5, 5.0), 2)
+            items.append(WasteItem(user_id=rng.choice(user_ids), username="stress", description="stress lot", image_url="x.jpg",
+                                   category=CATEGORY, verified=True, amount_kg=kg, listed_kg=kg, sold=False, created_at=now))
+        db.add_all(items)
+        rollup_crud.record_uploads(db, [(item.user_id, item.category, item.amount_kg) for item in items], now)
+        db.commit()
+        return user_ids
+    finally:
+        db.close()
+
+
+def rollup_rows(db):
+    from app.models.rollup import CategoryRollup, UserRollup
+
+    def key(row, names):
+        return tuple(round(v, 6) if isinstance(v, float) else v for v in (getattr(row, n) for n in names))
+
+    category = ("period", "category", "bucket_start", "items_uploaded", "kg_uploaded", "kg_sold", "tokens_traded", "active_sellers")
+    user = ("period", "user_id", "category", "bucket_start", "items_uploaded", "kg_uploaded", "kg_sold",
+            "tokens_earned", "kg_bought", "tokens_spent", "active")
+    return (sorted(key(r, category) for r in db.query(CategoryRollup)), sorted(key(r, user) for r in db.query(UserRollup)))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--workers", type=int, default=16, help="Concurrent client threads")
+    parser.add_argument("--operations", type=int, default=2000)
+    parser.add_argument("--lots", type=int, default=300)
+    parser.add_argument("--tokens", type=float, default=50.0, help="Starting balance of every account")
+    parser.add_argument("--snapshot-every", type=float, default=0.05, help="Seconds between snapshot runs")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    database_url = os.getenv("DATABASE_URL") or f"sqlite:///{tempfile.mkdtemp(prefix='jmart-ledger-')}/ledger.db"
+    SessionLocal, engine = setup(database_url)
+    from fastapi import HTTPException
+    from sqlalchemy import func
+    from app.crud import rollup_crud, token_crud
+    from app.crud.group_crud import reconcile
+    from app.crud.waste_crud import buy_category
+    from app.models.token_ledger import BalanceSnapshot, TokenLedgerEntry
+    from app.models.user import User
+    from app.order_book import order_book
+
+    user_ids = seed(SessionLocal, args.users, args.lots, args.tokens, args.seed)
+    db = SessionLocal()
+    try:
+        reconcile(db)
+        order_book.load_from_db(db)
+        start_total = db.query(func.sum(User.tokens)).filter(User.id.in_(user_ids)).scalar()
+    finally:
+        db.close()
+    print(f"{engine.dialect.name}: {args.users} users x {args.tokens} tokens, {args.workers} workers, {args.operations} operations")
+
+    rng = random.Random(args.seed)
+    operations = [(rng.choice(["buy", "sell", "purchase"]), rng.choice(user_ids), round(rng.uniform(0.1, 10.0), 2))
+                  for _ in range(args.operations)]
+    outcomes = {"ok": 0, "rejected": 0, "error": 0}
+    applied = {"bought": 0.0, "sold": 0.0}
+    tally = threading.Lock()
+    checkpoints = []
+
+    def run(op):
+        kind, user_id, amount = op
+        db = SessionLocal()
+        try:
+            if kind == "purchase":
+                buy_category(db, user_id, CATEGORY, amount)
+                ok = True
+            else:
+                ok = token_crud.adjust(db, user_id, amount if kind == "buy" else -amount, f"{kind}_tokens") is not None
+                db.commit() if ok else db.rollback()
+            with tally:
+                outcomes["ok" if ok else "rejected"] += 1
+                if ok and kind != "purchase":
+                    applied["bought" if kind == "buy" else "sold"] += amount
+        except HTTPException:
+            with tally:
+                outcomes["rejected"] += 1  # out of stock or tokens: expected under contention
+        except Exception as e:
+            db.rollback()
+            with tally:
+                outcomes["error"] += 1
+            print(f"[ERROR] {kind} failed: {e}")
+        finally:
+            db.close()
+
+    stop = threading.Event()
+    snapshot_errors = []
+
+    def snapshotter():
+        while not stop.is_set():
+            checkpoints.append(datetime.utcnow())
+            db = SessionLocal()
+            try:
+                token_crud.take_snapshots(db, grace_seconds=0.2)
+            except Exception as e:
+                db.rollback()
+                snapshot_errors.append(str(e))
+            finally:
+                db.close()
+            stop.wait(args.snapshot_every)
+
+    snapshots = threading.Thread(target=snapshotter)
+    snapshots.start()
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.workers) as pool:
+        list(pool.map(run, operations))
+    elapsed = time.perf_counter() - started
+    time.sleep(0.3)  # let the last entries age past the snapshot grace period
+    stop.set()
+    snapshots.join()
+
+    db = SessionLocal()
+    try:
+        mismatches = [m for m in token_crud.check_ledger(db) if m["user_id"] in user_ids]
+        end_total = db.query(func.sum(User.tokens)).filter(User.id.in_(user_ids)).scalar()
+        min_balance = db.query(func.min(User.tokens)).filter(User.id.in_(user_ids)).scalar()
+        snapshot_count = db.query(func.count(BalanceSnapshot.id)).filter(BalanceSnapshot.user_id.in_(user_ids)).scalar()
+        history_errors = 0
+        for at in rng.sample(checkpoints, min(20, len(checkpoints))) + [datetime.utcnow()]:
+            replayed = dict(db.query(TokenLedgerEntry.user_id, func.sum(TokenLedgerEntry.delta)).filter(
+                TokenLedgerEntry.user_id.in_(user_ids), TokenLedgerEntry.created_at <= at
+            ).group_by(TokenLedgerEntry.user_id).all())
+            for user_id in user_ids:
+                if abs(token_crud.balance_at(db, user_id, at) - (replayed.get(user_id) or 0.0)) > TOLERANCE:
+                    history_errors += 1
+        incremental = rollup_rows(db)
+        rollup_crud.backfill(db)
+        rollups_match = rollup_rows(db) == incremental
+    finally:
+        db.close()
+
+    print(f"{outcomes} in {elapsed:.2f}s ({args.operations / elapsed:.1f} ops/s), {snapshot_count} snapshots")
+    expected_total = start_total + applied["bought"] - applied["sold"]
+    checks = {
+        "no unexpected errors": outcomes["error"] == 0 and not snapshot_errors,
+        "every balance equals its ledger sum": not mismatches,
+        "no update lost (total matches the clients)": abs(end_total - expected_total) < TOLERANCE * args.operations,
+        "no balance went negative": min_balance >= -TOLERANCE,
+        "snapshot reads match a full replay": history_errors == 0,
+        "incremental rollups match a backfill": rollups_match,
+    }
+    for name, passed in checks.items():
+        print(f"  {'ok  ' if passed else 'FAIL'} {name}")
+    if not all(checks.values()):
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
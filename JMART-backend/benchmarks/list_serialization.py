@@ -0,0 +1,134 @@
+"""Cost of building a large list response: ORM objects + pydantic/json vs. projected rows + orjson.
+
+    python -m benchmarks.list_serialization [--rows 10000] [--repeat 10]
+
+Seeds a temporary SQLite database with ``--rows`` waste items and transactions,
+then times query + serialization of a single page holding all of them, the way
+the list routes did it before (full ORM rows, WasteItemOut validation / a dict
+loop through FastAPI's encoder) and now (column-projected tuples into orjson).
+"""
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+
+def setup(rows: int):
+    os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp(prefix='jmart-listbench-')}/bench.db"
+    from app.database import Base, SessionLocal, engine
+    from app.models import group, transaction, user, waste_item  # noqa: F401  register tables
+    from app.models.transaction import Transaction
+    from app.models.waste_item import WasteItem
+
+    Base.metadata.create_all(bind=engine)
+    rng = random.Random(0)
+    start = datetime(2025, 1, 1)
+    db = SessionLocal()
+    try:
+        db.add_all([
+            WasteItem(user_id=1, username="seller", description=f"lot {i} of mixed scrap", image_url=f"https://cdn.example.com/{i}.jpg",
+                      category=rng.choice(["Plastic", "Metal", "Paper", "Glass"]), verified=True, predicted_category="plastic",
+                      ai_confidence=rng.random(), amount_kg=round(rng.uniform(0.5, 50), 2), sold=i % 3 == 0,
+                      sold_at=start + timedelta(minutes=i) if i % 3 == 0 else None)
+            for i in range(rows)
+        ])
+        db.add_all([
+            Transaction(buyer_id=1, seller_id=2, category="Plastic", amount_kg=round(rng.uniform(0.1, 10), 2),
+                        tokens=round(rng.uniform(0.1, 10), 2), timestamp=start + timedelta(seconds=i))
+            for i in range(rows)
+        ])
+        db.commit()
+    finally:
+        db.close()
+    return SessionLocal
+
+
+def waste_items_before(db, limit):
+    from typing import List
+
+    from pydantic import TypeAdapter
+
+    from app.models.waste_item import WasteItem
+    from app.schemas import WasteItemOut
+
+    adapter = TypeAdapter(List[WasteItemOut])
+    items = db.query(WasteItem).order_by(WasteItem.id).limit(limit).all()
+    return adapter.dump_json(adapter.validate_python(items, from_attributes=True))
+
+
+def waste_items_after(db, limit, fields=None):
+    from app.api.waste import WASTE_ITEM_FIELDS
+    from app.models.waste_item import WasteItem
+    from app.projection import as_dicts, dumps, project
+
+    projection = project(fields, {k: v for k, v in WASTE_ITEM_FIELDS.items() if v is not None}, extra=[WasteItem.id])
+    rows = db.query(*projection.columns).order_by(WasteItem.id).limit(limit).all()
+    return dumps(as_dicts(projection, rows))
+
+
+def transactions_before(db, limit):
+    from fastapi.encoders import jsonable_encoder
+    from fastapi.responses import JSONResponse
+
+    from app.models.transaction import Transaction
+
+    txs = db.query(Transaction).order_by(Transaction.timestamp.desc(), Transaction.id.desc()).limit(limit).all()
+    payload = [
+        {"id": tx.id, "buyer_id": tx.buyer_id, "seller_id": tx.seller_id, "category": tx.category,
+         "amount_kg": tx.amount_kg, "tokens": tx.tokens, "timestamp": tx.timestamp.isoformat()}
+        for tx in txs
+    ]
+    return JSONResponse(jsonable_encoder(payload)).body
+
+
+def transactions_after(db, limit):
+    from fastapi.responses import ORJSONResponse
+
+    from app.api.user import TRANSACTION_FIELDS
+    from app.models.transaction import Transaction
+    from app.projection import as_dicts, project
+
+    projection = project(None, TRANSACTION_FIELDS)
+    rows = db.query(*projection.columns).order_by(Transaction.timestamp.desc(), Transaction.id.desc()).limit(limit).all()
+    return ORJSONResponse(as_dicts(projection, rows)).body
+
+
+def timed(SessionLocal, fn, repeat, *args):
+    samples = []
+    for _ in range(repeat):
+        db = SessionLocal()
+        try:
+            t0 = time.perf_counter()
+            body = fn(db, *args)
+            samples.append((time.perf_counter() - t0) * 1000.0)
+        finally:
+            db.close()
+    return statistics.median(samples), len(body)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args(argv)
+
+    SessionLocal = setup(args.rows)
+    cases = [
+        ("waste items, ORM + WasteItemOut", waste_items_before, ()),
+        ("waste items, projected + orjson", waste_items_after, ()),
+        ("waste items, fields=id,category,amount_kg", waste_items_after, ("id,category,amount_kg",)),
+        ("transactions, ORM + dict loop + json", transactions_before, ()),
+        ("transactions, projected + orjson", transactions_after, ()),
+    ]
+    print(f"{args.rows} rows per response, median of {args.repeat}")
+    print(f"{'':<44}{'ms':>9}{'KB':>9}")
+    for name, fn, extra in cases:
+        ms, size = timed(SessionLocal, fn, args.repeat, args.rows, *extra)
+        print(f"{name:<44}{ms:>9.1f}{size / 1024:>9.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,35 @@
+import os
+import tempfile
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+# The app reads its settings at import: point it at a throwaway SQLite database and keep
+# background work (model preload, snapshots, archiving) out of the tests
+_tmp = tempfile.mkdtemp(prefix="jmart-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_tmp, 'test.db')}"
+os.environ["MODEL_PRELOAD"] = "lazy"
+os.environ["BALANCE_SNAPSHOT_INTERVAL"] = "0"
+os.environ["ARCHIVE_INTERVAL"] = "0"
+
+# A scratch Postgres database for the concurrency tests to also run against row locking; they add rows to it
+POSTGRES_TEST_URL = os.getenv("POSTGRES_TEST_URL")
+
+
+@pytest.fixture(params=["sqlite", "postgresql"])
+def scratch_sessions(request, tmp_path):
+    """A session factory on a fresh SQLite file, then on POSTGRES_TEST_URL when it is set."""
+    from app import models  # noqa: F401  register tables
+    from app.database import Base
+
+    if request.param == "sqlite":
+        url = f"sqlite:///{tmp_path / 'scratch.db'}"
+    elif POSTGRES_TEST_URL:
+        url = POSTGRES_TEST_URL
+    else:
+        pytest.skip("POSTGRES_TEST_URL not set")
+    engine = create_engine(url, pool_size=16, max_overflow=0)
+    Base.metadata.create_all(bind=engine)
+    yield sessionmaker(bind=engine, autocommit=False, autoflush=False)
+    engine.dispose()
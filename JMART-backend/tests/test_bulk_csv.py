@@ -0,0 +1,117 @@
+"""POST /api/upload/bulk-csv through a real uvicorn server.
+
+TestClient hands the body over in one piece; uvicorn streams it in
+http.request messages while the response is running, which is what broke it.
+"""
+import socket
+import threading
+import time
+
+import httpx
+import orjson
+import pytest
+import uvicorn
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+@pytest.fixture(scope="module")
+def server_url():
+    from app.database import SessionLocal
+    from app.main import app
+    from app.models.user import User
+
+    db = SessionLocal()
+    try:
+        if db.query(User).filter(User.username == "csv-seller").first() is None:
+            db.add(User(username="csv-seller", email="csv-seller@example.com", password="x"))
+            db.commit()
+    finally:
+        db.close()
+    port = _free_port()
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    deadline = time.monotonic() + 30
+    while not server.started:
+        if time.monotonic() > deadline or not thread.is_alive():
+            pytest.fail("uvicorn did not start")
+        time.sleep(0.05)
+    yield f"http://127.0.0.1:{port}"
+    server.should_exit = True
+    thread.join(timeout=10)
+
+
+def _seller_id():
+    from app.database import SessionLocal
+    from app.models.user import User
+
+    db = SessionLocal()
+    try:
+        return db.query(User.id).filter(User.username == "csv-seller").scalar()
+    finally:
+        db.close()
+
+
+def _chunked_csv(rows: int):
+    # .gif rows fail validation before any download, so only the CSV path is exercised
+    yield b"image_url,category,amount_kg\n"
+    for start in range(0, rows, 250):
+        yield b"".join(b"lot%d.gif,Plastic,1\n" % i for i in range(start, min(start + 250, rows)))
+
+
+@pytest.mark.parametrize("rows", [2000, 20000])
+def test_every_row_of_a_chunked_csv_gets_a_result(server_url, rows):
+    response = httpx.post(
+        f"{server_url}/api/upload/bulk-csv", params={"user_id": _seller_id()}, content=_chunked_csv(rows), timeout=60,
+    )
+    assert response.status_code == 200
+    lines = [orjson.loads(line) for line in response.text.splitlines()]
+    assert lines[-1]["summary"] == {"rows": rows, "inserted": 0, "verified": 0, "errors": rows}
+    assert [line["row"] for line in lines[:-1]] == list(range(1, rows + 1))
+
+
+def test_csv_without_required_columns_is_rejected(server_url):
+    response = httpx.post(f"{server_url}/api/upload/bulk-csv", params={"user_id": _seller_id()}, content=b"foo,bar\n1,2\n", timeout=30)
+    assert response.status_code == 400
+    assert "image_url" in response.json()["detail"]
+
+
+def test_rows_before_a_broken_record_still_get_results(server_url):
+    body = b"image_url,category,amount_kg\nlot1.gif,Plastic,1\nlot2.gif,Plastic,1\n\"lot3.gif,Plastic,1\n"
+    response = httpx.post(f"{server_url}/api/upload/bulk-csv", params={"user_id": _seller_id()}, content=body, timeout=30)
+    assert response.status_code == 200
+    lines = [orjson.loads(line) for line in response.text.splitlines()]
+    assert [line.get("row") for line in lines[:-1]] == [1, 2, 3]
+    assert lines[2]["error"] == "CSV ends inside a quoted field"
+    assert lines[-1]["summary"]["errors"] == 3
+
+
+def test_errors_while_listing_a_chunk_are_not_reported_as_csv_errors(monkeypatch):
+    import asyncio
+
+    from app import ingest
+
+    calls = []
+
+    async def broken_chunk(*args):
+        calls.append(args)
+        if len(calls) == 1:
+            raise ValueError("not a CSV problem")
+        return []
+
+    async def rows():
+        for _ in range(2):
+            yield {"image_url": "lot.jpg", "category": "Plastic"}
+
+    async def run():
+        return [result async for result in ingest.ingest(rows(), 1, "csv-seller")]
+
+    monkeypatch.setattr(ingest, "_ingest_chunk", broken_chunk)
+    monkeypatch.setattr(ingest, "INGEST_CHUNK_SIZE", 1)  # flush while the rows are still being read
+    with pytest.raises(ValueError, match="not a CSV problem"):
+        asyncio.run(run())
@@ -0,0 +1,53 @@
+import random
+from concurrent.futures import ThreadPoolExecutor
+
+from fastapi import HTTPException
+
+from app.crud.group_crud import reconcile
+from app.crud.waste_crud import buy_category
+from app.order_book import order_book
+from benchmarks.buy_stress import CATEGORY, TOLERANCE, seed, snapshot
+
+BUYERS = 8
+PURCHASES = 60
+
+
+def test_concurrent_purchases_never_oversell(scratch_sessions):
+    SessionLocal = scratch_sessions
+    # Fewer kg listed than is ordered, so buyers race for the last lots
+    buyer_ids, seller_ids = seed(SessionLocal, buyers=BUYERS, sellers=10, lots=80, tokens=500.0, seed_value=0)
+    with SessionLocal() as db:
+        reconcile(db)  # the lots were seeded directly
+        order_book.load_from_db(db)
+    everyone = buyer_ids + seller_ids
+    before = snapshot(SessionLocal, everyone)
+
+    rng = random.Random(0)
+    orders = [(rng.choice(buyer_ids), round(rng.uniform(0.5, 8.0), 2)) for _ in range(PURCHASES)]
+    errors = []
+
+    def purchase(order):
+        buyer_id, quantity = order
+        with SessionLocal() as db:
+            try:
+                buy_category(db, buyer_id, CATEGORY, quantity)
+            except HTTPException:
+                pass  # out of stock or out of tokens
+            except Exception as e:
+                errors.append(e)
+
+    with ThreadPoolExecutor(max_workers=BUYERS) as pool:
+        list(pool.map(purchase, orders))
+    after = snapshot(SessionLocal, everyone)
+
+    sold_kg = after["sold_kg"] - before["sold_kg"]  # a reused Postgres database has earlier runs' sales
+    assert not errors
+    assert sold_kg > 0
+    assert sold_kg <= before["stock_kg"] + TOLERANCE
+    assert after["negative_lots"] == 0
+    assert after["min_balance"] >= -TOLERANCE
+    assert abs((before["stock_kg"] - after["stock_kg"]) - sold_kg) < TOLERANCE * PURCHASES
+    assert abs(after["tokens"] - before["tokens"]) < TOLERANCE * PURCHASES
+    with SessionLocal() as db:
+        drift = [row for row in reconcile(db) if row["category"] == CATEGORY]
+    assert not drift, f"material_groups drifted from waste_items: {drift}"
@@ -0,0 +1,126 @@
+import asyncio
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from app import image_fetch
+from app.image_fetch import ImageFetchError, fetch_image_bytes, fetch_image_bytes_async
+
+PNG = b"\x89PNG\r\n\x1a\n" + b"\x00" * 64
+MAX_BYTES = 1024
+READ_TIMEOUT = 0.5
+
+
+class ImageHandler(BaseHTTPRequestHandler):
+    # path -> (status, content type, body, send Content-Length)
+    routes = {
+        "/image.png": (200, "image/png", PNG, True),
+        "/untyped": (200, "application/octet-stream", PNG, True),
+        "/not-really.jpg": (200, "image/jpeg", b"<html>hello</html>", True),
+        "/page": (200, "text/html; charset=utf-8", b"<html>hello</html>", True),
+        "/declared-large.png": (200, "image/png", PNG + b"\x00" * MAX_BYTES, True),
+        "/streamed-large.png": (200, "image/png", PNG + b"\x00" * MAX_BYTES, False),
+    }
+
+    def do_GET(self):
+        if self.path == "/redirect":
+            self.send_response(302)
+            self.send_header("Location", "/image.png")
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        if self.path == "/slow.png":
+            time.sleep(READ_TIMEOUT * 4)
+        status, content_type, body, with_length = self.routes.get(self.path, (404, "text/plain", b"not found", True))
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        if with_length:
+            self.send_header("Content-Length", str(len(body)))
+        else:
+            self.send_header("Connection", "close")  # the body ends when the connection does
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture(scope="module")
+def server_url():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), ImageHandler)
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture(params=["sync", "async"])
+def fetch(request, monkeypatch):
+    monkeypatch.setattr(image_fetch, "IMAGE_FETCH_MAX_BYTES", MAX_BYTES)
+    monkeypatch.setattr(image_fetch, "IMAGE_FETCH_READ_TIMEOUT", READ_TIMEOUT)
+    # The shared clients read their timeouts when created
+    asyncio.run(image_fetch.close_clients())
+    if request.param == "sync":
+        yield fetch_image_bytes
+    else:
+        async def fetch_and_close(url):
+            try:
+                return await fetch_image_bytes_async(url)
+            finally:
+                await image_fetch.close_clients()
+
+        yield lambda url: asyncio.run(fetch_and_close(url))
+    asyncio.run(image_fetch.close_clients())
+
+
+def fetch_error(fetch, url) -> ImageFetchError:
+    with pytest.raises(ImageFetchError) as raised:
+        fetch(url)
+    return raised.value
+
+
+def test_downloads_an_image(fetch, server_url):
+    assert fetch(f"{server_url}/image.png") == PNG
+
+
+def test_follows_redirects(fetch, server_url):
+    assert fetch(f"{server_url}/redirect") == PNG
+
+
+def test_sniffs_untyped_bodies(fetch, server_url):
+    assert fetch(f"{server_url}/untyped") == PNG
+
+
+def test_rejects_a_body_that_is_not_an_image(fetch, server_url):
+    error = fetch_error(fetch, f"{server_url}/not-really.jpg")
+    assert error.status_code == 400
+    assert "Unsupported image format" in error.detail
+
+
+def test_rejects_a_non_image_content_type(fetch, server_url):
+    error = fetch_error(fetch, f"{server_url}/page")
+    assert error.status_code == 400
+    assert "text/html" in error.detail
+
+
+@pytest.mark.parametrize("path", ["/declared-large.png", "/streamed-large.png"])
+def test_caps_the_download_size(fetch, server_url, path):
+    error = fetch_error(fetch, f"{server_url}{path}")
+    assert error.status_code == 413
+
+
+def test_reports_a_missing_image(fetch, server_url):
+    error = fetch_error(fetch, f"{server_url}/missing.png")
+    assert error.status_code == 400
+    assert "(404)" in error.detail
+
+
+def test_times_out_on_a_slow_server(fetch, server_url):
+    started = time.perf_counter()
+    error = fetch_error(fetch, f"{server_url}/slow.png")
+    assert error.status_code == 504
+    assert time.perf_counter() - started < READ_TIMEOUT * 3
@@ -0,0 +1,68 @@
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from sqlalchemy import func
+
+from app.crud import token_crud
+from app.models.user import User
+
+USERS = 10
+WORKERS = 8
+OPERATIONS = 300
+TOKENS = 20.0
+TOLERANCE = 1e-6
+
+
+def test_balances_equal_their_ledger_after_concurrent_postings(scratch_sessions):
+    SessionLocal = scratch_sessions
+    with SessionLocal() as db:
+        run = random.getrandbits(32)  # a reused Postgres database keeps earlier runs' users
+        people = [User(username=f"ledger-{run}-{i}", email=f"ledger-{run}-{i}@example.com", password="x", tokens=0.0)
+                  for i in range(USERS)]
+        db.add_all(people)
+        db.flush()
+        user_ids = [u.id for u in people]
+        for user_id in user_ids:
+            token_crud.adjust(db, user_id, TOKENS, "buy_tokens")
+        db.commit()
+
+    rng = random.Random(0)
+    # Small balances, so sells and transfers regularly hit the overdraw guard
+    operations = [(rng.choice(["buy", "sell", "transfer"]), *rng.sample(user_ids, 2), round(rng.uniform(0.1, 8.0), 2))
+                  for _ in range(OPERATIONS)]
+    applied = {"bought": 0.0, "sold": 0.0}
+    tally = threading.Lock()
+    errors = []
+
+    def run_one(op):
+        kind, user_id, payee_id, amount = op
+        with SessionLocal() as db:
+            try:
+                if kind == "transfer":
+                    entries = [token_crud.Entry(user_id, -amount, "transfer"), token_crud.Entry(payee_id, amount, "transfer")]
+                    ok = token_crud.post_entries(db, entries, guard=user_id)
+                else:
+                    ok = token_crud.adjust(db, user_id, amount if kind == "buy" else -amount, f"{kind}_tokens") is not None
+                if not ok:
+                    db.rollback()
+                    return
+                db.commit()
+                if kind != "transfer":
+                    with tally:
+                        applied["bought" if kind == "buy" else "sold"] += amount
+            except Exception as e:
+                db.rollback()
+                errors.append(e)
+
+    with ThreadPoolExecutor(max_workers=WORKERS) as pool:
+        list(pool.map(run_one, operations))
+
+    with SessionLocal() as db:
+        drift = [row for row in token_crud.check_ledger(db) if row["user_id"] in user_ids]
+        total = db.query(func.sum(User.tokens)).filter(User.id.in_(user_ids)).scalar()
+        lowest = db.query(func.min(User.tokens)).filter(User.id.in_(user_ids)).scalar()
+    assert not errors
+    assert not drift, f"balances differ from their ledger: {drift}"
+    assert abs(total - (USERS * TOKENS + applied["bought"] - applied["sold"])) < TOLERANCE * OPERATIONS
+    assert lowest >= -TOLERANCE
@@ -0,0 +1,40 @@
+"""/listings profit is what each sold item's own sales paid, not its category's total."""
+from fastapi.testclient import TestClient
+
+
+def test_each_sold_item_shows_its_own_revenue():
+    from app.crud import group_crud, waste_crud
+    from app.database import SessionLocal
+    from app.main import app
+    from app.models.user import User
+    from app.models.waste_item import WasteItem
+    from app.order_book import order_book
+
+    db = SessionLocal()
+    try:
+        seller = User(username="profit-seller", email="profit-seller@example.com", password="x", tokens=0.0)
+        buyer = User(username="profit-buyer", email="profit-buyer@example.com", password="x", tokens=100.0)
+        db.add_all([seller, buyer])
+        db.flush()
+        items = [
+            WasteItem(user_id=seller.id, username="s", image_url="a.jpg", category="ProfitTest", verified=True, amount_kg=kg, sold=False)
+            for kg in (2.0, 5.0, 1.0)
+        ]
+        db.add_all(items)
+        db.commit()
+        seller_id, buyer_id, ids = seller.id, buyer.id, [item.id for item in items]
+        group_crud.reconcile(db)
+        order_book.load_from_db(db)
+        # All of the first two lots, none of the third
+        db.query(WasteItem).filter(WasteItem.id == ids[2]).update({"verified": False})
+        db.commit()
+        order_book.remove("ProfitTest", [ids[2]])
+        group_crud.reconcile(db)
+        assert waste_crud.buy_category(db, buyer_id, "ProfitTest", 7.0)["tokens_deducted"] == 7.0
+    finally:
+        db.close()
+
+    with TestClient(app) as client:
+        listings = client.get("/api/listings", params={"user_id": seller_id}).json()
+    profit = {item["id"]: item["profit"] for item in listings}
+    assert profit == {ids[0]: 2.0, ids[1]: 5.0, ids[2]: None}
@@ -0,0 +1,77 @@
+import os
+
+import pytest
+from alembic import command
+from alembic.config import Config
+from sqlalchemy import Boolean, Column, DateTime, Float, ForeignKey, Integer, MetaData, String, Table, create_engine
+from sqlalchemy.orm import Session
+
+from app.query_plans import HOT_QUERIES, check_query_plans
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# The migrations start from the tables create_all made before them, stamped at this revision
+BASELINE_REVISION = "8c79a76ad363"
+
+baseline = MetaData()
+Table(
+    "users", baseline,
+    Column("id", Integer, primary_key=True, index=True),
+    Column("username", String, unique=True, index=True),
+    Column("email", String, unique=True, index=True),
+    Column("password", String),
+    Column("level", String),
+    Column("tokens", Float),
+)
+Table(
+    "waste_items", baseline,
+    Column("id", Integer, primary_key=True, index=True),
+    Column("user_id", Integer, ForeignKey("users.id")),
+    Column("username", String),
+    Column("description", String),
+    Column("image_url", String),
+    Column("category", String),
+    Column("verified", Boolean),
+    Column("predicted_category", String),
+    Column("ai_confidence", Float),
+    Column("amount_kg", Float),
+    Column("sold", Boolean),
+    Column("sold_at", DateTime, nullable=True),
+)
+Table(
+    "transactions", baseline,
+    Column("id", Integer, primary_key=True, index=True),
+    Column("buyer_id", Integer, ForeignKey("users.id")),
+    Column("seller_id", Integer, ForeignKey("users.id")),
+    Column("category", String),
+    Column("amount_kg", Float),
+    Column("tokens", Float),
+    Column("timestamp", DateTime),
+)
+Table(
+    "material_groups", baseline,
+    Column("id", Integer, primary_key=True, index=True),
+    Column("material_type", String),
+    Column("total_weight", Integer),
+)
+
+
+@pytest.fixture
+def migrated_engine(tmp_path):
+    url = f"sqlite:///{tmp_path / 'migrated.db'}"
+    engine = create_engine(url)
+    baseline.create_all(engine)
+    config = Config(os.path.join(BACKEND, "alembic.ini"))
+    config.set_main_option("script_location", os.path.join(BACKEND, "alembic"))
+    config.set_main_option("sqlalchemy.url", url)
+    command.stamp(config, BASELINE_REVISION)
+    command.upgrade(config, "head")
+    yield engine
+    engine.dispose()
+
+
+def test_hot_queries_use_their_indexes_on_the_migrated_schema(migrated_engine):
+    with Session(migrated_engine) as db:
+        results = check_query_plans(db)
+    assert [r["query"] for r in results] == [hot.name for hot in HOT_QUERIES]
+    missing = {r["query"]: r["plan"] for r in results if not r["uses_index"]}
+    assert not missing, f"queries not using their index: {missing}"
@@ -1,35 +1,94 @@
-
-import { TrendingUp, Recycle, DollarSign, Users } from 'lucide-react';
+import { useState, useEffect } from 'react';
+import { TrendingUp, Recycle, Coins, Users } from 'lucide-react';
 import { Card, CardContent, CardHeader, CardTitle } from '@/components/ui/card';
+import { useAuth } from '../lib/auth';
+
+interface Totals {
+  items_uploaded: number;
+  kg_uploaded: number;
+  kg_sold: number;
+  tokens_earned?: number;
+  tokens_traded?: number;
+  active_sellers?: number;
+}
+
+interface RollupStats {
+  all_time: Totals;
+  this_month: Totals;
+  last_month: Totals;
+}
+
+interface StatsResponse {
+  platform: RollupStats;
+  user?: RollupStats;
+}
+
+const formatKg = (kg: number) =>
+  kg >= 1000 ? `${(kg / 1000).toFixed(1)} tons` : `${kg.toFixed(1)} kg`;
+
+// Month-over-month change of one counter
+const monthChange = (stats: RollupStats, key: keyof Totals) => {
+  const current = stats.this_month[key] ?? 0;
+  const previous = stats.last_month[key] ?? 0;
+  if (previous === 0) return current > 0 ? 'New this month' : 'No activity this month';
+  const percent = Math.round(((current - previous) / previous) * 100);
+  return `${percent >= 0 ? '+' : ''}${percent}% from last month`;
+};
 
 const DashboardStats = () => {
+  const { user } = useAuth();
+  const [data, setData] = useState<StatsResponse | null>(null);
+  const [error, setError] = useState<string | null>(null);
+
+  useEffect(() => {
+    const fetchStats = async () => {
+      setError(null);
+      try {
+        // Served from the rollup tables, so this stays cheap however much history there is
+        const query = user ? `?user_id=${user.id}` : '';
+        const res = await fetch(`http://127.0.0.1:8000/api/stats${query}`);
+        if (!res.ok) throw new Error('Failed to fetch stats');
+        setData(await res.json());
+      } catch (err: any) {
+        setError(err.message || 'Error fetching stats');
+      }
+    };
+    fetchStats();
+  }, [user]);
+
+  if (error) {
+    return <div className="text-red-600">{error}</div>;
+  }
+
+  const own = data?.user ?? data?.platform;
+  const platform = data?.platform;
   const stats = [
     {
       title: 'Items Uploaded',
-      value: '127',
+      value: own ? own.all_time.items_uploaded.toLocaleString() : '—',
       icon: TrendingUp,
-      change: '+12% from last month',
+      change: own ? monthChange(own, 'items_uploaded') : '',
       color: 'text-eco-primary'
     },
     {
       title: 'Waste Recycled',
-      value: '2.3 tons',
+      value: own ? formatKg(own.all_time.kg_sold) : '—',
       icon: Recycle,
-      change: '+8% from last month',
+      change: own ? monthChange(own, 'kg_sold') : '',
       color: 'text-eco-secondary'
     },
     {
       title: 'Earnings',
-      value: '$1,247',
-      icon: DollarSign,
-      change: '+15% from last month',
+      value: own ? `${(own.all_time.tokens_earned ?? own.all_time.tokens_traded ?? 0).toFixed(1)} tokens` : '—',
+      icon: Coins,
+      change: own ? monthChange(own, data?.user ? 'tokens_earned' : 'tokens_traded') : '',
       color: 'text-green-600'
     },
     {
       title: 'Community Impact',
-      value: '89 users',
+      value: platform ? `${platform.this_month.active_sellers ?? 0} active sellers` : '—',
       icon: Users,
-      change: '+23% from last month',
+      change: platform ? monthChange(platform, 'active_sellers') : '',
       color: 'text-blue-600'
     }
   ];
@@ -12,12 +12,16 @@ interface WasteItem {
   verified?: boolean;
   predicted_category?: string;
   username?: string; // Added username to the interface
+  sold?: boolean;
+  profit?: number | null;
 }
 
 const Listings = () => {
   const [items, setItems] = useState<WasteItem[]>([]);
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState<string | null>(null);
+  const [nextCursor, setNextCursor] = useState<string | null>(null);
+  const [loadingMore, setLoadingMore] = useState(false);
 
   const { user } = useAuth();
   useEffect(() => {
@@ -34,6 +38,7 @@ const Listings = () => {
         if (!res.ok) throw new Error('Failed to fetch listings');
         const data = await res.json();
         setItems(data);
+        setNextCursor(res.headers.get('X-Next-Cursor'));
       } catch (err: any) {
         setError(err.message || 'Error fetching listings');
       } finally {
@@ -43,6 +48,22 @@ const Listings = () => {
     fetchListings();
   }, [user]);
 
+  const loadMore = async () => {
+    if (!user || !nextCursor) return;
+    setLoadingMore(true);
+    try {
+      const res = await fetch(`http://127.0.0.1:8000/api/listings?user_id=${user.id}&cursor=${encodeURIComponent(nextCursor)}`);
+      if (!res.ok) throw new Error('Failed to fetch listings');
+      const data = await res.json();
+      setItems(prev => [...prev, ...data]);
+      setNextCursor(res.headers.get('X-Next-Cursor'));
+    } catch (err: any) {
+      setError(err.message || 'Error fetching listings');
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
   return (
     <Layout>
       <div className="max-w-4xl mx-auto animate-fade-in">
@@ -88,12 +109,26 @@ const Listings = () => {
                             <span className="text-gray-400 ml-2">(Model prediction: {item.predicted_category})</span>
                           )}
                         </p>
+                        {item.sold && (
+                          <p className="text-sm mt-1 text-amber-600">
+                            Sold · Earned: {(item.profit ?? 0).toFixed(2)} tokens
+                          </p>
+                        )}
                       </div>
                     </div>
                   </CardContent>
                 </Card>
               );
             })}
+            {nextCursor && (
+              <button
+                className="mx-auto px-6 py-2 rounded border text-green-700 hover:bg-green-50 disabled:opacity-50"
+                disabled={loadingMore}
+                onClick={loadMore}
+              >
+                {loadingMore ? 'Loading...' : 'Load more'}
+              </button>
+            )}
           </div>
         )}
       </div>
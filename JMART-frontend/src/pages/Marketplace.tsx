@@ -13,6 +13,15 @@ interface WasteItem {
   amount_kg: number;
   verified?: boolean;
   predicted_category?: string;
+  username?: string;
+}
+
+interface CategorySummary {
+  category: string;
+  total_kg: number;
+  seller_count: number;
+  item_count: number;
+  thumbnail_url?: string;
 }
 
 const categoryImages: Record<string, string> = {
@@ -26,9 +35,10 @@ const categoryImages: Record<string, string> = {
 };
 
 const TOKEN_PRICE = 10; // ₹10 per token
+const PAGE_SIZE = 50;
 
 const Marketplace = () => {
-  const [items, setItems] = useState<WasteItem[]>([]);
+  const [summaries, setSummaries] = useState<CategorySummary[]>([]);
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState<string | null>(null);
   const [selectedCategory, setSelectedCategory] = useState<string | null>(null);
@@ -38,10 +48,11 @@ const Marketplace = () => {
       setLoading(true);
       setError(null);
       try {
-        const res = await fetch('http://127.0.0.1:8000/api/marketplace-listings');
+        // Totals are aggregated server-side; items are only loaded when a category is opened
+        const res = await fetch('http://127.0.0.1:8000/api/marketplace-summary');
         if (!res.ok) throw new Error('Failed to fetch marketplace listings');
         const data = await res.json();
-        setItems(data);
+        setSummaries(data);
       } catch (err: any) {
         setError(err.message || 'Error fetching marketplace listings');
       } finally {
@@ -51,23 +62,40 @@ const Marketplace = () => {
     fetchItems();
   }, []);
 
-  // Only include verified items
-  const verifiedItems = items.filter(item => item.verified);
-  // Group items by category
-  const grouped = verifiedItems.reduce((acc, item) => {
-    if (!acc[item.category]) acc[item.category] = [];
-    acc[item.category].push(item);
+  const summaryByCategory = summaries.reduce((acc, s) => {
+    acc[s.category] = s;
     return acc;
-  }, {} as Record<string, WasteItem[]>);
-  const categories = Object.keys(grouped);
+  }, {} as Record<string, CategorySummary>);
 
   // For modal/details
   const [showDetails, setShowDetails] = useState(false);
   const [detailsCategory, setDetailsCategory] = useState<string | null>(null);
+  const [detailsItems, setDetailsItems] = useState<WasteItem[]>([]);
+  const [detailsLoading, setDetailsLoading] = useState(false);
+  const [detailsCursor, setDetailsCursor] = useState<string | null>(null);
+
+  const loadCategoryItems = async (cat: string, cursor: string | null) => {
+    setDetailsLoading(true);
+    try {
+      const query = `limit=${PAGE_SIZE}` + (cursor ? `&cursor=${encodeURIComponent(cursor)}` : '');
+      const res = await fetch(`http://127.0.0.1:8000/api/marketplace-listings/${encodeURIComponent(cat)}?${query}`);
+      if (!res.ok) throw new Error('Failed to fetch category listings');
+      const data: WasteItem[] = await res.json();
+      setDetailsItems(prev => (cursor ? [...prev, ...data] : data));
+      setDetailsCursor(res.headers.get('X-Next-Cursor'));
+    } catch {
+      setDetailsCursor(null);
+    } finally {
+      setDetailsLoading(false);
+    }
+  };
 
   const handleCategoryClick = (cat: string) => {
     setDetailsCategory(cat);
+    setDetailsItems([]);
+    setDetailsCursor(null);
     setShowDetails(true);
+    loadCategoryItems(cat, null);
   };
   const closeDetails = () => setShowDetails(false);
 
@@ -95,20 +123,18 @@ const Marketplace = () => {
           <div className="text-center py-16">Loading...</div>
         ) : error ? (
           <div className="text-center py-16 text-red-500">{error}</div>
-        ) : items.length === 0 ? (
-          <div className="text-center py-16">No data</div>
-        ) : categories.length === 0 ? (
+        ) : summaries.length === 0 ? (
           <div className="text-center py-16">No data</div>
         ) : (
           <div className="grid grid-cols-1 sm:grid-cols-2 lg:grid-cols-3 gap-8">
-            {categories.map(cat => {
-              const catItems = grouped[cat];
-              const totalAmount = catItems.reduce((sum, i) => sum + (i.amount_kg || 0), 0);
-              const userCount = new Set(catItems.map(i => i.user_id)).size;
+            {summaries.map(summary => {
+              const cat = summary.category;
+              const totalAmount = summary.total_kg;
+              const userCount = summary.seller_count;
               // Price per kg in tokens (rounded up)
               const pricePerKgTokens = Math.ceil(TOKEN_PRICE / TOKEN_PRICE); // 1 token per kg (for demo, can be dynamic)
               // Use the first item's image_url as the thumbnail, fallback to category image or placeholder
-              const thumbnailUrl = catItems[0]?.image_url || categoryImages[cat] || '/placeholder.svg';
+              const thumbnailUrl = summary.thumbnail_url || categoryImages[cat] || '/placeholder.svg';
               return (
                 <div
                   key={cat}
@@ -148,13 +174,13 @@ const Marketplace = () => {
                 className="w-32 h-32 object-cover rounded mx-auto mb-4 border bg-white"
                 onError={e => (e.currentTarget.src = '/placeholder.svg')}
               />
-              <p className="mb-2">Total Amount: <b>{grouped[detailsCategory].reduce((sum, i) => sum + (i.amount_kg || 0), 0).toFixed(2)} kg</b></p>
+              <p className="mb-2">Total Amount: <b>{summaryByCategory[detailsCategory]?.total_kg.toFixed(2) ?? '0.00'} kg</b></p>
               <p className="mb-2">Price: <b>1 token/kg</b> (1 token = ₹10)</p>
-              <p className="mb-2">Number of Users: <b>{new Set(grouped[detailsCategory].map(i => i.user_id)).size}</b></p>
+              <p className="mb-2">Number of Users: <b>{summaryByCategory[detailsCategory]?.seller_count ?? 0}</b></p>
               <div className="mt-4 text-left max-h-60 overflow-y-auto">
                 <h3 className="font-semibold mb-2">Items:</h3>
                 <ul className="space-y-2">
-                  {grouped[detailsCategory].map(item => (
+                  {detailsItems.map(item => (
                     <li key={item.id} className="border rounded p-2 flex flex-col sm:flex-row sm:items-center gap-2">
                       <img
                         src={item.image_url || '/placeholder.svg'}
@@ -170,13 +196,23 @@ const Marketplace = () => {
                     </li>
                   ))}
                 </ul>
+                {detailsLoading ? (
+                  <div className="text-center text-sm text-gray-500 mt-2">Loading...</div>
+                ) : detailsCursor && (
+                  <button
+                    className="mt-2 w-full text-sm text-green-700 hover:underline"
+                    onClick={() => loadCategoryItems(detailsCategory, detailsCursor)}
+                  >
+                    Load more
+                  </button>
+                )}
               </div>
               {/* Category Buy Button */}
               <div className="mt-6 flex justify-center">
                 <button
                   className="bg-green-500 hover:bg-green-600 text-white px-6 py-2 rounded font-bold"
                   onClick={() => {
-                    setBuyModal({open: true, item: { category: detailsCategory, totalAmount: grouped[detailsCategory].reduce((sum, i) => sum + (i.amount_kg || 0), 0) }});
+                    setBuyModal({open: true, item: { category: detailsCategory, totalAmount: summaryByCategory[detailsCategory]?.total_kg ?? 0 }});
                     setBuyQty(1);
                     setBuyError(null);
                   }}
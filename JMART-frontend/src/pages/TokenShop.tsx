@@ -26,6 +26,8 @@ const TokenShop = () => {
   const [isBuyingPack, setIsBuyingPack] = useState<number | null>(null);
   const { user, refreshUser } = useAuth();
   const [transactions, setTransactions] = useState<any[]>([]);
+  const [nextCursor, setNextCursor] = useState<string | null>(null);
+  const [loadingMore, setLoadingMore] = useState(false);
 
   useEffect(() => {
     fetchBalance();
@@ -33,11 +35,31 @@ const TokenShop = () => {
 
   useEffect(() => {
     if (!user) return;
+    // Newest first, one page at a time; X-Next-Cursor points at the older ones
     fetch(`/api/transaction-history?user_id=${user.id}`)
-      .then(res => res.json())
+      .then(res => {
+        setNextCursor(res.headers.get('X-Next-Cursor'));
+        return res.json();
+      })
       .then(setTransactions);
   }, [user]);
 
+  const loadMoreTransactions = async () => {
+    if (!user || !nextCursor) return;
+    setLoadingMore(true);
+    try {
+      const res = await fetch(`/api/transaction-history?user_id=${user.id}&cursor=${encodeURIComponent(nextCursor)}`);
+      if (!res.ok) throw new Error('Failed to fetch transactions');
+      const data = await res.json();
+      setTransactions(prev => [...prev, ...data]);
+      setNextCursor(res.headers.get('X-Next-Cursor'));
+    } catch (error) {
+      toast({ title: 'Error', description: 'Failed to load older transactions.' });
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
   const fetchBalance = async () => {
     try {
       const res = await fetch(`http://127.0.0.1:8000/api/token-balance?user_id=${user?.id}`);
@@ -325,6 +347,17 @@ const TokenShop = () => {
                   </ul>
                 </div>
               </div>
+              {nextCursor && (
+                <div className="flex justify-center mt-4">
+                  <button
+                    className="px-6 py-2 rounded border text-green-700 hover:bg-green-50 disabled:opacity-50"
+                    disabled={loadingMore}
+                    onClick={loadMoreTransactions}
+                  >
+                    {loadingMore ? 'Loading...' : 'Load more'}
+                  </button>
+                </div>
+              )}
             </CardContent>
           </Card>
         )}